@@ -0,0 +1,131 @@
+import json
+import os
+import re
+import time
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from cache import DEFAULT_CACHE_DIR, get_content
+
+'''
+Moduł z indeksem strony archiwum GIOS (lata, ID archiwów i pliki metadanych)
+'''
+
+ARCHIVE_URL = "https://powietrze.gios.gov.pl/pjp/archives"
+DEFAULT_TTL = 24 * 3600  # 1 dzień
+
+_INDEX_FILE = "archive_index.json"
+_ARCHIVE_PREFIX = "downloadFile/"
+_YEAR_PATTERN = re.compile(r"Wyniki pomiarów z (\d{4}) roku")
+
+try:
+    import lxml  # noqa: F401
+    _PARSER = "lxml"
+except ImportError:
+    _PARSER = "html.parser"
+
+
+class ArchiveIndex:
+    """Zawartość strony archiwum GIOS potrzebna do pobierania danych
+
+    Atrybuty:
+        archive_ids (dict): rok -> ID archiwum z wynikami pomiarów z tego roku
+        metadata_links (list): lista (tekst linku, href) plików metadanych, w kolejności ze strony
+        fetched_at (float): czas pobrania strony (time.time())
+    """
+
+    def __init__(self, archive_ids, metadata_links, fetched_at):
+        self.archive_ids = archive_ids
+        self.metadata_links = metadata_links
+        self.fetched_at = fetched_at
+
+    def pm25_id(self, year):
+        """Zwraca ID archiwum dla podanego roku"""
+        if year not in self.archive_ids:
+            raise RuntimeError(f"Nie znaleziono archiwum PM2.5 dla roku {year}")
+        return self.archive_ids[year]
+
+    def metadata_href(self):
+        """Zwraca href pierwszego pliku metadanych albo None, jeśli go brak"""
+        return self.metadata_links[0][1] if self.metadata_links else None
+
+    def to_dict(self):
+        return {
+            "archive_ids": {str(year): gios_id for year, gios_id in self.archive_ids.items()},
+            "metadata_links": [list(link) for link in self.metadata_links],
+            "fetched_at": self.fetched_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({int(year): gios_id for year, gios_id in data["archive_ids"].items()},
+                   [tuple(link) for link in data["metadata_links"]], data["fetched_at"])
+
+
+def parse_archive_page(page):
+    """Wyciąga ze strony archiwum ID archiwów dla wszystkich lat i linki do metadanych
+
+    Parsowane są tylko znaczniki <a> (SoupStrainer), parserem lxml, jeśli jest zainstalowany.
+
+    Args:
+        page (bytes): zawartość strony archiwum
+
+    Returns:
+        ArchiveIndex: indeks strony
+    """
+    soup = BeautifulSoup(page.decode("utf-8", errors="replace"), _PARSER,
+                         parse_only=SoupStrainer("a", href=True))
+
+    archive_ids = {}
+    metadata_links = []
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        if "downloadFile" not in href:
+            continue
+        text = a.get_text(strip=True)
+
+        match = _YEAR_PATTERN.search(text)
+        if match and _ARCHIVE_PREFIX in href:
+            # dla roku liczy się pierwszy pasujący link
+            archive_ids.setdefault(int(match.group(1)), href.split(_ARCHIVE_PREFIX)[-1])
+        if "meta" in text.lower():
+            metadata_links.append((text.lower(), href))
+
+    return ArchiveIndex(archive_ids, metadata_links, time.time())
+
+
+def load_archive_index(cache_dir=DEFAULT_CACHE_DIR, offline=False, ttl=DEFAULT_TTL, url=None):
+    """Zwraca indeks strony archiwum, pobierając i parsując stronę tylko gdy trzeba
+
+    Indeks jest zapisywany w katalogu cache (archive_index.json) i używany ponownie,
+    dopóki nie jest starszy niż ttl sekund. W trybie offline zapisany indeks jest
+    używany niezależnie od wieku.
+
+    Args:
+        cache_dir (str): katalog cache; None wyłącza cache (strona pobierana za każdym razem)
+        offline (bool): jeśli True, strona jest brana wyłącznie z cache
+        ttl (float): czas ważności zapisanego indeksu w sekundach
+        url (str): adres strony archiwum; None - ARCHIVE_URL
+
+    Returns:
+        ArchiveIndex: indeks strony
+    """
+    index_path = os.path.join(cache_dir, _INDEX_FILE) if cache_dir is not None else None
+    if index_path is not None:
+        try:
+            with open(index_path, encoding="utf-8") as f:
+                index = ArchiveIndex.from_dict(json.load(f))
+            if offline or time.time() - index.fetched_at < ttl:
+                return index
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+    index = parse_archive_page(get_content(url or ARCHIVE_URL, "archives-page", cache_dir, offline))
+
+    if index_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+    return index
@@ -0,0 +1,58 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import load_data
+
+'''
+Benchmark konwersji pomiarów na liczby w clean_pm25_data
+
+Uruchomienie: python benchmark_clean.py [liczba_stacji]
+'''
+
+
+def legacy_conversion(block):
+    """Poprzednia implementacja: rzutowanie na str, zamiana przecinków kolumna po kolumnie, rzutowanie na float"""
+    return block.astype(str).apply(lambda s: s.str.replace(',', '.', regex=False)).replace('', pd.NA).astype(float)
+
+
+def make_block(n_rows, n_stations, decimal_comma, seed=0):
+    """Tworzy blok komórek podobny do arkusza GIOS (ok. 5% pustych komórek)"""
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.random((n_rows, n_stations)) * 100, 3)
+    missing = rng.random((n_rows, n_stations)) < 0.05
+    if decimal_comma:
+        cells = np.array([[str(v).replace('.', ',') for v in row] for row in values], dtype=object)
+        cells[missing] = ''
+    else:
+        cells = values.astype(object)
+        cells[missing] = np.nan
+    # jak po pd.read_excel(header=None): kolumny typu object
+    return pd.DataFrame(cells, dtype=object)
+
+
+def measure(func, block, repeats=3):
+    """Zwraca najlepszą liczbę wierszy na sekundę z kilku powtórzeń"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(block)
+        best = min(best, time.perf_counter() - start)
+    return len(block) / best
+
+
+def main(n_stations=80):
+    n_rows = 24 * 365
+    for decimal_comma in [True, False]:
+        block = make_block(n_rows, n_stations, decimal_comma)
+        legacy = measure(legacy_conversion, block)
+        fast = measure(lambda b: load_data.parse_numeric_block(b.to_numpy(dtype=object)), block)
+        label = "przecinek dziesiętny" if decimal_comma else "liczby"
+        print(f"{label:22s} poprzednio: {legacy:12,.0f} wierszy/s   "
+              f"parse_numeric_block: {fast:12,.0f} wierszy/s   ({fast / legacy:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 80)
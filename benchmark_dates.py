@@ -0,0 +1,46 @@
+import sys
+import time
+
+import pandas as pd
+
+import load_data
+
+'''
+Benchmark korekty dat w correct_dates
+
+Uruchomienie: python benchmark_dates.py [liczba_lat]
+'''
+
+
+def legacy_correct_dates(df):
+    """Poprzednia implementacja: porównanie obiektów time dla każdego wiersza i przypisanie przez .loc"""
+    changed_df = df.copy()
+    cutoff = pd.Timedelta(seconds=59)
+    mask_midnight = changed_df['Data'].dt.time <= (pd.Timestamp("00:00:00") + cutoff).time()
+    changed_df.loc[mask_midnight, 'Data'] = (changed_df.loc[mask_midnight, 'Data'].dt.normalize() - pd.Timedelta(seconds=1))
+    return changed_df
+
+
+def measure(func, df, repeats=3):
+    """Zwraca najlepszą liczbę wierszy na sekundę z kilku powtórzeń"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(df)
+        best = min(best, time.perf_counter() - start)
+    return len(df) / best
+
+
+def main(n_years=10):
+    # indeks godzinowy w konwencji GIOS (godzina oznaczona jej końcem)
+    dates = pd.date_range("2015-01-01 01:00", periods=24 * 365 * n_years, freq="h")
+    df = pd.DataFrame({"Data": dates})
+
+    legacy = measure(legacy_correct_dates, df)
+    fast = measure(lambda d: load_data.correct_dates({0: d}), df)
+    print(f"{len(df):,} godzin   poprzednio: {legacy:14,.0f} wierszy/s   "
+          f"correct_dates: {fast:14,.0f} wierszy/s   ({fast / legacy:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
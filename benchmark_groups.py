@@ -0,0 +1,55 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import calculations
+
+'''
+Benchmark sprowadzania wartości stacji do średnich dla miejscowości
+
+Uruchomienie: python benchmark_groups.py [liczba_stacji]
+'''
+
+
+def legacy_city_averages(df):
+    """Poprzednia implementacja: kopia, transpozycja i groupby po poziomie kolumn"""
+    df_copy = df.copy()
+    return df_copy.T.groupby(level="Miejscowosc").mean().T
+
+
+def make_frame(n_rows, n_stations, seed=0):
+    """Tworzy tabelę wartości stacji (ok. 3 stacje na miejscowość, 5% braków)"""
+    rng = np.random.default_rng(seed)
+    values = rng.random((n_rows, n_stations)) * 100
+    values[rng.random(values.shape) < 0.05] = np.nan
+    columns = pd.MultiIndex.from_tuples(
+        [(f"Woj{i % 16}", f"Miasto{i // 3}", f"S{i}") for i in range(n_stations)],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"])
+    return pd.DataFrame(values, columns=columns)
+
+
+def measure(func, df, repeats=3):
+    """Zwraca najlepszą liczbę wierszy na sekundę z kilku powtórzeń"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(df)
+        best = min(best, time.perf_counter() - start)
+    return len(df) / best
+
+
+def main(n_stations=150):
+    for label, n_rows in [("średnie miesięczne, 10 lat", 12 * 10), ("średnie dzienne, 10 lat", 365 * 10),
+                          ("dane godzinowe, 1 rok", 24 * 365)]:
+        df = make_frame(n_rows, n_stations)
+        groups = calculations.StationGroups(df.columns)
+        legacy = measure(legacy_city_averages, df)
+        fast = measure(lambda d: calculations.calculate_city_monthly_averages(d, groups=groups), df)
+        print(f"{label:28s} poprzednio: {legacy:12,.0f} wierszy/s   "
+              f"StationGroups: {fast:12,.0f} wierszy/s   ({fast / legacy:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 150)
@@ -0,0 +1,133 @@
+import subprocess
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import calculations
+
+try:
+    import resource
+except ImportError:  # Windows - tylko pomiar alokacji przez tracemalloc
+    resource = None
+
+'''
+Benchmark pamięci funkcji z modułu calculations (szczyt RSS i szczyt alokacji)
+
+Każdy pomiar jest wykonywany w osobnym procesie, żeby szczyt RSS dotyczył jednej funkcji.
+
+Uruchomienie: python benchmark_memory.py [liczba_lat] [liczba_stacji]
+'''
+
+
+def legacy_monthly(df):
+    """Poprzednia implementacja: kopia i groupby po roku i miesiącu"""
+    df_copy = df.copy()
+    return df_copy.groupby([df_copy["Data"].dt.year, df_copy["Data"].dt.month]).mean(numeric_only=True)
+
+
+def legacy_daily(df):
+    """Poprzednia implementacja: kopia i groupby po dniu"""
+    df_copy = df.copy()
+    return df_copy.groupby(df_copy["Data"].dt.floor("D")).mean(numeric_only=True)
+
+
+def legacy_days_exceeding(df, limit=15):
+    """Poprzednia implementacja: nieużywana kopia i średnie dzienne przez groupby"""
+    df_copy = df.copy()
+    exceeded = legacy_daily(df) > limit
+    return exceeded.groupby(exceeded.index.year).sum()
+
+
+def legacy_days_exceeding_by_province(df, limit=15):
+    """Poprzednia implementacja (groupby(axis=1) zastąpione transpozycją - pandas 3 go nie ma)"""
+    df_copy = df.copy()
+    exceeded = legacy_daily(df) > limit
+    by_province = exceeded.T.groupby(level="Wojewodztwo").any().T
+    return by_province.groupby(by_province.index.year).sum()
+
+
+def legacy_city(df):
+    """Poprzednia implementacja: kopia, transpozycja i groupby po miejscowości"""
+    df_copy = df.copy()
+    return df_copy.T.groupby(level="Miejscowosc").mean().T
+
+
+FUNCTIONS = {
+    "calculate_station_monthly_averages": (legacy_monthly, calculations.calculate_station_monthly_averages),
+    "calculate_daily_station_averages": (legacy_daily, calculations.calculate_daily_station_averages),
+    "calculate_days_exceeding_limit": (legacy_days_exceeding, calculations.calculate_days_exceeding_limit),
+    "calculate_days_exceeding_limit_by_province": (legacy_days_exceeding_by_province,
+                                                   calculations.calculate_days_exceeding_limit_by_province),
+    "calculate_city_monthly_averages": (legacy_city, calculations.calculate_city_monthly_averages),
+}
+
+
+def make_frame(n_years, n_stations, seed=0):
+    """Tworzy DataFrame w układzie z merge_dataframes bez chwilowych kopii danych
+
+    Tablica jest wypełniana w miejscu, a DataFrame jej nie kopiuje - szczyt RSS
+    po utworzeniu danych jest równy ich rozmiarowi.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = 24 * 365 * n_years
+    values = np.empty((n_rows, n_stations))
+    for start in range(0, n_rows, 8760):
+        block = values[start:start + 8760]
+        rng.random(out=block)
+        block *= 60
+        block[rng.random(block.shape) < 0.05] = np.nan
+    columns = pd.MultiIndex.from_tuples(
+        [(f"Woj{i % 16}", f"Miasto{i // 3}", f"S{i}") for i in range(n_stations)],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"])
+    df = pd.DataFrame(values, columns=columns, copy=False)
+    df.insert(0, ("Data", "", ""), pd.date_range("2015-01-01 01:00", periods=n_rows, freq="h"))
+    return df
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux podaje KB, macOS bajty
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def measure(name, version, n_years, n_stations):
+    """Mierzy jedną funkcję w bieżącym procesie; zwraca (przyrost szczytu RSS, szczyt alokacji) w MB"""
+    df = make_frame(n_years, n_stations)
+    func = FUNCTIONS[name][0 if version == "legacy" else 1]
+    if name == "calculate_city_monthly_averages":
+        # jak w notebooku - średnie dla miejscowości liczone ze średnich stacji
+        df = calculations.calculate_daily_station_averages(df)
+
+    before = _peak_rss_mb()
+    tracemalloc.start()
+    func(df)
+    allocated = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    return _peak_rss_mb() - before, allocated
+
+
+def main(n_years=10, n_stations=100):
+    data_mb = 24 * 365 * n_years * n_stations * 8 / 1024 ** 2
+    print(f"dane: {n_years} lat x {n_stations} stacji = {data_mb:.0f} MB")
+    print(f"{'funkcja':44s}{'RSS poprzednio':>16s}{'RSS teraz':>12s}{'alokacje poprzednio':>22s}{'alokacje teraz':>16s}")
+    for name in FUNCTIONS:
+        results = []
+        for version in ["legacy", "current"]:
+            output = subprocess.run(
+                [sys.executable, __file__, "--measure", name, version, str(n_years), str(n_stations)],
+                capture_output=True, text=True, check=True).stdout.split()
+            results.append([float(value) for value in output])
+        (legacy_rss, legacy_alloc), (rss, alloc) = results
+        print(f"{name:44s}{legacy_rss:13.0f} MB{rss:9.0f} MB{legacy_alloc:19.0f} MB{alloc:13.0f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--measure":
+        rss, allocated = measure(sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))
+        print(rss, allocated)
+    else:
+        main(*(int(arg) for arg in sys.argv[1:3]))
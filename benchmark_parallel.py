@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+
+import calculations
+from benchmark_memory import make_frame
+
+'''
+Benchmark równoległych średnich dziennych i miesięcznych (stacje dzielone między procesy)
+
+Uruchomienie: python benchmark_parallel.py [liczba_lat] [liczba_stacji]
+'''
+
+
+def measure(func, df, workers, repeats=3):
+    """Zwraca najlepszy czas z kilku powtórzeń (sekundy); workers=1 - bez puli procesów"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(df, parallel=workers > 1, workers=workers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(n_years=10, n_stations=150):
+    df = make_frame(n_years, n_stations)
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    print(f"dane: {n_years} lat x {n_stations} stacji, rdzenie: {os.cpu_count()}")
+    for name, func in [("średnie dzienne", calculations.calculate_daily_station_averages),
+                       ("średnie miesięczne", calculations.calculate_station_monthly_averages)]:
+        serial = measure(func, df, 1)
+        for workers in counts:
+            elapsed = serial if workers == 1 else measure(func, df, workers)
+            print(f"{name:20s} procesy: {workers:3d}   {len(df) / elapsed:14,.0f} wierszy/s   ({serial / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
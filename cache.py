@@ -0,0 +1,386 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from http_client import get_client
+
+'''
+Moduł z lokalnym cache plików pobieranych z archiwum GIOS
+'''
+
+DEFAULT_CACHE_DIR = ".gios_cache"
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3  # 2 GB
+CHUNK_SIZE = 1024 ** 2  # pobieranie i sprawdzanie plików po 1 MB
+
+_INDEX_FILE = "index.json"
+_OBJECTS_DIR = "objects"
+
+# indeks jest zmieniany przez kilka wątków naraz (pobieranie równoległe)
+_index_lock = threading.Lock()
+# klucze, których pliki są jeszcze potrzebne (klucz -> liczba użytkowników) - evict ich nie usuwa
+_pinned = {}
+
+
+def _index_path(cache_dir):
+    return os.path.join(cache_dir, _INDEX_FILE)
+
+
+def _blob_path(cache_dir, sha256):
+    return os.path.join(cache_dir, _OBJECTS_DIR, sha256)
+
+
+def load_index(cache_dir=DEFAULT_CACHE_DIR):
+    """Wczytuje indeks cache (klucz -> opis pliku)
+
+    Args:
+        cache_dir (str): katalog cache
+
+    Returns:
+        dict: słownik z wpisami cache, pusty jeśli indeksu jeszcze nie ma
+    """
+    try:
+        with open(_index_path(cache_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index(cache_dir, index):
+    # zapis przez plik tymczasowy, żeby przerwany zapis nie uszkodził indeksu
+    tmp_path = _index_path(cache_dir) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, _index_path(cache_dir))
+
+
+def _read_blob(cache_dir, sha256):
+    """Zwraca zawartość pliku z cache albo None, jeśli go brak lub jest uszkodzony"""
+    try:
+        with open(_blob_path(cache_dir, sha256), "rb") as f:
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    if hashlib.sha256(content).hexdigest() != sha256:
+        return None
+    return content
+
+
+def _write_blob(cache_dir, content):
+    sha256 = hashlib.sha256(content).hexdigest()
+    path = _blob_path(cache_dir, sha256)
+    # ta sama zawartość pod różnymi kluczami jest zapisywana tylko raz
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return sha256
+
+
+def _blob_valid(cache_dir, sha256):
+    """Sprawdza sumę kontrolną pliku w cache, czytając go fragmentami"""
+    digest = hashlib.sha256()
+    try:
+        with open(_blob_path(cache_dir, sha256), "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return False
+    return digest.hexdigest() == sha256
+
+
+def _download_blob(cache_dir, url, headers):
+    """Pobiera plik prosto do katalogu obiektów cache
+
+    Returns:
+        tuple: (odpowiedź, sha256, rozmiar); przy odpowiedzi 304 sha256 i rozmiar to None
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.join(cache_dir, _OBJECTS_DIR))
+    try:
+        with os.fdopen(fd, "w+b") as f:
+            response = get_client().download(url, f, headers=headers)
+            if response.status_code == 304:
+                sha256 = None
+            else:
+                # skrót liczony po pobraniu, bo wznowione pobieranie może zacząć plik od nowa
+                f.seek(0)
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                sha256, size = digest.hexdigest(), f.tell()
+        if sha256 is None:
+            os.remove(tmp_path)
+            return response, None, None
+        os.replace(tmp_path, _blob_path(cache_dir, sha256))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return response, sha256, size
+
+
+def _remove_unreferenced(cache_dir, index, sha256):
+    """Usuwa plik o danym skrócie, jeśli nie wskazuje na niego żaden klucz indeksu"""
+    if all(entry["sha256"] != sha256 for entry in index.values()):
+        try:
+            os.remove(_blob_path(cache_dir, sha256))
+        except FileNotFoundError:
+            pass
+
+
+def _replace_entry(cache_dir, index, key, entry):
+    """Zapisuje wpis pod kluczem i usuwa plik poprzedniej wersji, o ile nie jest już używany"""
+    old = index.get(key)
+    index[key] = entry
+    if old is not None and old["sha256"] != entry["sha256"]:
+        _remove_unreferenced(cache_dir, index, old["sha256"])
+
+
+@contextlib.contextmanager
+def pinned(keys):
+    """Chroni pliki podanych kluczy przed usunięciem przez evict do wyjścia z bloku with
+
+    Potrzebne, gdy ścieżki z fetch_cached_path są używane później (np. wczytywane
+    w innych procesach), a w tym czasie inne wątki pobierają kolejne pliki.
+
+    Args:
+        keys (iterable): klucze wpisów cache
+    """
+    keys = list(keys)
+    with _index_lock:
+        for key in keys:
+            _pinned[key] = _pinned.get(key, 0) + 1
+    try:
+        yield
+    finally:
+        with _index_lock:
+            for key in keys:
+                _pinned[key] -= 1
+                if not _pinned[key]:
+                    del _pinned[key]
+
+
+def evict(cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE, index=None, keep=None):
+    """Usuwa najdawniej używane wpisy, aż rozmiar cache nie przekracza max_size
+
+    Args:
+        cache_dir (str): katalog cache
+        max_size (int): maksymalny łączny rozmiar plików w bajtach
+        index (dict): indeks cache; jeśli None, zostanie wczytany z dysku
+        keep (str): klucz, który nie jest usuwany (np. właśnie zapisany plik, nawet
+            jeśli sam przekracza max_size); klucze z bloku pinned też nie są usuwane
+
+    Returns:
+        list: lista usuniętych kluczy
+    """
+    save = index is None
+    if index is None:
+        index = load_index(cache_dir)
+
+    def total_size():
+        blobs = {entry["sha256"]: entry["size"] for entry in index.values()}
+        return sum(blobs.values())
+
+    removed = []
+    for key in sorted(index, key=lambda k: index[k]["last_access"]):
+        if total_size() <= max_size:
+            break
+        if key == keep or key in _pinned:
+            continue
+        removed.append(key)
+        _remove_unreferenced(cache_dir, index, index.pop(key)["sha256"])
+
+    if save and removed:
+        _save_index(cache_dir, index)
+    return removed
+
+
+def fetch_cached(url, key, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE, offline=False):
+    """Pobiera plik z podanego URL, korzystając z lokalnego cache
+
+    Plik jest zapisywany pod nazwą równą jego skrótowi SHA-256, a indeks mapuje
+    klucz (np. ID archiwum) na ten skrót. Przy kolejnym wywołaniu wysyłane jest
+    zapytanie warunkowe (ETag / Last-Modified) i plik jest pobierany ponownie
+    tylko wtedy, gdy zmienił się na serwerze.
+
+    Args:
+        url (str): adres pliku
+        key (str): klucz wpisu w cache, np. "archive-603"
+        cache_dir (str): katalog cache
+        max_size (int): maksymalny rozmiar cache w bajtach
+        offline (bool): jeśli True, plik jest brany wyłącznie z cache
+
+    Returns:
+        bytes: zawartość pliku
+    """
+    os.makedirs(os.path.join(cache_dir, _OBJECTS_DIR), exist_ok=True)
+
+    with _index_lock:
+        entry = load_index(cache_dir).get(key)
+    cached = _read_blob(cache_dir, entry["sha256"]) if entry else None
+
+    if offline:
+        if cached is None:
+            raise RuntimeError(f"Brak pliku '{key}' w cache (tryb offline)")
+        _touch(cache_dir, key)
+        return cached
+
+    headers = {}
+    if cached is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        response, content = get_client().get_content(url, headers=headers)
+    except requests.RequestException as e:
+        if cached is None:
+            raise
+        print(f"Błąd pobierania {url}, używam wersji z cache: {e}")
+        _touch(cache_dir, key)
+        return cached
+
+    if response.status_code == 304 and cached is not None:
+        _touch(cache_dir, key)
+        return cached
+
+    sha256 = _write_blob(cache_dir, content)
+
+    with _index_lock:
+        index = load_index(cache_dir)
+        _replace_entry(cache_dir, index, key, {
+            "url": url,
+            "sha256": sha256,
+            "size": len(content),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "last_access": time.time(),
+        })
+        evict(cache_dir, max_size, index, keep=key)
+        _save_index(cache_dir, index)
+
+    return content
+
+
+def fetch_cached_path(url, key, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE, offline=False):
+    """Jak fetch_cached, ale plik jest pobierany strumieniowo prosto na dysk
+
+    Zawartość nie jest trzymana w pamięci - odpowiedź jest zapisywana w cache
+    fragmentami po CHUNK_SIZE bajtów (przerwane pobieranie jest wznawiane),
+    a zwracana jest ścieżka do pliku w cache.
+
+    Args:
+        url (str): adres pliku
+        key (str): klucz wpisu w cache, np. "archive-603"
+        cache_dir (str): katalog cache
+        max_size (int): maksymalny rozmiar cache w bajtach
+        offline (bool): jeśli True, plik jest brany wyłącznie z cache
+
+    Returns:
+        str: ścieżka do pliku w cache
+    """
+    os.makedirs(os.path.join(cache_dir, _OBJECTS_DIR), exist_ok=True)
+
+    with _index_lock:
+        entry = load_index(cache_dir).get(key)
+    cached = entry is not None and _blob_valid(cache_dir, entry["sha256"])
+
+    if offline:
+        if not cached:
+            raise RuntimeError(f"Brak pliku '{key}' w cache (tryb offline)")
+        _touch(cache_dir, key)
+        return _blob_path(cache_dir, entry["sha256"])
+
+    headers = {}
+    if cached:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        response, sha256, size = _download_blob(cache_dir, url, headers)
+    except requests.RequestException as e:
+        if not cached:
+            raise
+        print(f"Błąd pobierania {url}, używam wersji z cache: {e}")
+        _touch(cache_dir, key)
+        return _blob_path(cache_dir, entry["sha256"])
+
+    if response.status_code == 304 and cached:
+        _touch(cache_dir, key)
+        return _blob_path(cache_dir, entry["sha256"])
+
+    with _index_lock:
+        index = load_index(cache_dir)
+        _replace_entry(cache_dir, index, key, {
+            "url": url,
+            "sha256": sha256,
+            "size": size,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "last_access": time.time(),
+        })
+        evict(cache_dir, max_size, index, keep=key)
+        _save_index(cache_dir, index)
+
+    return _blob_path(cache_dir, sha256)
+
+
+def get_content(url, key, cache_dir=DEFAULT_CACHE_DIR, offline=False):
+    """Pobiera plik przez cache (jeśli podano cache_dir) albo bezpośrednio
+
+    Args:
+        url (str): adres pliku
+        key (str): klucz wpisu w cache
+        cache_dir (str): katalog cache; None wyłącza cache
+        offline (bool): jeśli True, plik jest brany wyłącznie z cache
+
+    Returns:
+        bytes: zawartość pliku
+    """
+    if cache_dir is None:
+        return get_client().get_content(url)[1]
+    return fetch_cached(url, key, cache_dir=cache_dir, offline=offline)
+
+
+def get_path(url, key, cache_dir=DEFAULT_CACHE_DIR, offline=False):
+    """Pobiera plik strumieniowo na dysk przez cache albo (bez cache) do pliku tymczasowego
+
+    Args:
+        url (str): adres pliku
+        key (str): klucz wpisu w cache
+        cache_dir (str): katalog cache; None wyłącza cache - plik trafia wtedy do pliku
+            tymczasowego, który wywołujący musi usunąć
+        offline (bool): jeśli True, plik jest brany wyłącznie z cache
+
+    Returns:
+        str: ścieżka do pobranego pliku
+    """
+    if cache_dir is not None:
+        return fetch_cached_path(url, key, cache_dir=cache_dir, offline=offline)
+
+    fd, path = tempfile.mkstemp(prefix=f"{key}-")
+    try:
+        with os.fdopen(fd, "w+b") as f:
+            get_client().download(url, f)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _touch(cache_dir, key):
+    # aktualizacja czasu ostatniego użycia (potrzebne do LRU)
+    with _index_lock:
+        index = load_index(cache_dir)
+        if key in index:
+            index[key]["last_access"] = time.time()
+            _save_index(cache_dir, index)
@@ -1,106 +1,452 @@
+import numpy as np
 import pandas as pd
 
+from mmap_store import HourlyMemmap, reduce_by_keys, reduce_by_keys_parallel
+
 '''
 Moduł do obliczeń
+
+Funkcje tylko czytają dane wejściowe: nie modyfikują przekazanego DataFrame i nie tworzą
+jego pełnej kopii. Kolumny stacji są czytane jako widok tablicy (o ile są jednym blokiem
+liczb zmiennoprzecinkowych), a obliczenia idą fragmentami, więc dodatkowa pamięć jest
+rzędu wyniku i jednego fragmentu danych, a nie całej tabeli. Wyjątkiem jest tryb równoległy
+(parallel=True) - DataFrame jest wtedy raz kopiowany do pamięci współdzielonej procesów.
 '''
 
 
-def calculate_station_monthly_averages(df):
+def min_valid_count(min_coverage, expected):
+    """
+    Zwraca minimalną liczbę pomiarów, przy której agregat jest ważny.
+
+    Args:
+        min_coverage (float | None): minimalny udział pomiarów (np. 0.75); None - bez wymagań
+        expected (int | np.ndarray): oczekiwana liczba pomiarów (np. 24 godziny w dniu)
+
+    Returns:
+        int | np.ndarray: minimalna liczba pomiarów (co najmniej 1)
+    """
+    if min_coverage is None:
+        return 1
+    return np.maximum(1, np.ceil(min_coverage * np.asarray(expected) - 1e-9).astype(np.int64))
+
+
+def _station_values(df):
+    """Zwraca (kolumny stacji, tablica (wiersze, stacje)) bez kopiowania danych
+
+    Dla kolumn typu float (także float32) zwracany jest widok tylko do odczytu;
+    inne typy (np. int) są zamieniane na float64.
+    """
+    is_station = df.columns.get_level_values(0) != "Data"
+    values = df if is_station.all() else df.loc[:, is_station]
+    array = values.to_numpy()
+    if array.dtype.kind != "f":
+        array = array.astype(np.float64)
+    return values.columns, array
+
+
+def _reduce_hours(df, keys, parallel=False, workers=None):
+    """Sumy i liczby pomiarów dla każdej grupy godzin i stacji (jeden przebieg po danych)
+
+    W trybie równoległym stacje są dzielone między procesy (reduce_by_keys_parallel).
+
+    Returns:
+        tuple: (posortowane klucze grup, kolumny stacji, sumy, liczby pomiarów)
+    """
+    if isinstance(df, HourlyMemmap):
+        columns, values = df.columns, df.values
+    else:
+        columns, values = _station_values(df)
+        values = values.T
+    if parallel:
+        groups, sums, counts = reduce_by_keys_parallel(values, keys, workers)
+    else:
+        groups, sums, counts = reduce_by_keys(values, keys)
+    return groups, columns, sums, counts
+
+
+def _masked_means(sums, counts, required):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts >= required, sums / counts, np.nan)
+
+
+def calculate_station_monthly_averages(df, min_coverage=None, return_counts=False, parallel=False, workers=None):
     """
     Oblicza miesięczne średnie wartości PM2.5 dla każdej stacji w każdym roku
     
     Args:
-        df (pd.DataFrame): DataFrame z danymi PM2.5, gdzie kolumny to kody stacji, a indeks to daty.
+        df (pd.DataFrame | HourlyMemmap): DataFrame z danymi PM2.5, gdzie kolumny to kody stacji, a indeks to daty,
+            albo dane mapowane z dysku (liczone fragmentami stacji).
+        min_coverage (float): Minimalny udział godzin z pomiarem w miesiącu (np. 0.75);
+            średnie z mniejszej liczby godzin są zastępowane NaN. None - bez wymagań.
+        return_counts (bool): Jeśli True, zwracane są też liczby godzin z pomiarem.
+        parallel (bool): Jeśli True, stacje są dzielone między procesy (dane przez pamięć współdzieloną).
+        workers (int): Liczba procesów w trybie równoległym; None - liczba rdzeni.
         
     Returns:
-        pd.DataFrame: DataFrame z miesięcznymi średnimi wartościami PM2.5.
+        pd.DataFrame: DataFrame z miesięcznymi średnimi wartościami PM2.5
+            (oraz DataFrame z liczbami godzin z pomiarem, jeśli return_counts).
     """
-    df_copy = df.copy()
-    months_means = (
-        df_copy.groupby([df_copy["Data"].dt.year, df_copy["Data"].dt.month]).mean(numeric_only=True)
-    )
+    dates = df.dates if isinstance(df, HourlyMemmap) else pd.DatetimeIndex(df["Data"])
+    months, columns, sums, counts = _reduce_hours(df, dates.year * 100 + dates.month, parallel, workers)
+    return _monthly_frame(months, columns, sums, counts, min_coverage, return_counts)
+
 
-    # Ustawienie nazw indeksów
-    months_means.index.names = ["Rok", "Miesiąc"]
+def _monthly_frame(months, columns, sums, counts, min_coverage=None, return_counts=False):
+    """Średnie miesięczne (i liczby godzin z pomiarem) z sum i liczb pomiarów dla kluczy rok*100+miesiąc"""
+    index = pd.MultiIndex.from_arrays([months // 100, months % 100], names=["Rok", "Miesiąc"])
+    hours = 24 * pd.to_datetime({"year": months // 100, "month": months % 100, "day": 1}).dt.days_in_month
+    required = min_valid_count(min_coverage, hours.to_numpy()[:, None])
+    means = pd.DataFrame(_masked_means(sums, counts, required), index=index, columns=columns)
+    if return_counts:
+        return means, pd.DataFrame(counts, index=index, columns=columns)
+    return means
+
+DEFAULT_CHUNK_ROWS = 4096  # liczba wierszy sprowadzanych do grup naraz
+
+
+class StationGroups:
+    """
+    Przypisanie stacji do grup (np. miejscowości albo województw) jako rzadka macierz wskaźników.
 
-    return months_means
+    Budowana raz dla listy stacji; potem dowolna macierz (wiersze, stacje) jest
+    sprowadzana do grup jednym mnożeniem przez macierz wskaźników (stacje, grupy),
+    bez transpozycji DataFrame i groupby. Macierz jest trzymana w postaci rzadkiej
+    (jak CSR): stacje posortowane według grup, granice grup i wagi stacji - mnożenie
+    to suma kolejnych wierszy każdej grupy.
 
-def calculate_city_monthly_averages(df):
+    Atrybuty:
+        level (str): poziom kolumn, według którego grupowane są stacje
+        groups (pd.Index): nazwy grup (posortowane)
+        order (np.ndarray): numery stacji posortowane według grup
+        bounds (np.ndarray): granice grup w order (grupa g to order[bounds[g]:bounds[g + 1]])
+        weights (np.ndarray): wagi stacji w kolejności order; None - wszystkie równe 1
+    """
+
+    def __init__(self, columns, level="Miejscowosc", weights=None):
+        codes, groups = pd.factorize(columns.get_level_values(level), sort=True)
+        self.level = level
+        self.groups = pd.Index(groups, name=level)
+        self.order = np.argsort(codes, kind="stable")
+        self.bounds = np.searchsorted(codes[self.order], np.arange(len(groups) + 1))
+        if weights is not None:
+            if isinstance(weights, pd.Series):
+                weights = weights.reindex(columns.get_level_values("Stacja"))
+            weights = np.nan_to_num(np.asarray(weights, dtype=np.float64))[self.order]
+        self.weights = weights
+
+    def indicator(self):
+        """Zwraca macierz wskaźników jako gęstą tablicę (stacje, grupy)"""
+        matrix = np.zeros((len(self.order), len(self.groups)))
+        codes = np.repeat(np.arange(len(self.groups)), np.diff(self.bounds))
+        matrix[self.order, codes] = 1 if self.weights is None else self.weights
+        return matrix
+
+    def _multiply(self, rows):
+        """Mnoży (stacje posortowane, wiersze) przez macierz wskaźników - sumy w grupach"""
+        result = np.empty((len(self.groups), rows.shape[1]))
+        for g in range(len(self.groups)):
+            np.add.reduce(rows[self.bounds[g]:self.bounds[g + 1]], axis=0, dtype=np.float64, out=result[g])
+        return result
+
+    def sums_and_weights(self, values, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """
+        Zwraca ważone sumy wartości w grupach i sumy wag stacji z pomiarem (braki pomijane).
+
+        Wiersze są przetwarzane fragmentami po chunk_rows, więc kopiowany (posortowany
+        według grup) jest naraz tylko jeden fragment, a nie cała tabela.
+
+        Args:
+            values (np.ndarray | pd.DataFrame): wartości, kształt (wiersze, stacje)
+            chunk_rows (int): liczba wierszy przetwarzanych naraz
+
+        Returns:
+            tuple: (sumy, sumy wag), obie o kształcie (wiersze, grupy)
+        """
+        values = np.asarray(values)
+        sums = np.empty((len(values), len(self.groups)))
+        weights = np.empty((len(values), len(self.groups)))
+        for start in range(0, len(values), chunk_rows):
+            stop = min(start + chunk_rows, len(values))
+            sums[start:stop], weights[start:stop] = self._chunk_sums(values[start:stop])
+        return sums, weights
+
+    def _chunk_sums(self, chunk):
+        # kopia fragmentu z wierszami stacji posortowanymi według grup (zwalniana po powrocie)
+        rows = chunk.T[self.order]
+        valid = ~np.isnan(rows)
+        rows[~valid] = 0
+        if self.weights is None:
+            valid_weights = valid
+        else:
+            rows *= self.weights[:, None]
+            valid_weights = valid * self.weights[:, None]
+        return self._multiply(rows).T, self._multiply(valid_weights).T
+
+    def means(self, values):
+        """Średnie ważone w grupach z pominięciem braków, kształt (wiersze, grupy)"""
+        sums, weights = self.sums_and_weights(values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(weights > 0, sums / weights, np.nan)
+
+
+def calculate_group_averages(df, level="Miejscowosc", weights=None, groups=None):
+    """
+    Sprowadza wartości stacji do średnich dla miejscowości albo województw.
+
+    Args:
+        df (pd.DataFrame): DataFrame z kolumnami stacji (MultiIndex Wojewodztwo/Miejscowosc/Stacja),
+            np. średnie miesięczne albo dzienne. Kolumna "Data", jeśli jest, staje się indeksem.
+        level (str): "Miejscowosc" albo "Wojewodztwo".
+        weights (pd.Series | np.ndarray): wagi stacji (Series z indeksem kodów stacji albo tablica
+            w kolejności kolumn); None - zwykła średnia.
+        groups (StationGroups): gotowe przypisanie stacji - jeśli podane, level i weights są pomijane.
+
+    Returns:
+        pd.DataFrame: DataFrame ze średnimi dla każdej grupy.
+    """
+    columns, values = _station_values(df)
+    index = df.index
+    if len(columns) < len(df.columns):
+        index = pd.DatetimeIndex(df["Data"]).rename("Data")
+    if groups is None:
+        groups = StationGroups(columns, level, weights)
+    return pd.DataFrame(groups.means(values), index=index, columns=groups.groups)
+
+
+def calculate_city_monthly_averages(df, groups=None):
     """
     Oblicza miesięczne średnie wartości PM2.5 dla każdego miasta w każdym roku
     
     Args:
         df (pd.DataFrame): DataFrame ze średnimi dla każdej stacji.
+        groups (StationGroups): gotowe przypisanie stacji do miejscowości (np. użyte ponownie
+            dla wielu tabel); None - budowane z kolumn df.
         
     Returns:
         pd.DataFrame: DataFrame z miesięcznymi średnimi wartościami PM2.5 dla miejscowości.
     """
-    df_copy = df.copy()
-    city_month_means = df_copy.T.groupby(level="Miejscowosc").mean().T
-
-    return city_month_means
+    return calculate_group_averages(df, level="Miejscowosc", groups=groups)
 
-def calculate_daily_station_averages(df):
+def calculate_daily_station_averages(df, min_coverage=None, return_counts=False, parallel=False, workers=None):
     """
     Oblicza dzienne średnie wartości PM2.5 dla każdej stacji w każdym roku
 
     Args:
-        df (pd.DataFrame): DataFrame z danymi PM2.5, gdzie kolumny to kody stacji, a indeks to daty.
+        df (pd.DataFrame | HourlyMemmap): DataFrame z danymi PM2.5, gdzie kolumny to kody stacji, a indeks to daty,
+            albo dane mapowane z dysku (liczone fragmentami stacji).
+        min_coverage (float): Minimalny udział godzin z pomiarem w dniu (np. 0.75 - 18 z 24 godzin);
+            średnie z mniejszej liczby godzin są zastępowane NaN. None - bez wymagań.
+        return_counts (bool): Jeśli True, zwracane są też liczby godzin z pomiarem.
+        parallel (bool): Jeśli True, stacje są dzielone między procesy (dane przez pamięć współdzieloną).
+        workers (int): Liczba procesów w trybie równoległym; None - liczba rdzeni.
+
+    Returns:
+        pd.DataFrame: DataFrame z dziennymi średnimi wartościami PM2.5
+            (oraz DataFrame z liczbami godzin z pomiarem, jeśli return_counts).
+    """
+    return _daily_frame(build_daily_cube(df, parallel, workers), min_coverage, return_counts)
+
+
+def _daily_frame(cube, min_coverage=None, return_counts=False):
+    """Średnie dzienne (i liczby godzin z pomiarem) z kostki DailyCube"""
+    index = cube.days.rename("Data")
+    means = pd.DataFrame(cube.means(min_coverage), index=index, columns=cube.columns)
+    if return_counts:
+        return means, pd.DataFrame(cube.counts, index=index, columns=cube.columns)
+    return means
+
+class DailyCube:
+    """
+    Sumy i liczby pomiarów PM2.5 dla każdej stacji i każdego dnia.
+
+    Budowana raz dla danych godzinowych, a potem odpowiada na pytania o przekroczenia
+    dla dowolnego limitu, poziomu grupowania i podzbioru lat bez ponownego grupowania
+    danych godzinowych.
+
+    Atrybuty:
+        days (pd.DatetimeIndex): kolejne dni (posortowane)
+        columns (pd.Index): kolumny stacji (np. MultiIndex Wojewodztwo/Miejscowosc/Stacja)
+        sums (np.ndarray): sumy pomiarów, kształt (dni, stacje)
+        counts (np.ndarray): liczby pomiarów (bez braków), kształt (dni, stacje)
+    """
+
+    def __init__(self, days, columns, sums, counts):
+        self.days = days
+        self.columns = columns
+        self.sums = sums
+        self.counts = counts
+
+    def means(self, min_coverage=None):
+        """Zwraca tablicę średnich dziennych (NaN dla dni bez pomiarów albo z udziałem
+        godzin z pomiarem mniejszym niż min_coverage)"""
+        return _masked_means(self.sums, self.counts, min_valid_count(min_coverage, 24))
+
+    def _daily_values(self, level=None, years=None, min_coverage=None):
+        """Zwraca (średnie dzienne, lata kolejnych dni, kolumny) dla poziomu grupowania i lat
+
+        Dla poziomu grupowania wartością grupy jest największa średnia dzienna spośród
+        jej stacji - grupa przekracza limit, jeśli przekroczyła go przynajmniej jedna stacja.
+        """
+        means = self.means(min_coverage)
+        day_years = self.days.year
+        if years is not None:
+            keep = np.isin(day_years, years)
+            means = means[keep]
+            day_years = day_years[keep]
+
+        columns = self.columns
+        if level is not None:
+            codes, groups = pd.factorize(self.columns.get_level_values(level), sort=True)
+            columns = pd.Index(groups, name=level)
+            order = np.argsort(codes, kind="stable")
+            starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+            if len(order):
+                with np.errstate(invalid="ignore"):
+                    means = np.fmax.reduceat(means[:, order], starts, axis=1)
+        return means, day_years, columns
+
+    def days_exceeding(self, limit=15, level=None, years=None, min_coverage=None):
+        """
+        Oblicza liczbę dni w roku, kiedy średnia dzienna przekracza limit.
+
+        Args:
+            limit (float): Limit przekroczenia PM2.5 w µg/m^3. Domyślnie 15.
+            level (str): Poziom grupowania kolumn, np. "Miejscowosc" albo "Wojewodztwo" -
+                dzień liczy się, jeśli limit przekroczyła przynajmniej jedna stacja w grupie.
+                None - każda stacja osobno.
+            years (list): Lata do uwzględnienia. None - wszystkie.
+            min_coverage (float): Minimalny udział godzin z pomiarem, żeby dzień był liczony. None - każdy dzień.
+
+        Returns:
+            pd.DataFrame: DataFrame z liczbą dni przekroczeń dla każdego roku i stacji (lub grupy).
+        """
+        means, day_years, columns = self._daily_values(level, years, min_coverage)
+        exceeded = means > limit
+
+        # dni są posortowane, więc każdy rok to ciągły blok wierszy
+        year_values, starts = np.unique(day_years, return_index=True)
+        if len(starts):
+            counts = np.add.reduceat(exceeded.astype(np.int64), starts, axis=0)
+        else:
+            counts = np.zeros((0, len(columns)), dtype=np.int64)
+        return pd.DataFrame(counts, index=pd.Index(year_values, name="Data"), columns=columns)
+
+    def days_exceeding_sweep(self, limits, level=None, years=None, min_coverage=None):
+        """
+        Oblicza liczby dni przekroczeń dla wielu limitów naraz.
+
+        Każda średnia dzienna jest raz przypisywana do przedziału między kolejnymi
+        limitami, a histogram (rok, stacja, przedział) zsumowany od góry daje liczbę
+        dni powyżej każdego limitu. Dla gęstej siatki limitów wynik to krzywa
+        liczby dni przekroczeń w funkcji progu.
+
+        Args:
+            limits (list): Limity PM2.5 w µg/m^3, np. [15, 25, 35, 50]; powtórzenia są pomijane.
+            level (str): Poziom grupowania kolumn jak w days_exceeding. None - każda stacja osobno.
+            years (list): Lata do uwzględnienia. None - wszystkie.
+            min_coverage (float): Minimalny udział godzin z pomiarem, żeby dzień był liczony. None - każdy dzień.
+
+        Returns:
+            pd.DataFrame: DataFrame z indeksem (Limit, Data) i kolumnami stacji (lub grup).
+        """
+        limits = pd.unique(np.asarray(limits, dtype=np.float64))
+        means, day_years, columns = self._daily_values(level, years, min_coverage)
+        year_values, year_codes = np.unique(day_years, return_inverse=True)
+        n_years, n_columns, n_limits = len(year_values), len(columns), len(limits)
+
+        sorted_limits = np.sort(limits)
+        valid = ~np.isnan(means)
+        # bins = liczba limitów mniejszych od średniej, czyli średnia > sorted_limits[k] dla k < bins
+        bins = np.searchsorted(sorted_limits, means[valid], side="left")
+        rows, cols = np.nonzero(valid)
+        flat = (year_codes[rows] * n_columns + cols) * (n_limits + 1) + bins
+        hist = np.bincount(flat, minlength=n_years * n_columns * (n_limits + 1))
+        hist = hist.reshape(n_years, n_columns, n_limits + 1)
+
+        above = np.cumsum(hist[:, :, ::-1], axis=2)[:, :, ::-1]
+        counts = above[:, :, 1:]  # counts[..., k] = liczba dni > sorted_limits[k]
+
+        # przywrócenie kolejności limitów z argumentu
+        positions = np.searchsorted(sorted_limits, limits, side="left")
+        counts = counts[:, :, positions].transpose(2, 0, 1).reshape(n_limits * n_years, n_columns)
+        index = pd.MultiIndex.from_product([limits, year_values], names=["Limit", "Data"])
+        return pd.DataFrame(counts, index=index, columns=columns)
+
+
+def build_daily_cube(df, parallel=False, workers=None):
+    """
+    Buduje DailyCube (sumy i liczby pomiarów dla każdej stacji i każdego dnia).
+
+    Args:
+        df (pd.DataFrame | HourlyMemmap): DataFrame z danymi PM2.5 i kolumną "Data"
+            albo dane mapowane z dysku (liczone fragmentami stacji).
+        parallel (bool): Jeśli True, stacje są dzielone między procesy.
+        workers (int): Liczba procesów w trybie równoległym; None - liczba rdzeni.
 
     Returns:
-        pd.DataFrame: DataFrame z dziennymi średnimi wartościami PM2.5.
+        DailyCube: kostka z dziennymi agregatami.
     """
-    df_copy = df.copy()
-    # Obliczanie średnich dziennych stężeń na stacje
-    daily_means = (
-        df_copy.groupby(df_copy["Data"].dt.floor("D")).mean(numeric_only=True)
-    )
-    return daily_means
+    dates = df.dates if isinstance(df, HourlyMemmap) else pd.DatetimeIndex(df["Data"])
+    days, columns, sums, counts = _reduce_hours(df, dates.floor("D").to_numpy(), parallel, workers)
+    return DailyCube(pd.DatetimeIndex(days), columns, sums, counts)
+
 
-def calculate_days_exceeding_limit(df, limit=15):
+def calculate_days_exceeding_limit(df, limit=15, cube=None, min_coverage=None):
     """
     Oblicza liczbę dni w roku, kiedy średnia dzienna wartość PM2.5 przekracza określony limit.
     Args:
-        df (pd.DataFrame): DataFrame z danymi PM2.5, gdzie kolumny to kody stacji, a indeks to daty.
+        df (pd.DataFrame | HourlyMemmap): DataFrame z danymi PM2.5, gdzie kolumny to kody stacji, a indeks to daty.
         limit (float): Limit przekroczenia PM2.5 w µg/m^3. Domyślnie 15 µg/m^3.
+        cube (DailyCube): Gotowa kostka z build_daily_cube - jeśli podana, df nie jest ponownie grupowany.
+        min_coverage (float): Minimalny udział godzin z pomiarem, żeby dzień był liczony (np. 0.75).
+            None - każdy dzień z przynajmniej jednym pomiarem.
     Returns:
         pd.DataFrame: DataFrame z liczbą dni przekroczeń dla każdej stacji i roku.
     """
+    if cube is None:
+        cube = build_daily_cube(df)
 
-    df_copy = df.copy()
-    # Obliczanie średnich dziennych stężeń na stacje
-    daily_means = calculate_daily_station_averages(df)
-
-    # Sprawdzanie ile dni w każdym roku przekroczono 15 µg/m^3 dla każdej stacji
-    exceeded = daily_means > limit
-    result = exceeded.groupby(exceeded.index.year).sum()
-
-    return result
+    # Sprawdzanie ile dni w każdym roku przekroczono limit dla każdej stacji
+    return cube.days_exceeding(limit, min_coverage=min_coverage)
 
-def calculate_days_exceeding_limit_by_province(df, limit=15):
+def calculate_days_exceeding_limit_by_province(df, limit=15, cube=None, min_coverage=None):
     """
     Oblicza liczbę dni w roku, kiedy średnia dzienna wartość PM2.5
     przekracza określony limit w danym województwie
     (jeśli przynajmniej jedna stacja w województwie przekroczyła limit).
 
     Args:
-        df (pd.DataFrame): DataFrame z danymi PM2.5.
+        df (pd.DataFrame | HourlyMemmap): DataFrame z danymi PM2.5.
         limit (float): Limit przekroczenia PM2.5 w µg/m^3. Domyślnie 15.
+        cube (DailyCube): Gotowa kostka z build_daily_cube - jeśli podana, df nie jest ponownie grupowany.
+        min_coverage (float): Minimalny udział godzin z pomiarem, żeby dzień stacji był liczony.
 
     Returns:
         pd.DataFrame: DataFrame z liczbą dni przekroczeń dla każdego województwa i roku.
     """
+    if cube is None:
+        cube = build_daily_cube(df)
 
-    df_copy = df.copy()
-    # Obliczanie średnich dziennych
-    daily_means = calculate_daily_station_averages(df)
-    # Sprawdzenie przekroczeń dla każdej stacji
-    exceeded = daily_means > limit
-    # Sprawdzam czy w danym dniu było przekroczenie w województwie
-    exceeded_by_province = (exceeded.groupby(axis=1, level="Wojewodztwo").any())
-    # Zliczanie dni w poszczególnych latach
-    result = (exceeded_by_province.groupby(exceeded_by_province.index.year).sum())
-    return result
+    # Sprawdzam czy w danym dniu było przekroczenie w województwie i zliczam dni w latach
+    return cube.days_exceeding(limit, level="Wojewodztwo", min_coverage=min_coverage)
+
+def calculate_days_exceeding_limits(df, limits=(15, 25, 35, 50), level=None, cube=None, min_coverage=None):
+    """
+    Oblicza liczbę dni w roku z przekroczeniem dla kilku limitów w jednym przebiegu.
+
+    Args:
+        df (pd.DataFrame | HourlyMemmap): DataFrame z danymi PM2.5.
+        limits (list): Limity PM2.5 w µg/m^3. Domyślnie 15, 25, 35 i 50.
+        level (str): "Miejscowosc" albo "Wojewodztwo" - przekroczenie w grupie stacji; None - każda stacja.
+        cube (DailyCube): Gotowa kostka z build_daily_cube - jeśli podana, df nie jest ponownie grupowany.
+        min_coverage (float): Minimalny udział godzin z pomiarem, żeby dzień był liczony.
+
+    Returns:
+        pd.DataFrame: DataFrame z indeksem (Limit, Data) i liczbą dni przekroczeń w kolumnach.
+    """
+    if cube is None:
+        cube = build_daily_cube(df)
+    return cube.days_exceeding_sweep(limits, level=level, min_coverage=min_coverage)
 
 def get_3_lowest_highest(df, year):
     """
@@ -113,11 +459,171 @@ def get_3_lowest_highest(df, year):
     Returns:
         df (pd.DataFrame): DataFrame z 3 stacjami o najmniejszej i 3 stacjami o największej liczbie dni przekroczeń w danym roku.
     """
-    exceed = df.loc[year].copy()
-    smallest3 = exceed.nsmallest(3)
-    largest3 = exceed.nlargest(3)
+    row = df.loc[[year]].to_numpy(dtype=np.float64)
+    smallest3, smallest_values = _select_n(row, 3, largest=False)
+    largest3, largest_values = _select_n(row, 3, largest=True)
+
+    # stacje bez wyniku w danym roku są pomijane, jak w nsmallest/nlargest
+    top_bottom = np.concatenate([smallest3[~np.isnan(smallest_values)], largest3[~np.isnan(largest_values)]])
+    df_results = df.iloc[:, top_bottom]
+
+    return df_results
+
+
+def _select_n(values, n, largest=True):
+    """
+    Wybiera n najmniejszych albo największych wartości wzdłuż ostatniej osi (np.argpartition, O(k)).
+
+    Remisy są rozstrzygane kolejnością kolumn (jak nsmallest/nlargest z keep="first"),
+    a braki (NaN) trafiają na koniec.
+
+    Args:
+        values (np.ndarray): wartości, kształt (..., k)
+        n (int): liczba wybieranych wartości
+        largest (bool): True - największe, False - najmniejsze
+
+    Returns:
+        tuple: (numery kolumn, wartości), oba o kształcie (..., min(n, k)), posortowane od najlepszej
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = min(n, values.shape[-1])
+    if n <= 0:
+        empty = np.empty(values.shape[:-1] + (0,))
+        return empty.astype(np.int64), empty
+    keys = -values if largest else values.copy()
+    keys[np.isnan(keys)] = np.inf
+
+    kth = np.take_along_axis(keys, np.argpartition(keys, n - 1, axis=-1)[..., n - 1:n], axis=-1)
+    better = keys < kth
+    equal = keys == kth
+    # z wartości równych n-tej brane są pierwsze kolumny - w każdym wierszu dokładnie n pozycji
+    missing = n - np.count_nonzero(better, axis=-1, keepdims=True)
+    selected = better | (equal & (np.cumsum(equal, axis=-1) <= missing))
+    positions = np.nonzero(selected)[-1].reshape(values.shape[:-1] + (n,))
+
+    order = np.lexsort((positions, np.take_along_axis(keys, positions, axis=-1)), axis=-1)
+    positions = np.take_along_axis(positions, order, axis=-1)
+    return positions, np.take_along_axis(values, positions, axis=-1)
 
-    top_bottom = list(smallest3.index) + list(largest3.index)
-    df_results = df[top_bottom]
 
-    return df_results
\ No newline at end of file
+def _grouped_cube(df, level):
+    """Układa wyniki (lata, stacje) w tablicę (lata, grupy, stacje w grupie) uzupełnioną brakami
+
+    Returns:
+        tuple: (tablica (lata, grupy, m), numery kolumn df (grupy, m) z -1 dla uzupełnień, nazwy grup)
+    """
+    values = df.to_numpy(dtype=np.float64)
+    if level is None:
+        return values[:, None, :], np.arange(values.shape[1])[None, :], None
+    groups = StationGroups(df.columns, level)
+    sizes = np.diff(groups.bounds)
+    codes = np.repeat(np.arange(len(groups.groups)), sizes)
+    slots = np.arange(len(codes)) - groups.bounds[codes]
+    stations = np.full((len(groups.groups), sizes.max(initial=0)), -1)
+    stations[codes, slots] = groups.order
+    cube = np.full((len(values), len(groups.groups), stations.shape[1]), np.nan)
+    cube[:, codes, slots] = values[:, groups.order]
+    return cube, stations, groups.groups
+
+
+def rank_top_n(df, n=3, largest=True, level=None, across_years=False):
+    """
+    Wybiera n stacji z największą (albo najmniejszą) wartością, np. liczbą dni przekroczeń,
+    dla wszystkich lat i grup naraz (jedno wywołanie np.argpartition).
+
+    Args:
+        df (pd.DataFrame): Wyniki z latami w indeksie i stacjami w kolumnach,
+            np. z calculate_days_exceeding_limit albo calculate_days_exceeding_limit_by_province.
+        n (int): Liczba wybieranych stacji.
+        largest (bool): True - największe wartości, False - najmniejsze.
+        level (str): Poziom kolumn (np. "Wojewodztwo") - ranking osobno w każdej grupie; None - wszystkie stacje.
+        across_years (bool): Jeśli True, ranking par (rok, stacja) ze wszystkich lat razem.
+
+    Returns:
+        pd.DataFrame: DataFrame z indeksem ([rok], [grupa], Pozycja), etykietami stacji,
+            (kolumną z rokiem, jeśli across_years) i kolumną Wartosc. Rok ma nazwę indeksu df
+            (domyślnie "Rok"). Stacje bez wyniku są pomijane.
+    """
+    cube, stations, group_names = _grouped_cube(df, level)
+    n_years, n_groups, size = cube.shape
+    if across_years:
+        positions, values = _select_n(cube.transpose(1, 0, 2).reshape(n_groups, -1), n, largest)
+        years, slots = positions // max(size, 1), positions % max(size, 1)
+        groups = np.broadcast_to(np.arange(n_groups)[:, None], positions.shape)
+    else:
+        slots, values = _select_n(cube, n, largest)
+        years = np.broadcast_to(np.arange(n_years)[:, None, None], slots.shape)
+        groups = np.broadcast_to(np.arange(n_groups)[None, :, None], slots.shape)
+    ranks = np.broadcast_to(np.arange(1, slots.shape[-1] + 1), slots.shape)
+
+    found = ~np.isnan(values)
+    years, groups, slots, ranks = years[found], groups[found], slots[found], ranks[found]
+    result = df.columns[stations[groups, slots]].to_frame(index=False)
+    result["Wartosc"] = values[found]
+
+    index = {}
+    year_name = df.index.name or "Rok"
+    if not across_years:
+        index[year_name] = df.index[years]
+    else:
+        result.insert(len(result.columns) - 1, year_name, df.index[years])
+    if level is not None:
+        index[level] = group_names[groups]
+    index["Pozycja"] = ranks
+    result.index = pd.MultiIndex.from_arrays(list(index.values()), names=list(index.keys()))
+    return result
+
+
+def rank_stations(df, largest=True, level=None):
+    """
+    Wyznacza pozycję każdej stacji w każdym roku (1 - największa wartość, gdy largest=True).
+
+    Stacje z równymi wartościami dostają tę samą, najwyższą pozycję (jak rank(method="min")).
+
+    Args:
+        df (pd.DataFrame): Wyniki z latami w indeksie i stacjami w kolumnach.
+        largest (bool): True - pozycja 1 dla największej wartości, False - dla najmniejszej.
+        level (str): Poziom kolumn (np. "Wojewodztwo") - pozycje w obrębie grupy; None - wśród wszystkich stacji.
+
+    Returns:
+        pd.DataFrame: DataFrame o kształcie df z pozycjami (NaN dla stacji bez wyniku).
+    """
+    cube, stations, _ = _grouped_cube(df, level)
+    keys = -cube if largest else cube.copy()
+    missing = np.isnan(keys)
+    keys[missing] = np.inf
+
+    order = np.argsort(keys, axis=-1, kind="stable")
+    sorted_keys = np.take_along_axis(keys, order, axis=-1)
+    # pozycja pierwszego wystąpienia wartości w posortowanym wierszu - remisy dzielą pozycję
+    first = np.zeros(sorted_keys.shape, dtype=np.int64)
+    first[..., 1:] = np.where(sorted_keys[..., 1:] != sorted_keys[..., :-1], np.arange(1, keys.shape[-1]), 0)
+    ranks = np.empty(keys.shape)
+    np.put_along_axis(ranks, order, np.maximum.accumulate(first, axis=-1) + 1.0, axis=-1)
+    ranks[missing] = np.nan
+
+    result = np.full(df.shape, np.nan)
+    valid = stations >= 0
+    result[:, stations[valid]] = ranks[:, valid]
+    return pd.DataFrame(result, index=df.index, columns=df.columns)
+
+
+def rank_changes(df, year_from, year_to, largest=True, level=None):
+    """
+    Porównuje pozycje stacji w dwóch latach.
+
+    Args:
+        df (pd.DataFrame): Wyniki z latami w indeksie i stacjami w kolumnach.
+        year_from (int): Rok początkowy.
+        year_to (int): Rok końcowy.
+        largest (bool): True - pozycja 1 dla największej wartości, False - dla najmniejszej.
+        level (str): Poziom kolumn (np. "Wojewodztwo") - pozycje w obrębie grupy.
+
+    Returns:
+        pd.DataFrame: DataFrame ze stacjami w indeksie i kolumnami z pozycjami w obu latach
+            oraz kolumną Zmiana (dodatnia - awans bliżej pozycji 1).
+    """
+    ranks = rank_stations(df.loc[[year_from, year_to]], largest, level)
+    result = ranks.T
+    result["Zmiana"] = result[year_from] - result[year_to]
+    return result
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+from calculations import DailyCube, _daily_frame, _monthly_frame, build_daily_cube
+from mmap_store import HourlyMemmap
+
+'''
+Moduł z agregacją danych godzinowych fragmentami (np. rok albo miesiąc naraz), bez wczytywania całości
+'''
+
+DEFAULT_LEVELS = (None, "Wojewodztwo")
+
+
+def _merge_partials(keys, sums, counts, new_keys, new_sums, new_counts):
+    """Łączy częściowe sumy i liczby pomiarów - wiersze z tym samym kluczem są dodawane"""
+    if keys is None:
+        return new_keys, new_sums, new_counts
+    keys = np.concatenate([keys, new_keys])
+    merged, codes = np.unique(keys, return_inverse=True)
+    if len(merged) == len(keys):
+        # bez wspólnych kluczy (zwykły przypadek) - tylko sortowanie wierszy
+        order = np.argsort(codes)
+        return merged, np.concatenate([sums, new_sums])[order], np.concatenate([counts, new_counts])[order]
+    merged_sums = np.zeros((len(merged), sums.shape[1]))
+    merged_counts = np.zeros((len(merged), counts.shape[1]), dtype=np.int64)
+    np.add.at(merged_sums, codes, np.concatenate([sums, new_sums]))
+    np.add.at(merged_counts, codes, np.concatenate([counts, new_counts]))
+    return merged, merged_sums, merged_counts
+
+
+class ChunkedAggregator:
+    """
+    Średnie miesięczne, średnie dzienne i liczby dni przekroczeń liczone z kolejnych
+    fragmentów danych godzinowych.
+
+    Z każdego fragmentu zostają tylko agregaty częściowe (sumy i liczby pomiarów dla
+    miesięcy i dni), które można łączyć. Dni zakończone (starsze niż ostatni dzień
+    fragmentu) są od razu zamieniane na liczby dni przekroczeń w latach dla podanych
+    limitów i poziomów grupowania (wartość grupy to maksimum średnich jej stacji), więc
+    przy keep_daily=False pamięć nie rośnie z liczbą lat. Sumy miesięczne są składane z sum
+    dziennych (dane godzinowe są czytane raz). Jeśli fragmenty nie dzielą dni (np. rok albo
+    miesiąc naraz), średnie dzienne i liczby dni przekroczeń są identyczne z funkcjami
+    z calculations, a średnie miesięczne - z dokładnością do zaokrągleń sumowania.
+
+    Fragmenty muszą mieć te same kolumny stacji i przychodzić w kolejności dat.
+
+    Atrybuty:
+        limits (tuple): limity dobowe PM2.5, dla których liczone są dni przekroczeń
+        levels (tuple): poziomy grupowania (None - każda stacja, np. "Wojewodztwo")
+        min_coverage (float): minimalny udział godzin z pomiarem dla dni i miesięcy; None - bez wymagań
+        keep_daily (bool): czy zachowywać sumy dzienne (potrzebne dla daily_means)
+        columns (pd.Index): kolumny stacji (z pierwszego fragmentu)
+    """
+
+    def __init__(self, limits=(15,), levels=DEFAULT_LEVELS, min_coverage=None, keep_daily=True):
+        self.limits = tuple(limits)
+        self.levels = tuple(levels)
+        self.min_coverage = min_coverage
+        self.keep_daily = keep_daily
+        self.columns = None
+        self._months = (None, None, None)
+        self._days = (None, None, None)  # zachowane dni (keep_daily)
+        self._pending = (None, None, None)  # ostatni dzień - może mieć ciąg dalszy w kolejnym fragmencie
+        self._exceed = {}
+
+    def add(self, df):
+        """
+        Dodaje fragment danych godzinowych.
+
+        Args:
+            df (pd.DataFrame | HourlyMemmap): fragment w układzie z merge_dataframes albo dane mapowane z dysku.
+        """
+        dates = df.dates if isinstance(df, HourlyMemmap) else pd.DatetimeIndex(df["Data"])
+        if not len(dates):
+            return
+        cube = build_daily_cube(df)
+        if self.columns is None:
+            self.columns = cube.columns
+        elif not self.columns.equals(cube.columns):
+            raise ValueError("Fragmenty mają różne kolumny stacji")
+
+        # dni zawierają się w miesiącach - sumy miesięczne z sum dziennych, bez drugiego przebiegu
+        month_keys = cube.days.year * 100 + cube.days.month
+        months, starts = np.unique(month_keys, return_index=True)
+        self._months = _merge_partials(*self._months, months, np.add.reduceat(cube.sums, starts, axis=0),
+                                       np.add.reduceat(cube.counts, starts, axis=0))
+
+        days = cube.days.to_numpy()
+        pending_days = self._pending[0]
+        if pending_days is not None and days[0] < pending_days[0]:
+            raise ValueError("Fragmenty muszą przychodzić w kolejności dat")
+        days, sums, counts = _merge_partials(*self._pending, days, cube.sums, cube.counts)
+
+        # wszystkie dni poza ostatnim są zakończone
+        done = slice(0, len(days) - 1)
+        self._pending = (days[-1:], sums[-1:], counts[-1:])
+        self._fold(days[done], sums[done], counts[done])
+
+    def _fold(self, days, sums, counts):
+        """Dolicza zakończone dni do liczb dni przekroczeń (i do zachowanych dni)"""
+        if not len(days):
+            return
+        if self.keep_daily:
+            self._days = _merge_partials(*self._days, days, sums, counts)
+        self._exceed = self._exceedances(days, sums, counts)
+
+    def _exceedances(self, days, sums, counts):
+        cube = DailyCube(pd.DatetimeIndex(days), self.columns, sums, counts)
+        exceed = dict(self._exceed)
+        for level in self.levels:
+            for limit in self.limits:
+                counted = cube.days_exceeding(limit, level=level, min_coverage=self.min_coverage)
+                old = exceed.get((limit, level))
+                exceed[(limit, level)] = counted if old is None else pd.concat([old, counted]).groupby(level=0).sum()
+        return exceed
+
+    def _cube(self):
+        days, sums, counts = _merge_partials(*self._days, *self._pending)
+        if days is None:
+            return DailyCube(pd.DatetimeIndex([]), self.columns, np.empty((0, 0)), np.empty((0, 0), dtype=np.int64))
+        return DailyCube(pd.DatetimeIndex(days), self.columns, sums, counts)
+
+    def monthly_means(self, return_counts=False):
+        """Średnie miesięczne jak z calculate_station_monthly_averages(df, min_coverage, return_counts)"""
+        months, sums, counts = self._months
+        if months is None:
+            raise ValueError("Nie dodano żadnych danych")
+        return _monthly_frame(months, self.columns, sums, counts, self.min_coverage, return_counts)
+
+    def daily_means(self, return_counts=False):
+        """Średnie dzienne jak z calculate_daily_station_averages(df, min_coverage, return_counts)"""
+        if not self.keep_daily:
+            raise ValueError("Średnie dzienne wymagają keep_daily=True")
+        if self.columns is None:
+            raise ValueError("Nie dodano żadnych danych")
+        return _daily_frame(self._cube(), self.min_coverage, return_counts)
+
+    def days_exceeding(self, limit=15, level=None):
+        """
+        Liczby dni przekroczeń jak z calculate_days_exceeding_limit (level=None)
+        albo calculate_days_exceeding_limit_by_province (level="Wojewodztwo").
+
+        Args:
+            limit (float): jeden z limitów podanych przy tworzeniu
+            level (str): jeden z poziomów podanych przy tworzeniu
+
+        Returns:
+            pd.DataFrame: liczby dni przekroczeń dla każdego roku i stacji (lub grupy)
+        """
+        if limit not in self.limits or level not in self.levels:
+            raise ValueError(f"Nie liczono przekroczeń dla limitu {limit} i poziomu {level}")
+        if self.columns is None:
+            raise ValueError("Nie dodano żadnych danych")
+        # ostatni dzień jest doliczany tylko do wyniku - kolejne fragmenty mogą go jeszcze uzupełnić
+        exceed = self._exceedances(*self._pending)
+        return exceed[(limit, level)]
+
+
+def aggregate_chunks(chunks, limits=(15,), levels=DEFAULT_LEVELS, min_coverage=None, keep_daily=True):
+    """
+    Agreguje kolejne fragmenty danych godzinowych (np. z parquet_store.iter_parquet_chunks).
+
+    Args:
+        chunks (iterable): fragmenty danych godzinowych (pd.DataFrame albo HourlyMemmap) w kolejności dat.
+        limits (tuple): limity dobowe PM2.5 dla liczb dni przekroczeń.
+        levels (tuple): poziomy grupowania dla liczb dni przekroczeń (None - każda stacja).
+        min_coverage (float): minimalny udział godzin z pomiarem dla dni i miesięcy. None - bez wymagań.
+        keep_daily (bool): czy zachowywać sumy dzienne (dla daily_means); False - pamięć niezależna od liczby lat.
+
+    Returns:
+        ChunkedAggregator: agregaty gotowe do odczytu.
+    """
+    aggregator = ChunkedAggregator(limits, levels, min_coverage, keep_daily)
+    for chunk in chunks:
+        aggregator.add(chunk)
+    return aggregator
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+'''
+Moduł ze zwartą reprezentacją połączonych danych godzinowych PM2.5
+'''
+
+_DATE_COLUMN = ("Data", "", "")
+_LEVELS = ["Wojewodztwo", "Miejscowosc", "Stacja"]
+
+
+class CompactHourly:
+    """
+    Zwarta postać DataFrame z merge_dataframes.
+
+    Pomiary są trzymane jako float32 w tablicy (godziny, stacje), stacje jako
+    numery wierszy w osobnej tabeli wymiaru z kolumnami kategorycznymi, a daty
+    jako przesunięcie int32 w sekundach od pierwszego pomiaru (sekundy, a nie
+    godziny, bo po correct_dates pomiary z północy mają godzinę 23:59:59).
+
+    Atrybuty:
+        origin (pd.Timestamp): data pierwszego pomiaru
+        offsets (np.ndarray): przesunięcia int32 w sekundach względem origin
+        values (np.ndarray): pomiary float32, kształt (godziny, stacje)
+        stations (pd.DataFrame): tabela stacji (Wojewodztwo, Miejscowosc, Stacja), indeks = ID stacji
+    """
+
+    def __init__(self, origin, offsets, values, stations):
+        self.origin = origin
+        self.offsets = offsets
+        self.values = values
+        self.stations = stations
+
+    def dates(self):
+        """Zwraca daty pomiarów jako pd.DatetimeIndex"""
+        return self.origin + pd.to_timedelta(self.offsets.astype(np.int64), unit="s")
+
+    def station_ids(self, **labels):
+        """Zwraca ID stacji pasujących do podanych etykiet, np. station_ids(Miejscowosc="Warszawa")"""
+        mask = np.ones(len(self.stations), dtype=bool)
+        for level, value in labels.items():
+            mask &= (self.stations[level] == value).to_numpy()
+        return np.flatnonzero(mask)
+
+    def memory_usage(self):
+        """Zwraca przybliżony rozmiar danych w bajtach"""
+        return (self.offsets.nbytes + self.values.nbytes
+                + int(self.stations.memory_usage(deep=True).sum()))
+
+    def to_frame(self):
+        """
+        Zamienia z powrotem na układ z merge_dataframes (pomiary pozostają float32).
+
+        Returns:
+            pd.DataFrame: DataFrame z kolumną Data i kolumnami MultiIndex stacji.
+        """
+        columns = pd.MultiIndex.from_arrays(
+            [self.stations[level].astype(str).to_numpy() for level in _LEVELS], names=_LEVELS)
+        df = pd.DataFrame(self.values, columns=columns, copy=False)
+        df.insert(0, _DATE_COLUMN, self.dates())
+        return df
+
+
+def to_compact(df):
+    """
+    Zamienia DataFrame z merge_dataframes na CompactHourly.
+
+    Args:
+        df (pd.DataFrame): DataFrame z kolumną Data i kolumnami MultiIndex stacji.
+
+    Returns:
+        CompactHourly: zwarta reprezentacja danych.
+    """
+    dates = pd.DatetimeIndex(df[_DATE_COLUMN])
+    origin = dates.min() if len(dates) else pd.Timestamp(0)
+    seconds = (dates - origin) // pd.Timedelta(seconds=1)
+    if len(seconds) and seconds.max() > np.iinfo(np.int32).max:
+        raise ValueError("Zakres dat jest zbyt duży dla przesunięć int32")
+
+    station_columns = [col for col in df.columns if col != _DATE_COLUMN]
+    stations = pd.DataFrame(station_columns, columns=_LEVELS).astype("category")
+    values = df[station_columns].to_numpy(dtype=np.float32)
+    return CompactHourly(origin, np.asarray(seconds, dtype=np.int32), values, stations)
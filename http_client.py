@@ -0,0 +1,176 @@
+import io
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+'''
+Moduł ze wspólnym klientem HTTP do pobierania plików z serwera GIOS
+'''
+
+DEFAULT_TIMEOUT = (10, 60)  # (nawiązanie połączenia, odczyt) w sekundach
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 0.5  # pierwsza przerwa przed ponowieniem; kolejne są 2x dłuższe
+DEFAULT_POOL_SIZE = 16
+# po zerwaniu połączenia niepełny fragment przepada - wznowienie zaczyna się od ostatniego pełnego
+CHUNK_SIZE = 64 * 1024
+
+# odpowiedzi serwera, po których warto spróbować ponownie
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_RETRY_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+class TransferMetrics:
+    """Liczniki zapytań i przesłanych danych (bezpieczne dla wielu wątków)
+
+    Atrybuty:
+        requests (int): liczba wysłanych zapytań
+        retries (int): liczba ponowień po błędzie
+        resumes (int): liczba wznowień pobierania od przerwanego miejsca (Range)
+        bytes (int): liczba pobranych bajtów
+        seconds (float): łączny czas przesyłania treści odpowiedzi
+        latencies (list): czasy od wysłania zapytania do otrzymania nagłówków odpowiedzi
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.resumes = 0
+            self.bytes = 0
+            self.seconds = 0.0
+            self.latencies = []
+
+    def _add(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                if name == "latency":
+                    self.latencies.append(value)
+                else:
+                    setattr(self, name, getattr(self, name) + value)
+
+    def summary(self):
+        """Zwraca podsumowanie: liczniki, przepustowość (bajty/s) i średnie opóźnienie (s)"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "resumes": self.resumes,
+                "bytes": self.bytes,
+                "bandwidth": self.bytes / self.seconds if self.seconds else 0.0,
+                "mean_latency": sum(self.latencies) / len(self.latencies) if self.latencies else 0.0,
+            }
+
+
+class HttpClient:
+    """Klient HTTP z pulą połączeń (keep-alive), ponowieniami i wznawianiem pobierania
+
+    Po zerwanym połączeniu, przekroczonym czasie albo odpowiedzi 429/5xx zapytanie
+    jest ponawiane z wykładniczo rosnącą przerwą. Jeśli przerwane zostało pobieranie
+    treści, kolejne zapytanie prosi tylko o brakującą część (nagłówek Range).
+
+    Atrybuty:
+        session (requests.Session): sesja z pulą połączeń
+        metrics (TransferMetrics): statystyki pobierania
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 pool_size=DEFAULT_POOL_SIZE):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.metrics = TransferMetrics()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _sleep(self, attempt):
+        self.metrics._add(retries=1)
+        time.sleep(self.backoff * 2 ** (attempt - 1))
+
+    def download(self, url, f, headers=None):
+        """Pobiera plik do otwartego pliku f (binarnie, od bieżącej pozycji równej 0)
+
+        Args:
+            url (str): adres pliku
+            f (file): plik do zapisu, np. BytesIO albo plik otwarty w trybie "w+b"
+            headers (dict): dodatkowe nagłówki, np. If-None-Match
+
+        Returns:
+            requests.Response: ostatnia odpowiedź (status i nagłówki); przy 304 nic nie jest zapisywane
+        """
+        written = 0
+        validator = None
+        attempt = 0
+        while True:
+            request_headers = dict(headers or {})
+            if written:
+                # wznowienie - reszta pliku, o ile na serwerze to nadal ta sama wersja
+                request_headers = {"Range": f"bytes={written}-"}
+                if validator:
+                    request_headers["If-Range"] = validator
+            try:
+                start = time.perf_counter()
+                response = self.session.get(url, headers=request_headers, stream=True, timeout=self.timeout)
+                self.metrics._add(requests=1, latency=time.perf_counter() - start)
+                with response:
+                    if response.status_code in _RETRY_STATUSES and attempt < self.retries:
+                        attempt += 1
+                        self._sleep(attempt)
+                        continue
+                    response.raise_for_status()
+                    if response.status_code == 304:
+                        return response
+
+                    if written and response.status_code == 206:
+                        self.metrics._add(resumes=1)
+                    elif written:
+                        # serwer zignorował Range albo plik się zmienił - pobieranie od początku
+                        f.seek(0)
+                        f.truncate()
+                        written = 0
+                    validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+                    start = time.perf_counter()
+                    try:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                            written += len(chunk)
+                            self.metrics._add(bytes=len(chunk))
+                    finally:
+                        self.metrics._add(seconds=time.perf_counter() - start)
+                    return response
+            except _RETRY_ERRORS:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                self._sleep(attempt)
+
+    def get_content(self, url, headers=None):
+        """Pobiera plik do pamięci
+
+        Returns:
+            tuple: (odpowiedź, zawartość jako bytes)
+        """
+        buffer = io.BytesIO()
+        response = self.download(url, buffer, headers=headers)
+        return response, buffer.getvalue()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Zwraca wspólny klient HTTP (tworzony przy pierwszym użyciu)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import calculations
+import parquet_store
+from cache import DEFAULT_CACHE_DIR
+from load_data import CleaningPipeline, fetch_gios_archive, read_gios_archive
+
+'''
+Moduł do przyrostowej aktualizacji magazynu danych PM2.5 (nowe lub poprawione lata)
+'''
+
+_STATE_FILE = "state.json"
+_MONTHLY_FILE = "monthly_means.parquet"
+_EXCEED_FILE = "exceed_days.parquet"
+_DATE_COLUMN = ("Data", "", "")
+
+
+def load_state(store_dir=parquet_store.DEFAULT_STORE_DIR):
+    """Wczytuje stan magazynu (sumy kontrolne archiwów dla każdego roku)
+
+    Args:
+        store_dir (str): katalog magazynu
+
+    Returns:
+        dict: stan magazynu, pusty jeśli magazyn jeszcze nie istnieje
+    """
+    try:
+        with open(os.path.join(store_dir, _STATE_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_state(store_dir, state):
+    tmp_path = os.path.join(store_dir, _STATE_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, os.path.join(store_dir, _STATE_FILE))
+
+
+def load_aggregates(store_dir=parquet_store.DEFAULT_STORE_DIR):
+    """Wczytuje zapisane średnie miesięczne i liczby dni z przekroczeniem normy
+
+    Args:
+        store_dir (str): katalog magazynu
+
+    Returns:
+        tuple: (średnie miesięczne jak z calculate_station_monthly_averages,
+            liczby dni przekroczeń jak z calculate_days_exceeding_limit)
+    """
+    return (pd.read_parquet(os.path.join(store_dir, _MONTHLY_FILE)),
+            pd.read_parquet(os.path.join(store_dir, _EXCEED_FILE)))
+
+
+def _split_years(merged_df):
+    """Rozdziela połączony DataFrame na lata w układzie z clean_pm25_data"""
+    dates = merged_df[_DATE_COLUMN]
+    stations = merged_df.columns.get_level_values("Stacja")[1:]
+    result = {}
+    for year, part in merged_df.groupby(dates.dt.year):
+        df = pd.DataFrame(part.iloc[:, 1:].to_numpy(), columns=stations)
+        df.insert(0, "Data", part[_DATE_COLUMN].to_numpy())
+        result[year] = df
+    return result
+
+
+def _month_keys(df):
+    dates = df[_DATE_COLUMN]
+    return list(zip(dates.dt.year, dates.dt.month))
+
+
+def _changed_months(old_df, new_df):
+    """Zwraca miesiące (Rok, Miesiąc), w których dane jednego roku się różnią"""
+    def by_month(df):
+        dates = df[_DATE_COLUMN].to_numpy().astype("datetime64[ns]")
+        values = df.iloc[:, 1:].to_numpy(dtype=np.float64)
+        months = pd.Series(_month_keys(df))
+        return {key: (dates[idx], values[idx]) for key, idx in months.groupby(months).groups.items()}
+
+    old_months, new_months = by_month(old_df), by_month(new_df)
+    changed = []
+    for key in sorted(set(old_months) | set(new_months)):
+        old, new = old_months.get(key), new_months.get(key)
+        if (old is None or new is None or not np.array_equal(old[0], new[0])
+                or not np.array_equal(old[1], new[1], equal_nan=True)):
+            changed.append(key)
+    return changed
+
+
+def update_pm25_store(years, gios_archive_url, gios_ids, old_codes, cities, provinces,
+                      store_dir=parquet_store.DEFAULT_STORE_DIR, cache_dir=DEFAULT_CACHE_DIR,
+                      offline=False, limit=15):
+    """Przyrostowo aktualizuje magazyn Parquet oraz zapisane agregaty
+
+    Dla każdego roku archiwum jest pobierane (przez cache) i porównywane z sumą
+    kontrolną SHA-256 zapisaną w state.json. Wczytywane i czyszczone są tylko nowe
+    lub zmienione lata, na dysku nadpisywane są tylko ich partycje, a średnie
+    miesięczne są przeliczane tylko dla miesięcy, w których dane się zmieniły
+    (liczby dni przekroczeń - dla zmienionych lat).
+
+    W magazynie zostają stacje wspólne dla wszystkich lat (jak w merge_dataframes).
+    Jeśli nowy rok zmienia ten zbiór, magazyn i agregaty są zapisywane od nowa.
+
+    Args:
+        years (list): lata, które mają być w magazynie
+        gios_archive_url (str): URL do archiwum GIOS
+        gios_ids (dict): słownik z ID archiwów dla każdego roku
+        old_codes (dict): słownik mapujący stare kody stacji na nowe
+        cities (dict): słownik mapujący kody stacji na nazwy miejscowości
+        provinces (dict): słownik mapujący kody stacji na nazwy wojewódstw
+        store_dir (str): katalog magazynu
+        cache_dir (str): katalog cache pobranych archiwów; None wyłącza cache
+        offline (bool): jeśli True, archiwa są brane wyłącznie z cache
+        limit (float): limit dobowy PM2.5 dla liczby dni przekroczeń
+
+    Returns:
+        dict: {"years": lista przetworzonych lat, "months": lista przeliczonych (Rok, Miesiąc)}
+    """
+    state = load_state(store_dir)
+    checksums = state.get("checksums", {})
+
+    raw_dfs = {}
+    new_checksums = {}
+    for year in years:
+        content = fetch_gios_archive(gios_archive_url, gios_ids[year], cache_dir=cache_dir, offline=offline)
+        sha256 = hashlib.sha256(content).hexdigest()
+        if checksums.get(str(year)) != sha256:
+            raw_dfs[year] = read_gios_archive(year, content)
+            new_checksums[str(year)] = sha256
+
+    # zmiana limitu wymaga przeliczenia wszystkich liczb dni przekroczeń
+    limit_changed = state.get("limit", limit) != limit
+    if not raw_dfs and not limit_changed:
+        return {"years": [], "months": []}
+
+    stored_df = None
+    if os.path.exists(os.path.join(store_dir, _MONTHLY_FILE)):
+        stored_df = parquet_store.load_from_parquet(store_dir)
+
+    if raw_dfs:
+        # tylko przetwarzane lata przechodzą przez pełne czyszczenie
+        pipeline = CleaningPipeline().clean().replace_codes(old_codes).correct_dates()
+        year_dfs = _split_years(stored_df) if stored_df is not None else {}
+        year_dfs = {year: df for year, df in year_dfs.items() if year not in raw_dfs}
+        year_dfs.update(pipeline.run(raw_dfs))
+        merged_df = CleaningPipeline().label(cities, provinces).run(dict(sorted(year_dfs.items())))
+    else:
+        merged_df = stored_df
+
+    changed_years = sorted(raw_dfs)
+    dates = merged_df[_DATE_COLUMN]
+    full_rebuild = stored_df is None or list(stored_df.columns) != list(merged_df.columns)
+    if full_rebuild:
+        months = sorted(set(_month_keys(merged_df)))
+    else:
+        stored_dates = stored_df[_DATE_COLUMN]
+        months = []
+        for year in changed_years:
+            months += _changed_months(stored_df[stored_dates.dt.year == year], merged_df[dates.dt.year == year])
+
+    if raw_dfs:
+        parquet_store.save_to_parquet(merged_df, store_dir, years=None if full_rebuild else changed_years)
+
+    # przeliczenie tylko zmienionych miesięcy i lat
+    exceed_years = sorted(set(dates.dt.year)) if full_rebuild or limit_changed else changed_years
+    month_mask = pd.Series(_month_keys(merged_df), index=merged_df.index).isin(months)
+    month_means = calculations.calculate_station_monthly_averages(merged_df[month_mask])
+    exceed = calculations.calculate_days_exceeding_limit(merged_df[dates.dt.year.isin(exceed_years)], limit=limit)
+    if not full_rebuild:
+        old_means, old_exceed = load_aggregates(store_dir)
+        month_means = pd.concat([old_means[~old_means.index.isin(months)], month_means]).sort_index()
+        exceed = pd.concat([old_exceed[~old_exceed.index.isin(exceed_years)], exceed]).sort_index()
+    month_means.to_parquet(os.path.join(store_dir, _MONTHLY_FILE))
+    exceed.to_parquet(os.path.join(store_dir, _EXCEED_FILE))
+
+    checksums.update(new_checksums)
+    state["checksums"] = checksums
+    state["limit"] = limit
+    _save_state(store_dir, state)
+    return {"years": changed_years, "months": months}
@@ -1,152 +1,392 @@
+import numpy as np
 import pandas as pd
-import requests
+import openpyxl
+import pyarrow as pa
+import pyarrow.compute as pc
 import zipfile
 import io
+import os
 import re
-from bs4 import BeautifulSoup
+import time
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from cache import DEFAULT_CACHE_DIR, get_content, get_path, pinned
+from archive_index import DEFAULT_TTL, load_archive_index
+from mmap_store import process_context
 
 '''
 Moduł do wczytywania i czyszczenia danych
 '''
-def find_gios_pm25_info(year):
+def find_gios_pm25_info(year, cache_dir=DEFAULT_CACHE_DIR, offline=False):
     """
     Znajduje ID i nazwę pliku dla PM2.5 z archiwum GIOS dla podanego roku.
     """
+    return find_gios_pm25_ids([year], cache_dir=cache_dir, offline=offline)[year]
 
-    base_url = "https://powietrze.gios.gov.pl/pjp/archives"
-    archive_prefix = "downloadFile/"
 
+def find_gios_pm25_ids(years, cache_dir=DEFAULT_CACHE_DIR, offline=False, ttl=DEFAULT_TTL):
+    """
+    Znajduje ID archiwów GIOS dla kilku lat z indeksu strony archiwum.
+
+    Strona archiwum jest pobierana i parsowana raz, a indeks (rok -> ID) jest
+    zapisywany w cache i używany ponownie przez ttl sekund. Jeśli w zapisanym
+    indeksie brakuje któregoś roku (np. nowo opublikowanego), strona jest
+    pobierana ponownie niezależnie od ttl (poza trybem offline).
+
+    Args:
+        years (list): lista lat
+        cache_dir (str): katalog cache pobranych plików; None wyłącza cache
+        offline (bool): jeśli True, strona jest brana wyłącznie z cache
+        ttl (float): czas ważności zapisanego indeksu w sekundach
+
+    Returns:
+        dict: słownik rok -> ID archiwum
+    """
     try:
-        r = requests.get(base_url)
-        r.raise_for_status()
+        index = load_archive_index(cache_dir=cache_dir, offline=offline, ttl=ttl)
+        if not offline and any(year not in index.archive_ids for year in years):
+            index = load_archive_index(cache_dir=cache_dir, offline=offline, ttl=0)
     except Exception as e:
         raise RuntimeError(f"Błąd pobierania listy archiwów: {e}")
 
-    soup = BeautifulSoup(r.text, 'html.parser')
+    return {year: index.pm25_id(year) for year in years}
 
-    links = soup.find_all("a", href=True)
 
-    matches = []
-    for a in links:
-        href = a["href"]
-        text = a.get_text(strip=True)
+def _archive_key(gios_id):
+    """Klucz archiwum w cache pobranych plików"""
+    return f"archive-{gios_id}"
 
-        if archive_prefix in href and f"Wyniki pomiarów z {year} roku" in text:
-            gios_id = href.split(archive_prefix)[-1]
-            matches.append(gios_id)
 
-    if not matches:
-        raise RuntimeError(f"Nie znaleziono archiwum PM2.5 dla roku {year}")
+def fetch_gios_archive(gios_archive_url, gios_id, cache_dir=DEFAULT_CACHE_DIR, offline=False):
+    """ Pobiera archiwum ZIP z GIOS (z cache, jeśli plik na serwerze się nie zmienił)
+    Args:
+        gios_archive_url (str): URL do archiwum GIOS
+        gios_id (str): ID archiwum GIOS
+        cache_dir (str): katalog cache pobranych archiwów; None wyłącza cache
+        offline (bool): jeśli True, archiwum jest brane wyłącznie z cache
 
-    return matches[0]
+    Returns:
+        bytes: zawartość archiwum ZIP
+    """
+    url = f"{gios_archive_url}{gios_id}"
+    return get_content(url, _archive_key(gios_id), cache_dir, offline)
 
 
-def download_gios_archive(year, gios_archive_url, gios_id):
-    """ Ściąganie podanego archiwum GIOS i wczytanie pliku z danymi PM2.5 do DataFrame
+def fetch_gios_archive_path(gios_archive_url, gios_id, cache_dir=DEFAULT_CACHE_DIR, offline=False):
+    """ Pobiera archiwum ZIP z GIOS strumieniowo na dysk, bez trzymania go w pamięci
     Args:
-        year (int): rok
         gios_archive_url (str): URL do archiwum GIOS
         gios_id (str): ID archiwum GIOS
-        filename (str): nazwa pliku do pobrania
+        cache_dir (str): katalog cache pobranych archiwów; None - archiwum trafia do pliku
+            tymczasowego, który trzeba usunąć po wczytaniu
+        offline (bool): jeśli True, archiwum jest brane wyłącznie z cache
 
     Returns:
-        pd.DataFrame: dane PM2.5 dla podanego roku
+        str: ścieżka do pliku archiwum ZIP
     """
-    # Pobranie archiwum ZIP do pamięci
     url = f"{gios_archive_url}{gios_id}"
-    response = requests.get(url)
-    response.raise_for_status()  # jeśli błąd HTTP, zatrzymaj
+    return get_path(url, _archive_key(gios_id), cache_dir, offline)
+
+
+_DATE_FORMAT = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+
+
+def _to_float(value):
+    """Zamienia wartość komórki na float (przecinek dziesiętny, puste komórki -> NaN)"""
+    if value is None or value == '':
+        return np.nan
+    if isinstance(value, str):
+        return float(value.replace(',', '.'))
+    return float(value)
+
+
+def parse_numeric_block(values):
+    """Zamienia cały blok komórek z pomiarami na liczby float64
+
+    Jeśli wszystkie komórki są już liczbami (lub tekstem z kropką), blok jest rzutowany
+    od razu. W przeciwnym razie komórki trafiają do jednej tablicy tekstowej Arrow,
+    separator dziesiętny jest sprawdzany raz dla całego pliku, a zamiana przecinków
+    i konwersja na liczby odbywają się na całym bloku naraz.
+
+    Args:
+        values (np.ndarray): dwuwymiarowa tablica komórek (dtype object)
+
+    Returns:
+        np.ndarray: tablica float64 o tym samym kształcie, puste komórki jako NaN
+    """
+    try:
+        return values.astype(np.float64)
+    except (TypeError, ValueError):
+        pass
+
+    flat = values.ravel()
+    try:
+        strings = pa.array(flat, type=pa.string(), from_pandas=True)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # komórki liczbowe i tekstowe w jednym bloku - wszystko zamieniamy na tekst
+        strings = pa.array(np.where(pd.isna(flat), None, flat.astype(str)), type=pa.string(), from_pandas=True)
+
+    if pc.any(pc.match_substring(strings, ',')).as_py():
+        strings = pc.replace_substring(strings, ',', '.')
+
+    def to_float(strings):
+        strings = pc.if_else(pc.equal(strings, ''), pa.scalar(None, pa.string()), strings)
+        return pc.cast(strings, pa.float64())
+
+    try:
+        numbers = to_float(strings)
+    except pa.ArrowInvalid:
+        # spacje wokół liczb - przycinane tylko wtedy, gdy rzeczywiście występują
+        numbers = to_float(pc.utf8_trim_whitespace(strings))
+    return numbers.to_numpy(zero_copy_only=False).reshape(values.shape)
+
+
+def stream_pm25_xlsx(f):
+    """ Wczytuje strumieniowo plik xlsx z danymi PM2.5 od razu do postaci oczyszczonej
+
+    Wiersze arkusza są czytane po kolei (openpyxl w trybie read-only), bez wczytywania
+    całego arkusza do DataFrame. Pomiary trafiają bezpośrednio do tablicy float32.
+
+    Args:
+        f (file): plik xlsx (np. otwarty element archiwum ZIP)
+
+    Returns:
+        pd.DataFrame: dane w takim układzie jak z clean_pm25_data (kolumna 'Data' i kolumny stacji)
+    """
+    wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+
+        stations = None
+        for row in rows:
+            if row and row[0] == 'Kod stacji':
+                stations = list(row[1:])
+                break
+        if stations is None:
+            raise RuntimeError("Błąd: nie znaleziono wiersza 'Kod stacji' w pliku PM2.5.")
+
+        # liczba wierszy z wymiarów arkusza; jeśli jej brak, tablica jest powiększana w trakcie
+        capacity = ws.max_row or 9000
+        values = np.empty((capacity, len(stations)), dtype=np.float32)
+        dates = []
+        for row in rows:
+            first = row[0] if row else None
+            if not (hasattr(first, 'hour') or (isinstance(first, str) and _DATE_FORMAT.match(first))):
+                continue
+            if len(dates) == capacity:
+                capacity *= 2
+                values = np.resize(values, (capacity, len(stations)))
+            i = len(dates)
+            for j in range(len(stations)):
+                values[i, j] = _to_float(row[j + 1]) if j + 1 < len(row) else np.nan
+            dates.append(first)
+    finally:
+        wb.close()
+
+    df = pd.DataFrame(values[:len(dates)], columns=stations)
+    df.insert(0, 'Data', pd.to_datetime(pd.Series(dates, dtype=object).astype(str)))
+    return df
+
+
+def _find_pm25_member(z, year):
+    """Zwraca nazwę pliku z danymi godzinowymi PM2.5 w archiwum ZIP"""
+    candidates = [
+        name for name in z.namelist()
+        if re.search(r"PM2?\.?5.*1g.*\.xlsx$", name, re.I)
+    ]
+    if not candidates:
+        raise RuntimeError(f"Błąd: nie znaleziono pliku PM2.5 w archiwum {year}.")
+    return candidates[0]
+
+
+def read_gios_archive(year, content, streaming=False):
+    """ Wczytuje plik z danymi PM2.5 z archiwum ZIP do DataFrame
+
+    Archiwum może być podane jako bytes albo jako ścieżka do pliku na dysku. W drugim
+    przypadku czytany jest tylko katalog centralny ZIP i wybrany plik, więc w pamięci
+    jest naraz co najwyżej jeden rozpakowany plik xlsx, a nie całe archiwum.
+
+    Args:
+        year (int): rok
+        content (bytes | str): zawartość archiwum ZIP albo ścieżka do niego
+        streaming (bool): jeśli True, plik jest czytany przez stream_pm25_xlsx
+            i zwracany od razu w postaci oczyszczonej
+
+    Returns:
+        pd.DataFrame: dane PM2.5 dla podanego roku
+    """
     df = pd.DataFrame()
-    
-    # Otwórz zip w pamięci
-    with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-        # znajdź właściwy plik z PM2.5
-        candidates = [
-            name for name in z.namelist()
-            if re.search(r"PM2?\.?5.*1g.*\.xlsx$", name, re.I)
-
-        ]
-
-        if not candidates:
-            raise RuntimeError(f"Błąd: nie znaleziono pliku PM2.5 w archiwum {year}.")
-        
-        filename = candidates[0]
-        # wczytaj plik do pandas
-        with z.open(filename) as f:
-            try:
-                df = pd.read_excel(f, header=None)
-            except Exception as e:
-                print(f"Błąd przy wczytywaniu {year}: {e}")
+
+    source = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+    with zipfile.ZipFile(source) as z:
+        filename = _find_pm25_member(z, year)
+        # xlsx to też ZIP - parser skacze po pliku, więc jest on rozpakowywany raz do pamięci,
+        # zamiast wielokrotnie dekompresować element archiwum przy każdym cofnięciu
+        f = io.BytesIO(z.read(filename))
+        if streaming:
+            return stream_pm25_xlsx(f)
+        try:
+            df = pd.read_excel(f, header=None)
+        except Exception as e:
+            print(f"Błąd przy wczytywaniu {year}: {e}")
     return df
 
 
-def load_pm25_data(years, gios_archive_url, gios_ids):
+def download_gios_archive(year, gios_archive_url, gios_id, cache_dir=DEFAULT_CACHE_DIR, offline=False,
+                          streaming=False, in_memory=False):
+    """ Ściąganie podanego archiwum GIOS i wczytanie pliku z danymi PM2.5 do DataFrame
+
+    Domyślnie archiwum jest pobierane strumieniowo na dysk (do cache albo pliku
+    tymczasowego) i wypakowywany jest z niego tylko plik PM2.5.
+
+    Args:
+        year (int): rok
+        gios_archive_url (str): URL do archiwum GIOS
+        gios_id (str): ID archiwum GIOS
+        cache_dir (str): katalog cache pobranych archiwów; None wyłącza cache
+        offline (bool): jeśli True, archiwum jest brane wyłącznie z cache
+        streaming (bool): jeśli True, plik xlsx jest czytany strumieniowo i od razu czyszczony
+        in_memory (bool): jeśli True, całe archiwum jest pobierane do pamięci (poprzednie działanie)
+
+    Returns:
+        pd.DataFrame: dane PM2.5 dla podanego roku
+    """
+    if in_memory:
+        content = fetch_gios_archive(gios_archive_url, gios_id, cache_dir=cache_dir, offline=offline)
+        return read_gios_archive(year, content, streaming=streaming)
+
+    path = fetch_gios_archive_path(gios_archive_url, gios_id, cache_dir=cache_dir, offline=offline)
+    try:
+        return read_gios_archive(year, path, streaming=streaming)
+    finally:
+        if cache_dir is None:
+            os.remove(path)
+
+
+def _parse_year(year, content, clean, streaming=False, remove=False):
+    """Wczytuje (i opcjonalnie czyści) dane jednego roku - uruchamiane w osobnym procesie"""
+    start = time.perf_counter()
+    try:
+        df = read_gios_archive(year, content, streaming=streaming)
+    finally:
+        if remove:
+            os.remove(content)
+    if clean and not streaming:
+        df = clean_pm25_data({year: df})[year]
+    return df, time.perf_counter() - start
+
+
+def load_pm25_data(years, gios_archive_url, gios_ids, cache_dir=DEFAULT_CACHE_DIR, offline=False,
+                   parallel=False, download_workers=4, parse_workers=None, clean=False, timings=None,
+                   streaming=False, in_memory=False):
     """ Pobiera dane PM2.5 dla podanych lat z archiwum GIOS
+
+    W trybie równoległym archiwa są pobierane w puli wątków, a każdy plik xlsx
+    jest wczytywany (i czyszczony) w puli procesów zaraz po pobraniu. Procesy
+    dostają ścieżkę do archiwum na dysku zamiast jego zawartości.
+
     Args:
         years (list): lista lat do pobrania
         gios_archive_url (str): URL do archiwum GIOS
         gios_ids (dict): słownik z ID archiwów dla każdego roku
-        filenames (dict): słownik z nazwami plików dla każdego roku
+        cache_dir (str): katalog cache pobranych archiwów; None wyłącza cache
+        offline (bool): jeśli True, archiwa są brane wyłącznie z cache
+        parallel (bool): jeśli True, lata są przetwarzane równolegle
+        download_workers (int): liczba wątków pobierających archiwa
+        parse_workers (int): liczba procesów wczytujących pliki xlsx; None - liczba rdzeni
+        clean (bool): jeśli True, dane są od razu czyszczone przez clean_pm25_data
+        streaming (bool): jeśli True, pliki xlsx są czytane strumieniowo przez stream_pm25_xlsx
+            i zwracane od razu oczyszczone (z pomiarami jako float32), niezależnie od clean
+        in_memory (bool): jeśli True, archiwa są pobierane w całości do pamięci (poprzednie działanie)
+        timings (dict): jeśli podany, zostaną do niego zapisane czasy etapów w sekundach:
+            rok -> {"download", "parse"} w trybie równoległym, rok -> {"load", "clean"}
+            w trybie sekwencyjnym oraz "total" - łączny czas
     Returns:
         dict: słownik z DataFrame dla każdego roku
     """
-    data_frames = {} # słownik do przechowywania DataFrame dla każdego roku
-    for year in years:
-        df = download_gios_archive(year, gios_archive_url, gios_ids[year])
-        data_frames[year] = df
-
-    return data_frames
+    if timings is None:
+        timings = {}
+    total_start = time.perf_counter()
 
-
-def load_metadata():
+    data_frames = {} # słownik do przechowywania DataFrame dla każdego roku
+    if not parallel:
+        for year in years:
+            start = time.perf_counter()
+            df = download_gios_archive(year, gios_archive_url, gios_ids[year], cache_dir=cache_dir,
+                                       offline=offline, streaming=streaming, in_memory=in_memory)
+            timings[year] = {"load": time.perf_counter() - start}
+            if clean and not streaming:
+                start = time.perf_counter()
+                df = clean_pm25_data({year: df})[year]
+                timings[year]["clean"] = time.perf_counter() - start
+            data_frames[year] = df
+        timings["total"] = time.perf_counter() - total_start
+        return data_frames
+
+    def fetch(year):
+        start = time.perf_counter()
+        fetch_archive = fetch_gios_archive if in_memory else fetch_gios_archive_path
+        content = fetch_archive(gios_archive_url, gios_ids[year], cache_dir=cache_dir, offline=offline)
+        return content, time.perf_counter() - start
+
+    # procesy nie mogą powstawać przez fork - w tym czasie działają już wątki pobierające;
+    # pobrane archiwa czekają na wczytanie, więc kolejne pobrania nie mogą ich usunąć z cache
+    with pinned(_archive_key(gios_ids[year]) for year in years), \
+            ThreadPoolExecutor(max_workers=download_workers) as download_pool, \
+            ProcessPoolExecutor(max_workers=parse_workers, mp_context=process_context()) as parse_pool:
+        downloads = {download_pool.submit(fetch, year): year for year in years}
+        parses = {}
+        # wczytywanie roku startuje zaraz po jego pobraniu, bez czekania na pozostałe
+        for future in as_completed(downloads):
+            year = downloads[future]
+            content, download_time = future.result()
+            timings[year] = {"download": download_time}
+            # plik tymczasowy (bez cache) jest usuwany przez proces, który go wczytał
+            remove = not in_memory and cache_dir is None
+            parses[year] = parse_pool.submit(_parse_year, year, content, clean, streaming, remove)
+
+        for year, future in parses.items():
+            data_frames[year], timings[year]["parse"] = future.result()
+
+    timings["total"] = time.perf_counter() - total_start
+    # kolejność lat taka jak w argumencie years
+    return {year: data_frames[year] for year in years}
+
+
+def load_metadata(cache_dir=DEFAULT_CACHE_DIR, offline=False):
     """ Wyszukuje najnowszy plik metadanych GIOS na stronie archiwum,
         pobiera go i zwraca jako DataFrame.
 
+    Args:
+        cache_dir (str): katalog cache pobranych plików; None wyłącza cache
+        offline (bool): jeśli True, pliki są brane wyłącznie z cache
+
     Returns:
         pd.DataFrame: dane metadanych GIOS
     """
     
-    archive_url = "https://powietrze.gios.gov.pl/pjp/archives"
-
     try:
-        r = requests.get(archive_url)
-        r.raise_for_status()
+        index = load_archive_index(cache_dir=cache_dir, offline=offline)
     except Exception as e:
         print(f"Błąd pobierania strony archiwum: {e}")
         return None
 
-    soup = BeautifulSoup(r.text, "html.parser")
-
-    # Linki z 'downloadFile/...'
-    links = soup.find_all("a", href=True)
-    candidates = []
-
-    for a in links:
-        href = a["href"]
-        text = a.get_text(strip=True).lower()
-
-        # warunek: tekst zawiera metadane itp.
-        if "meta" in text and "downloadFile" in href:
-            candidates.append((text, href))
-
-    if not candidates:
+    href = index.metadata_href()
+    if href is None:
         print("Nie znaleziono pliku metadanych!")
         return None
 
-    text, href = candidates[0]
-
     file_url = "https://powietrze.gios.gov.pl" + href
 
     try:
-        r = requests.get(file_url)
-        r.raise_for_status()
+        content = get_content(file_url, f"metadata-{href.split('downloadFile/')[-1]}", cache_dir, offline)
     except Exception as e:
         print(f"Błąd pobierania pliku metadanych: {e}")
         return None
 
     try:
-        df = pd.read_excel(BytesIO(r.content), header=0)
+        df = pd.read_excel(BytesIO(content), header=0)
         df = df.rename(columns={'Stary Kod stacji \n(o ile inny od aktualnego)': 'Stary Kod stacji'})
     except Exception as e:
         print(f"Błąd odczytu pliku metadanych: {e}")
@@ -167,19 +407,99 @@ def get_old_station_codes(metadata_df):
             3) słownik mapujący kody stacji na nazwy wojewódstw
 
     """
-    metadata_filtered = metadata_df[metadata_df["Stary Kod stacji"].notna()]
-    old_codes = {}
-    for k, row in metadata_filtered.iterrows():
-        old = row['Stary Kod stacji']
-        new = row['Kod stacji']
-        if isinstance(old, str):
-            for code in old.split(','): # w jednej komórce metadanych może być kilka starych kodów rozdzielonych przecinkiem
-                old_codes[code.strip()] = new
+    pairs = _old_code_pairs(metadata_df)
+    old_codes = dict(zip(pairs["old"], pairs["new"]))
     cities = dict(zip(metadata_df["Kod stacji"], metadata_df["Miejscowość"]))
     provinces = dict(zip(metadata_df["Kod stacji"], metadata_df["Województwo"]))
     return old_codes, cities, provinces
 
 
+def _old_code_pairs(metadata_df):
+    """Zwraca DataFrame z parami (old, new) - po jednym wierszu na każdy stary kod"""
+    # w jednej komórce metadanych może być kilka starych kodów rozdzielonych przecinkiem;
+    # komórki, które nie są tekstem, są pomijane (kolumna z samymi brakami jest typu float)
+    column = metadata_df["Stary Kod stacji"]
+    column = column[column.map(lambda value: isinstance(value, str))].astype(object)
+    old = column.str.split(',').explode().dropna().str.strip()
+    pairs = pd.DataFrame({"old": old, "new": metadata_df.loc[old.index, "Kod stacji"]})
+    return pairs[pairs["old"] != ""].reset_index(drop=True)
+
+
+class StationRegistry:
+    """Słowniki kodów stacji z metadanych GIOS z gotowym indeksem do zamiany kodów
+
+    Stare kody są od razu rozwiązywane do ostatniego aktualnego kodu (A -> B -> C
+    daje A -> C), więc zamiana kodów w kolumnach to jedno wyszukanie w słowniku
+    na kolumnę.
+
+    Atrybuty:
+        old_codes (dict): stary kod -> aktualny kod (po rozwiązaniu łańcuchów zmian)
+        cities (dict): kod stacji -> miejscowość
+        provinces (dict): kod stacji -> województwo
+        conflicts (dict): stary kod -> lista różnych nowych kodów podanych w metadanych
+            (użyty jest ostatni, jak w get_old_station_codes) albo kodów tworzących cykl
+    """
+
+    def __init__(self, old_codes, cities, provinces, conflicts=None):
+        self.cities = cities
+        self.provinces = provinces
+        self.conflicts = dict(conflicts or {})
+        self.old_codes = self._resolve_chains(old_codes)
+
+    def _resolve_chains(self, old_codes):
+        resolved = {}
+        for old in old_codes:
+            chain = [old]
+            code = old_codes[old]
+            while code in old_codes and code not in chain:
+                chain.append(code)
+                code = old_codes[code]
+            if code in chain:
+                self.conflicts[old] = chain
+            resolved[old] = code
+        return resolved
+
+    def resolve(self, code):
+        """Zwraca aktualny kod stacji (albo ten sam kod, jeśli nie jest stary)"""
+        return self.old_codes.get(code, code)
+
+    def unmapped(self, codes):
+        """Zwraca kody, których po zamianie nie ma w metadanych (brak miejscowości i województwa)"""
+        return [code for code in codes if self.resolve(code) not in self.cities]
+
+    def rename_columns(self, df):
+        """Zwraca DataFrame z zamienionymi kodami stacji (kolumna 'Data' bez zmian)"""
+        stations = [df.columns[0]] + [self.resolve(code) for code in df.columns[1:]]
+        return df.set_axis(stations, axis=1)
+
+    def apply(self, dfs):
+        """Zamienia stare kody stacji na aktualne - jak replace_old_codes
+
+        Args:
+            dfs (dict): słownik z DataFrame dla każdego roku
+
+        Returns:
+            dict: słownik z DataFrame z zamienionymi kodami stacji
+        """
+        return {year: self.rename_columns(df) for year, df in dfs.items()}
+
+
+def build_station_registry(metadata_df):
+    """ Buduje StationRegistry z metadanych
+
+    Args:
+        metadata_df (pd.DataFrame): dane metadanych GIOS
+
+    Returns:
+        StationRegistry: słowniki kodów stacji, miejscowości i województw
+    """
+    pairs = _old_code_pairs(metadata_df)
+    new_codes = pairs.groupby("old", sort=False)["new"].unique()
+    conflicts = {old: list(codes) for old, codes in new_codes.items() if len(codes) > 1}
+    old_codes, cities, provinces = get_old_station_codes(metadata_df)
+    return StationRegistry(old_codes, cities, provinces, conflicts)
+
+
 def clean_pm25_data(dfs):
     """Czyści Dataframe z danymi PM2.5
 
@@ -191,33 +511,42 @@ def clean_pm25_data(dfs):
     """
     result_dfs = {}
     for year, df in dfs.items():
-        cleaned_df = df.copy()
-        date_format = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+        dates, stations, values = _extract_measurements(df)
+        result_dfs[year] = _build_frame(dates, stations, values)
+
+    return result_dfs
 
-        # Zostawiamy tylko wiersze z potrzebnymi danymi
-        mask = (cleaned_df.iloc[:, 0].astype(str).str.match(date_format) |
-                (cleaned_df.iloc[:, 0] == 'Kod stacji'))
-        
-        cleaned_df = cleaned_df[mask].reset_index(drop=True)
 
-        # Ustawienie wiersza gdzie jest 'Kod stacji' jako nagłówki kolumn
-        id = cleaned_df[cleaned_df.iloc[:, 0] == 'Kod stacji'].index[0]
-        cleaned_df.columns = cleaned_df.loc[id].tolist()
-        cleaned_df = cleaned_df.drop(index=id).reset_index(drop=True)
+def _extract_measurements(df):
+    """Wyciąga z surowego arkusza GIOS daty, kody stacji i pomiary
 
-        # Przemianowanie kolumny z datami i zmiana na format datetime
-        cleaned_df = cleaned_df.rename(columns={'Kod stacji': 'Data'})
-        cleaned_df['Data'] = pd.to_datetime(cleaned_df['Data'])
+    Returns:
+        tuple: (daty jako pd.DatetimeIndex, lista kodów stacji, tablica float64 z pomiarami)
+    """
+    first = df.iloc[:, 0]
 
-        # Zamiana przecinków na kropki (jeśli plik używa przecinków jako separatora dziesiętnego, np. 2018)
-        # tylko kolumny pomiarowe (bez daty)
-        cols = cleaned_df.columns.drop("Data")
+    # Zostawiamy tylko wiersze z potrzebnymi danymi
+    mask = first.astype(str).str.match(_DATE_FORMAT) | (first == 'Kod stacji')
+    positions = np.flatnonzero(mask.to_numpy())
 
-        cleaned_df[cols] = (cleaned_df[cols].astype(str).apply(lambda s: s.str.replace(',', '.', regex=False)).replace('', pd.NA).astype(float))
+    # Wiersz gdzie jest 'Kod stacji' to nagłówki kolumn
+    is_header = (first.iloc[positions] == 'Kod stacji').to_numpy()
+    header = positions[is_header][0]
+    rows = positions[positions != header]
 
-        result_dfs[year] = cleaned_df
+    stations = df.iloc[header, 1:].tolist()
+    dates = pd.DatetimeIndex(pd.to_datetime(first.iloc[rows]))
 
-    return result_dfs
+    # Zamiana przecinków na kropki (jeśli plik używa przecinków jako separatora dziesiętnego, np. 2018)
+    values = parse_numeric_block(df.iloc[rows, 1:].to_numpy(dtype=object))
+    return dates, stations, values
+
+
+def _build_frame(dates, stations, values):
+    """Składa DataFrame z kolumną 'Data' i kolumnami stacji"""
+    df = pd.DataFrame(values, columns=stations)
+    df.insert(0, 'Data', dates)
+    return df
 
 
 def replace_old_codes(dfs, old_codes):
@@ -232,76 +561,241 @@ def replace_old_codes(dfs, old_codes):
     """
     result_dfs = {}
     for year, df in dfs.items():
-        changed_df = df.copy()
-        stations = changed_df.columns.tolist()
-
-        for station in stations[1:]:
-            if station in old_codes:
-                new_code = old_codes[station]                
-                stations[stations.index(station)] = new_code
-
-
-        changed_df.columns = stations
-        result_dfs[year] = changed_df
+        stations = df.columns.tolist()
+        # jedno wyszukanie w słowniku na kolumnę
+        stations[1:] = [old_codes.get(station, station) for station in stations[1:]]
+        result_dfs[year] = df.set_axis(stations, axis=1)
 
     return result_dfs
 
 
-def correct_dates(dfs):
+def correct_dates(dfs, mode="midnight"):
     """Poprawia daty
 
     Args:
         dfs (dict): słownik z DataFrame dla każdego roku
+        mode (str): sposób korekty - jak w correct_timestamps
 
     Returns:
         dict: słownik z DataFrame z poprawionymi datami
     """
     result_dfs = {}
     for year, df in dfs.items():
-        changed_df = df.copy()
+        dates = correct_timestamps(df['Data'], mode=mode)
+        result_dfs[year] = df.assign(Data=pd.Series(dates, index=df.index))
 
+    return result_dfs
 
-        cutoff = pd.Timedelta(seconds=59)
-        mask_midnight = changed_df['Data'].dt.time <= (pd.Timestamp("00:00:00") + cutoff).time()
 
-        # korekta
-        changed_df.loc[mask_midnight, 'Data'] = (changed_df.loc[mask_midnight, 'Data'].dt.normalize() - pd.Timedelta(seconds=1))
+_SECOND_NS = 1_000_000_000
+_HOUR_NS = 3600 * _SECOND_NS
+_DAY_NS = 24 * _HOUR_NS
+_MIDNIGHT_CUTOFF_NS = 59 * _SECOND_NS
 
-        result_dfs[year] = changed_df
-        
-    return result_dfs
 
+def correct_timestamps(dates, mode="midnight"):
+    """Koryguje znaczniki czasu pomiarów godzinowych na liczbach int64 (nanosekundy)
+
+    GIOS oznacza godzinę jej końcem - pomiar z godziny 23-24 ma znacznik 00:00 następnego dnia.
+
+    Args:
+        dates (pd.Series | pd.DatetimeIndex | np.ndarray): znaczniki czasu
+        mode (str): "midnight" - pomiary z pierwszej minuty doby (przesunięcie od początku
+            doby do 59 s) są przenoszone na 23:59:59 poprzedniego dnia, tak aby należały do
+            właściwego dnia, miesiąca i roku; "hour_start" - cały indeks jest przesuwany
+            o godzinę wstecz, tak aby każda godzina była oznaczona jej początkiem
+
+    Returns:
+        pd.DatetimeIndex: poprawione znaczniki czasu
+    """
+    ns = np.asarray(dates, dtype="datetime64[ns]").view(np.int64)
+    not_nat = ns != np.iinfo(np.int64).min
 
-def merge_dataframes(dfs, cities,provinces,):
+    if mode == "midnight":
+        offset = ns % _DAY_NS
+        shift = np.where(not_nat & (offset <= _MIDNIGHT_CUTOFF_NS), offset + _SECOND_NS, 0)
+    elif mode == "hour_start":
+        shift = np.where(not_nat, _HOUR_NS, 0)
+    else:
+        raise ValueError(f"Nieznany sposób korekty dat: {mode}")
+
+    return pd.DatetimeIndex((ns - shift).view("datetime64[ns]"))
+
+
+def merge_dataframes(dfs, cities,provinces, join="inner", duplicates="mean"):
     """Łączy dane z różnych lat w jeden Dataframe
 
     Args:
         dfs (dict): słownik z DataFrame dla każdego roku
         cities (dict): słownik mapujący kody stacji na nazwy miejscowości
         provinces (dict): łownik mapujący kody stacji na nazwy wojewódstw
+        join (str): "inner" - tylko stacje obecne we wszystkich latach,
+            "outer" - wszystkie stacje, z brakami (NaN) w latach bez pomiarów
+        duplicates (str): jak łączyć kolumny o tym samym kodzie stacji w jednym roku
+            (np. dwa stare kody zamienione na ten sam nowy): "mean" - średnia
+            z dostępnych wartości, "first" - wartość z pierwszej kolumny, a braki
+            uzupełniane z kolejnych
 
     Returns:
         dict: słownik z DataFrame z poprawionymi datami
     """
-    merged_df = pd.concat(dfs.values(), axis=0, join='inner', ignore_index=True)
-    
-    # Zamiana na MultiIndex
-    new_columns = []
-    for col in merged_df.columns:
-        if col == "Data":
-            new_columns.append(("Data", "", ""))  # np. zostaw "Data" jako kolumnę dat
+    parts = []
+    for df in dfs.values():
+        measurements = df.loc[:, df.columns != "Data"]
+        values = measurements.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        parts.append((df["Data"], measurements.columns.tolist(), values))
+    return _merge_parts(parts, cities, provinces, join=join, duplicates=duplicates)
+
+
+def _coalesce(values, duplicates):
+    """Łączy kilka kolumn pomiarów jednej stacji w jedną"""
+    if duplicates == "mean":
+        valid = ~np.isnan(values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(valid, values, 0).sum(axis=1) / valid.sum(axis=1)
+    result = values[:, 0].copy()
+    for k in range(1, values.shape[1]):
+        missing = np.isnan(result)
+        result[missing] = values[missing, k]
+    return result
+
+
+def _merge_parts(parts, cities, provinces, join="inner", duplicates="mean"):
+    """Łączy lata podane jako (daty, kody stacji, tablica pomiarów) w DataFrame z MultiIndex
+
+    Wynik jest budowany w jednej, wcześniej zaalokowanej tablicy (wiersze wszystkich lat,
+    kolumny wszystkich stacji), bez kolejnych pd.concat.
+    """
+    if join not in ("inner", "outer"):
+        raise ValueError(f"Nieznany sposób łączenia: {join}")
+    if duplicates not in ("mean", "first"):
+        raise ValueError(f"Nieznany sposób łączenia duplikatów: {duplicates}")
+
+    if join == "inner":
+        common = set(parts[0][1])
+        for _, stations, _ in parts[1:]:
+            common &= set(stations)
+        order = [station for station in dict.fromkeys(parts[0][1]) if station in common]
+    else:
+        order = list(dict.fromkeys(station for _, stations, _ in parts for station in stations))
+    column_of = {station: j for j, station in enumerate(order)}
+
+    merged = np.full((sum(len(values) for _, _, values in parts), len(order)), np.nan)
+    row = 0
+    for _, stations, values in parts:
+        block = merged[row:row + len(values)]
+        sources = {}
+        for i, station in enumerate(stations):
+            if station in column_of:
+                sources.setdefault(column_of[station], []).append(i)
+
+        single = [(j, src[0]) for j, src in sources.items() if len(src) == 1]
+        if single:
+            targets, src = zip(*single)
+            block[:, list(targets)] = values[:, list(src)]
+        for j, src in sources.items():
+            if len(src) > 1:
+                block[:, j] = _coalesce(values[:, src].astype(np.float64), duplicates)
+        row += len(values)
+
+    # Zamiana na MultiIndex (domyślne nazwy, jeśli stacji brak w metadanych)
+    columns = pd.MultiIndex.from_tuples(
+        [(provinces.get(station, "Nieznane"), cities.get(station, "Nieznana"), station) for station in order],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"])
+    merged_df = pd.DataFrame(merged, columns=columns, copy=False)
+    dates = pd.concat([pd.Series(part_dates) for part_dates, _, _ in parts], ignore_index=True)
+    merged_df.insert(0, ("Data", "", ""), dates)
+    return merged_df
+
+class CleaningPipeline:
+    """Połączone czyszczenie danych PM2.5 w jednym przebiegu
+
+    Kroki są tylko zapamiętywane, a wykonywane dopiero w run(). Każdy rok jest
+    przetwarzany raz: wykrycie nagłówka, zamiana starych kodów, korekta północy
+    i etykiety MultiIndex działają na tablicach, bez pośrednich kopii DataFrame.
+    Wynik jest taki sam jak przy kolejnym wywołaniu clean_pm25_data,
+    replace_old_codes, correct_dates i merge_dataframes.
+
+    Przykład:
+        df = CleaningPipeline().clean().replace_codes(old_codes).correct_dates().label(cities, provinces).run(dfs)
+    """
+
+    def __init__(self):
+        self._clean = False
+        self._old_codes = None
+        self._correct_dates = False
+        self._labels = None
+
+    def clean(self):
+        """Dodaje krok clean_pm25_data (dane wejściowe to surowe arkusze GIOS)"""
+        self._clean = True
+        return self
+
+    def replace_codes(self, old_codes):
+        """Dodaje krok replace_old_codes
+
+        Args:
+            old_codes (dict): słownik mapujący stare kody stacji na nowe
+        """
+        self._old_codes = old_codes
+        return self
+
+    def correct_dates(self, mode="midnight"):
+        """Dodaje krok correct_dates
+
+        Args:
+            mode (str): sposób korekty - jak w correct_timestamps
+        """
+        self._correct_dates = mode
+        return self
+
+    def label(self, cities, provinces, join="inner", duplicates="mean"):
+        """Dodaje krok merge_dataframes (połączenie lat i kolumny MultiIndex)
+
+        Args:
+            cities (dict): słownik mapujący kody stacji na nazwy miejscowości
+            provinces (dict): słownik mapujący kody stacji na nazwy wojewódstw
+            join (str): "inner" albo "outer" - jak w merge_dataframes
+            duplicates (str): "mean" albo "first" - jak w merge_dataframes
+        """
+        self._labels = (cities, provinces, join, duplicates)
+        return self
+
+    def _run_year(self, df):
+        if self._clean:
+            dates, stations, values = _extract_measurements(df)
         else:
-            miejscowosc = cities.get(col, "Nieznana")  # default jeśli brak w metadanych
-            wojewodstwo = provinces.get(col, "Nieznane") # default jeśli brak w metadanych
-            new_columns.append((wojewodstwo,miejscowosc,col))
+            dates = pd.DatetimeIndex(df['Data'])
+            # pozycyjnie - po replace_old_codes kody stacji mogą się powtarzać
+            mask = df.columns != 'Data'
+            stations = df.columns[mask].tolist()
+            values = df.loc[:, mask].to_numpy()
 
-    merged_df.columns = pd.MultiIndex.from_tuples(new_columns,names=["Wojewodztwo", "Miejscowosc", "Stacja"])
+        if self._old_codes is not None:
+            stations = [self._old_codes.get(station, station) for station in stations]
 
-    # Konwersja kolumn do odpowiednich typów
-    cols_to_convert = merged_df.columns[1:]
-    merged_df[cols_to_convert] = merged_df[cols_to_convert].apply(pd.to_numeric, errors="coerce")
+        if self._correct_dates:
+            dates = correct_timestamps(dates, mode=self._correct_dates)
+
+        return dates, stations, values
+
+    def run(self, dfs):
+        """Wykonuje zapamiętane kroki
+
+        Args:
+            dfs (dict): słownik z DataFrame dla każdego roku
+
+        Returns:
+            pd.DataFrame | dict: połączony DataFrame, jeśli dodano krok label,
+                w przeciwnym razie słownik z DataFrame dla każdego roku
+        """
+        years = {year: self._run_year(df) for year, df in dfs.items()}
+        if self._labels is None:
+            return {year: _build_frame(*parts) for year, parts in years.items()}
+
+        cities, provinces, join, duplicates = self._labels
+        return _merge_parts(list(years.values()), cities, provinces, join=join, duplicates=duplicates)
 
-    return merged_df
 
 def save_to_excel(df, output_path):
     """Zapisuje Dataframe do pliku excel
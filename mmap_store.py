@@ -0,0 +1,247 @@
+import json
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+'''
+Moduł z danymi godzinowymi PM2.5 w tablicy mapowanej z dysku (np.memmap)
+'''
+
+DEFAULT_CHUNK_SIZE = 64  # liczba stacji przetwarzanych naraz
+# górna granica rozmiaru fragmentu - dla długich serii fragment ma mniej stacji
+MAX_CHUNK_BYTES = 8 * 1024 ** 2
+TASKS_PER_WORKER = 4  # zakresy stacji na proces w reduce_by_keys_parallel
+
+_VALUES_FILE = "values.npy"
+_TIMESTAMPS_FILE = "timestamps.npy"
+_STATIONS_FILE = "stations.json"
+_DATE_COLUMN = ("Data", "", "")
+_LEVELS = ["Wojewodztwo", "Miejscowosc", "Stacja"]
+
+
+def process_context():
+    """
+    Kontekst multiprocessing dla pul procesów (forkserver, a gdy go brak - spawn).
+
+    Procesy nie powstają przez fork - rozwidlenie procesu, w którym działają już
+    wątki (np. pobierające), może się zakleszczyć.
+    """
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(start_method)
+
+
+class HourlyMemmap:
+    """
+    Dane godzinowe jako tablica float32 (stacje, godziny) mapowana z dysku.
+
+    Do pamięci wczytywane są tylko znaczniki czasu i lista stacji. Pomiary są
+    czytane fragmentami (po chunk_size stacji) jako widoki tablicy mapowanej,
+    więc dane z wielu lat nie muszą mieścić się w RAM.
+
+    Atrybuty:
+        dates (pd.DatetimeIndex): daty kolejnych godzin
+        columns (pd.MultiIndex): kolumny stacji (Wojewodztwo, Miejscowosc, Stacja)
+        values (np.memmap): pomiary, kształt (stacje, godziny)
+    """
+
+    def __init__(self, dates, columns, values):
+        self.dates = dates
+        self.columns = columns
+        self.values = values
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Zwraca kolejne fragmenty (zakres stacji, widok tablicy) bez kopiowania danych"""
+        for start in range(0, self.values.shape[0], chunk_size):
+            stop = min(start + chunk_size, self.values.shape[0])
+            yield slice(start, stop), self.values[start:stop]
+
+    def reduce_by(self, keys, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Sumuje pomiary i liczy pomiary (bez braków) w grupach godzin.
+
+        Args:
+            keys (np.ndarray): klucz grupy dla każdej godziny (np. dzień albo rok*100+miesiąc)
+            chunk_size (int): liczba stacji przetwarzanych naraz
+
+        Returns:
+            tuple: (posortowane klucze grup, sumy (grupy, stacje), liczby pomiarów (grupy, stacje))
+        """
+        return reduce_by_keys(self.values, keys, chunk_size)
+
+    def to_frame(self):
+        """Wczytuje całość do pamięci w układzie z merge_dataframes"""
+        df = pd.DataFrame(np.asarray(self.values).T, columns=self.columns)
+        df.insert(0, _DATE_COLUMN, self.dates)
+        return df
+
+
+def _key_groups(keys):
+    """Zwraca (posortowane klucze grup, kolejność godzin według grup albo None, początki grup)"""
+    groups, codes = np.unique(keys, return_inverse=True)
+    order = None
+    if len(codes) and np.any(np.diff(codes) < 0):
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, np.diff(codes) != 0]) if len(codes) else np.array([], dtype=int)
+    return groups, order, starts
+
+
+def _reduce_groups(values, n_groups, order, starts, chunk_size):
+    n_stations = values.shape[0]
+    chunk_size = max(1, min(chunk_size, MAX_CHUNK_BYTES // max(1, 8 * values.shape[1])))
+    sums = np.zeros((n_groups, n_stations), dtype=np.float64)
+    counts = np.zeros((n_groups, n_stations), dtype=np.int64)
+    if not len(starts):
+        return sums, counts
+
+    for start in range(0, n_stations, chunk_size):
+        stations = slice(start, min(start + chunk_size, n_stations))
+        block = values[stations]
+        if order is not None:
+            block = block[:, order]
+        valid = ~np.isnan(block)
+        sums[:, stations] = np.add.reduceat(np.where(valid, block, 0), starts, axis=1, dtype=np.float64).T
+        counts[:, stations] = np.add.reduceat(valid, starts, axis=1, dtype=np.int64).T
+    return sums, counts
+
+
+def reduce_by_keys(values, keys, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Sumy i liczby pomiarów (bez braków) w grupach godzin, w jednym przebiegu po danych.
+
+    Tablica jest czytana fragmentami po chunk_size stacji, a sumy i liczby pomiarów
+    fragmentu są liczone od razu po jego odczycie - każdy pomiar jest czytany raz.
+
+    Args:
+        values (np.ndarray): pomiary, kształt (stacje, godziny) - np. memmap albo widok .T
+            tablicy (godziny, stacje)
+        keys (np.ndarray): klucz grupy dla każdej godziny (np. dzień albo rok*100+miesiąc)
+        chunk_size (int): liczba stacji przetwarzanych naraz (najwyżej tyle, ile mieści
+            się w MAX_CHUNK_BYTES)
+
+    Returns:
+        tuple: (posortowane klucze grup, sumy (grupy, stacje), liczby pomiarów (grupy, stacje))
+    """
+    groups, order, starts = _key_groups(keys)
+    return (groups,) + _reduce_groups(values, len(groups), order, starts, chunk_size)
+
+
+# stan procesu roboczego puli z reduce_by_keys_parallel (ustawiany raz, w _init_worker)
+_worker = {}
+
+
+def _init_worker(source, keys, chunk_size):
+    kind, name, shape, dtype, offset = source
+    if kind == "file":
+        _worker["values"] = np.memmap(name, dtype=dtype, mode="r", shape=shape, offset=offset)
+    else:
+        # procesy puli korzystają z resource_tracker procesu głównego, który usuwa blok
+        shm = shared_memory.SharedMemory(name=name)
+        _worker["shm"] = shm
+        _worker["values"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    groups, order, starts = _key_groups(keys)
+    _worker["groups"] = (len(groups), order, starts, chunk_size)
+
+
+def _reduce_stations(stations):
+    return _reduce_groups(_worker["values"][stations], *_worker["groups"])
+
+
+def reduce_by_keys_parallel(values, keys, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Jak reduce_by_keys, ale zakresy stacji są liczone równolegle w puli procesów.
+
+    Pomiary nie są przekazywane procesom (pickle): memmap otwarty z pliku .npy każdy
+    proces otwiera sam z dysku, a inna tablica jest raz kopiowana do bloku pamięci
+    współdzielonej (multiprocessing.shared_memory). Do procesów trafiają tylko klucze
+    godzin (raz na proces) i zakresy stacji, a z powrotem - sumy i liczby pomiarów.
+    Wynik jest taki sam jak z reduce_by_keys.
+
+    Args:
+        values (np.ndarray): pomiary, kształt (stacje, godziny)
+        keys (np.ndarray): klucz grupy dla każdej godziny
+        workers (int): liczba procesów; None - liczba rdzeni
+        chunk_size (int): liczba stacji przetwarzanych naraz w procesie
+
+    Returns:
+        tuple: (posortowane klucze grup, sumy (grupy, stacje), liczby pomiarów (grupy, stacje))
+    """
+    workers = workers or os.cpu_count() or 1
+    n_stations = values.shape[0]
+    if workers == 1 or n_stations < 2:
+        return reduce_by_keys(values, keys, chunk_size)
+
+    shm = None
+    if isinstance(values, np.memmap) and isinstance(values.base, mmap.mmap):
+        # cała tablica zmapowana z pliku (nie wycinek) - procesy mapują ten sam plik
+        source = ("file", values.filename, values.shape, values.dtype.str, values.offset)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+        shared = np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)
+        shared[...] = values
+        del shared
+        source = ("shm", shm.name, values.shape, values.dtype.str, 0)
+
+    # kilka zakresów na proces wyrównuje obciążenie
+    bounds = np.linspace(0, n_stations, min(n_stations, workers * TASKS_PER_WORKER) + 1).astype(int)
+    ranges = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=process_context(), initializer=_init_worker,
+                                 initargs=(source, keys, chunk_size)) as pool:
+            parts = list(pool.map(_reduce_stations, ranges))
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    groups = np.unique(keys)
+    return (groups, np.concatenate([part[0] for part in parts], axis=1),
+            np.concatenate([part[1] for part in parts], axis=1))
+
+
+def save_hourly_memmap(df, store_dir, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Zapisuje DataFrame z merge_dataframes jako tablicę (stacje, godziny) na dysku.
+
+    Args:
+        df (pd.DataFrame): DataFrame z kolumną Data i kolumnami MultiIndex stacji.
+        store_dir (str): katalog na pliki values.npy, timestamps.npy i stations.json.
+        chunk_size (int): liczba stacji zapisywanych naraz
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    station_columns = [col for col in df.columns if col != _DATE_COLUMN]
+
+    values = np.lib.format.open_memmap(os.path.join(store_dir, _VALUES_FILE), mode="w+",
+                                       dtype=np.float32, shape=(len(station_columns), len(df)))
+    for start in range(0, len(station_columns), chunk_size):
+        cols = station_columns[start:start + chunk_size]
+        values[start:start + len(cols)] = df[cols].to_numpy(dtype=np.float32).T
+    values.flush()
+    del values
+
+    dates = df[_DATE_COLUMN].to_numpy().astype("datetime64[ns]")
+    np.save(os.path.join(store_dir, _TIMESTAMPS_FILE), dates.view(np.int64))
+    with open(os.path.join(store_dir, _STATIONS_FILE), "w", encoding="utf-8") as f:
+        json.dump([list(col) for col in station_columns], f, indent=1, ensure_ascii=False)
+
+
+def open_hourly_memmap(store_dir):
+    """
+    Otwiera dane zapisane przez save_hourly_memmap (pomiary tylko do odczytu).
+
+    Args:
+        store_dir (str): katalog z danymi
+
+    Returns:
+        HourlyMemmap: dane z pomiarami mapowanymi z dysku
+    """
+    values = np.load(os.path.join(store_dir, _VALUES_FILE), mmap_mode="r")
+    dates = pd.DatetimeIndex(np.load(os.path.join(store_dir, _TIMESTAMPS_FILE)).view("datetime64[ns]"))
+    with open(os.path.join(store_dir, _STATIONS_FILE), encoding="utf-8") as f:
+        columns = pd.MultiIndex.from_tuples([tuple(col) for col in json.load(f)], names=_LEVELS)
+    return HourlyMemmap(dates, columns, values)
@@ -0,0 +1,190 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+'''
+Moduł z kolumnowym magazynem Parquet dla połączonych danych godzinowych PM2.5
+'''
+
+DEFAULT_STORE_DIR = "pm25_store"
+# ok. jeden miesiąc danych godzinowych w grupie wierszy - filtr po datach pomija całe miesiące
+DEFAULT_ROW_GROUP_SIZE = 24 * 31
+
+_STATIONS_FILE = "stations.json"
+_PART_FILE = "data.parquet"
+_DATE_COLUMN = ("Data", "", "")
+
+
+def _partition_path(store_dir, year, province):
+    return os.path.join(store_dir, f"Rok={year}", f"Wojewodztwo={province}", _PART_FILE)
+
+
+def _list_years(store_dir):
+    years = []
+    for name in os.listdir(store_dir):
+        if name.startswith("Rok="):
+            years.append(int(name[len("Rok="):]))
+    return sorted(years)
+
+
+def save_to_parquet(df, store_dir=DEFAULT_STORE_DIR, row_group_size=DEFAULT_ROW_GROUP_SIZE, years=None):
+    """Zapisuje połączony DataFrame do magazynu Parquet podzielonego na lata i województwa
+
+    Każda partycja (Rok=..., Wojewodztwo=...) to jeden plik z kolumną 'Data'
+    i kolumnami stacji danego województwa. Lista stacji z miejscowościami
+    jest zapisywana w pliku stations.json. Poprzednia zawartość magazynu (lub zapisywanych
+    lat) jest usuwana.
+
+    Args:
+        df (pd.DataFrame): DataFrame z merge_dataframes (kolumny Wojewodztwo/Miejscowosc/Stacja)
+        store_dir (str): katalog magazynu
+        row_group_size (int): liczba wierszy w grupie wierszy pliku Parquet
+        years (list): jeśli podane, zapisywane są tylko partycje tych lat, a pozostałe
+            zostają bez zmian - o ile lista stacji w magazynie jest taka sama jak w df;
+            w przeciwnym razie zapisywany jest cały magazyn
+    """
+    stations = [col for col in df.columns if col != _DATE_COLUMN]
+    if years is not None and not (os.path.exists(os.path.join(store_dir, _STATIONS_FILE))
+                                  and load_stations(store_dir) == stations):
+        years = None
+
+    if os.path.isdir(store_dir):
+        for name in os.listdir(store_dir):
+            if name.startswith("Rok=") and (years is None or int(name[len("Rok="):]) in years):
+                shutil.rmtree(os.path.join(store_dir, name))
+    os.makedirs(store_dir, exist_ok=True)
+
+    dates = df[_DATE_COLUMN]
+    if years is not None:
+        df = df[dates.dt.year.isin(years)]
+        dates = df[_DATE_COLUMN]
+
+    by_province = {}
+    for col in stations:
+        by_province.setdefault(col[0], []).append(col)
+
+    for year, year_df in df.groupby(dates.dt.year):
+        for province, cols in by_province.items():
+            part = pd.DataFrame({"Data": year_df[_DATE_COLUMN].to_numpy()})
+            for col in cols:
+                part[col[2]] = year_df[col].to_numpy()
+
+            path = _partition_path(store_dir, year, province)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            pq.write_table(table, path, row_group_size=row_group_size)
+
+    with open(os.path.join(store_dir, _STATIONS_FILE), "w", encoding="utf-8") as f:
+        json.dump([list(col) for col in stations], f, indent=1, ensure_ascii=False)
+
+
+def load_stations(store_dir=DEFAULT_STORE_DIR):
+    """Zwraca listę stacji zapisanych w magazynie
+
+    Args:
+        store_dir (str): katalog magazynu
+
+    Returns:
+        list: lista krotek (województwo, miejscowość, kod stacji)
+    """
+    with open(os.path.join(store_dir, _STATIONS_FILE), encoding="utf-8") as f:
+        return [tuple(col) for col in json.load(f)]
+
+
+def load_from_parquet(store_dir=DEFAULT_STORE_DIR, years=None, provinces=None, cities=None,
+                      stations=None, start=None, end=None):
+    """Wczytuje z magazynu Parquet tylko potrzebne lata, stacje i zakres dat
+
+    Wczytywane są wyłącznie pliki wybranych lat i województw, z nich tylko kolumny
+    wybranych stacji, a filtr po dacie pomija grupy wierszy spoza zakresu.
+
+    Args:
+        store_dir (str): katalog magazynu
+        years (list): lata do wczytania; None - wszystkie
+        provinces (list): województwa do wczytania; None - wszystkie
+        cities (list): miejscowości do wczytania; None - wszystkie
+        stations (list): kody stacji do wczytania; None - wszystkie
+        start (str | pd.Timestamp): początek zakresu dat (włącznie); None - bez ograniczenia
+        end (str | pd.Timestamp): koniec zakresu dat (włącznie); None - bez ograniczenia
+
+    Returns:
+        pd.DataFrame: DataFrame w takim samym układzie jak z merge_dataframes
+    """
+    selected = [
+        col for col in load_stations(store_dir)
+        if (provinces is None or col[0] in provinces)
+        and (cities is None or col[1] in cities)
+        and (stations is None or col[2] in stations)
+    ]
+    by_province = {}
+    for col in selected:
+        by_province.setdefault(col[0], []).append(col)
+
+    filters = []
+    if start is not None:
+        filters.append(("Data", ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append(("Data", "<=", pd.Timestamp(end)))
+
+    def read(path, columns):
+        return pq.read_table(path, columns=columns, filters=filters or None).to_pandas()
+
+    frames = []
+    for year in _list_years(store_dir):
+        if years is not None and year not in years:
+            continue
+        year_dir = os.path.join(store_dir, f"Rok={year}")
+        # kolumna dat z dowolnej partycji roku - wszystkie mają te same wiersze
+        first_province = sorted(os.listdir(year_dir))[0].split("=", 1)[1]
+        parts = [read(_partition_path(store_dir, year, first_province), ["Data"])]
+        for province, cols in by_province.items():
+            part = read(_partition_path(store_dir, year, province), [col[2] for col in cols])
+            part.columns = pd.MultiIndex.from_tuples(cols)
+            parts.append(part)
+        parts[0].columns = pd.MultiIndex.from_tuples([_DATE_COLUMN])
+        # partycje są czytane po województwach - przywrócenie kolejności stacji z magazynu
+        frames.append(pd.concat(parts, axis=1)[[_DATE_COLUMN] + selected])
+
+    columns = pd.MultiIndex.from_tuples([_DATE_COLUMN] + selected,
+                                        names=["Wojewodztwo", "Miejscowosc", "Stacja"])
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    result = pd.concat(frames, axis=0, ignore_index=True)
+    result.columns = columns
+    return result
+
+
+def iter_parquet_chunks(store_dir=DEFAULT_STORE_DIR, years=None, freq="year", **selection):
+    """Wczytuje magazyn kolejno po roku albo po miesiącu (w kolejności dat)
+
+    W pamięci jest naraz tylko jeden fragment, więc liczba lat nie zmienia zużycia
+    pamięci. Fragmenty miesięczne korzystają z filtru po dacie - wczytywane są tylko
+    grupy wierszy danego miesiąca.
+
+    Args:
+        store_dir (str): katalog magazynu
+        years (list): lata do wczytania; None - wszystkie
+        freq (str): "year" albo "month" - zakres jednego fragmentu
+        **selection: provinces, cities, stations jak w load_from_parquet
+
+    Yields:
+        pd.DataFrame: fragmenty w układzie z merge_dataframes (bez pustych)
+    """
+    if freq not in ("year", "month"):
+        raise ValueError(f"Nieznany zakres fragmentu: {freq}")
+    for year in _list_years(store_dir):
+        if years is not None and year not in years:
+            continue
+        if freq == "year":
+            ranges = [(None, None)]
+        else:
+            starts = pd.date_range(f"{year}-01-01", periods=13, freq="MS")
+            ranges = [(start, end - pd.Timedelta(1, "ns")) for start, end in zip(starts[:-1], starts[1:])]
+        for start, end in ranges:
+            chunk = load_from_parquet(store_dir, years=[year], start=start, end=end, **selection)
+            if len(chunk):
+                yield chunk
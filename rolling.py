@@ -0,0 +1,244 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from calculations import build_daily_cube, min_valid_count
+from mmap_store import HourlyMemmap
+
+'''
+Moduł ze statystykami w oknach przesuwnych (średnie kroczące, maksima, percentyle)
+'''
+
+# jak w przepisach o ocenie jakości powietrza: wynik z okna jest ważny, jeśli ma co najmniej 75% pomiarów
+DEFAULT_MIN_COVERAGE = 0.75
+# liczba okien sortowanych naraz w calculate_rolling_percentile
+PERCENTILE_BLOCK_DAYS = 256
+_HOUR = np.int64(3600 * 10 ** 9)
+
+
+class HourlyGrid:
+    """
+    Pomiary godzinowe na regularnej siatce godzin (brakujące godziny to NaN).
+
+    Pomiar jest przypisany do godziny końca okresu uśredniania, więc pomiar z
+    północy zapisany przez correct_dates jako 23:59:59 trafia na 00:00 dnia następnego.
+
+    Atrybuty:
+        start (pd.Timestamp): godzina pierwszego wiersza
+        columns (pd.Index): kolumny stacji
+        values (np.ndarray): pomiary float64, kształt (godziny, stacje)
+    """
+
+    def __init__(self, start, columns, values):
+        self.start = start
+        self.columns = columns
+        self.values = values
+
+    def dates(self):
+        """Zwraca godziny kolejnych wierszy jako pd.DatetimeIndex"""
+        return pd.date_range(self.start, periods=len(self.values), freq="h", name="Data")
+
+    def _frame(self, values):
+        return pd.DataFrame(values, index=self.dates(), columns=self.columns)
+
+    def _window_counts(self, hours):
+        """Liczby pomiarów w oknach kończących się w każdej godzinie (sumy kumulacyjne, O(n))"""
+        cumulative = np.cumsum(~np.isnan(self.values), axis=0)
+        counts = cumulative.copy()
+        counts[hours:] -= cumulative[:-hours]
+        return counts
+
+    def running_mean(self, hours=24, min_coverage=DEFAULT_MIN_COVERAGE):
+        """
+        Oblicza średnie kroczące z ostatnich `hours` godzin dla każdej godziny i stacji.
+
+        Args:
+            hours (int): długość okna w godzinach
+            min_coverage (float): minimalny udział godzin z pomiarem w oknie
+
+        Returns:
+            pd.DataFrame: średnie (NaN dla okien z za małą liczbą pomiarów), indeks = koniec okna
+        """
+        cumulative = np.cumsum(np.nan_to_num(self.values), axis=0)
+        sums = cumulative.copy()
+        sums[hours:] -= cumulative[:-hours]
+        counts = self._window_counts(hours)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts >= min_valid_count(min_coverage, hours), sums / counts, np.nan)
+        return self._frame(means)
+
+    def running_max(self, hours=8, min_coverage=DEFAULT_MIN_COVERAGE):
+        """
+        Oblicza maksima z ostatnich `hours` godzin dla każdej godziny i stacji.
+
+        Algorytm van Herka / Gil-Wermana: maksima narastające od początku i od końca
+        bloków długości okna dają maksimum dowolnego okna z dwóch odczytów (O(n)).
+
+        Args:
+            hours (int): długość okna w godzinach
+            min_coverage (float): minimalny udział godzin z pomiarem w oknie
+
+        Returns:
+            pd.DataFrame: maksima (NaN dla okien z za małą liczbą pomiarów), indeks = koniec okna
+        """
+        n, n_stations = self.values.shape
+        padded = np.concatenate([self.values, np.full(((-n) % hours, n_stations), np.nan)])
+        blocks = padded.reshape(-1, hours, n_stations)
+        prefix = np.fmax.accumulate(blocks, axis=1).reshape(-1, n_stations)
+        suffix = np.fmax.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, n_stations)
+
+        maxima = np.empty((n, n_stations))
+        head = min(hours - 1, n)
+        maxima[:head] = np.fmax.accumulate(self.values[:head], axis=0)
+        ends = np.arange(hours - 1, n)
+        maxima[hours - 1:] = np.fmax(suffix[ends - hours + 1], prefix[ends])
+
+        counts = self._window_counts(hours)
+        return self._frame(np.where(counts >= min_valid_count(min_coverage, hours), maxima, np.nan))
+
+
+def to_hourly_grid(df):
+    """
+    Przenosi dane godzinowe na regularną siatkę godzin.
+
+    Args:
+        df (pd.DataFrame | HourlyMemmap | HourlyGrid): DataFrame z merge_dataframes
+            (kolumna Data i kolumny stacji) albo dane mapowane z dysku.
+
+    Returns:
+        HourlyGrid: pomiary na siatce godzin.
+    """
+    if isinstance(df, HourlyGrid):
+        return df
+    if isinstance(df, HourlyMemmap):
+        dates, columns, values = df.dates, df.columns, np.asarray(df.values, dtype=np.float64).T
+    else:
+        dates = pd.DatetimeIndex(df["Data"])
+        values_df = df.loc[:, df.columns.get_level_values(0) != "Data"]
+        columns, values = values_df.columns, values_df.to_numpy(dtype=np.float64)
+
+    if not len(dates):
+        return HourlyGrid(pd.Timestamp(0), columns, np.empty((0, len(columns))))
+    # zaokrąglenie w górę do pełnej godziny (23:59:59 -> 00:00 dnia następnego)
+    slots = -(-dates.as_unit("ns").asi8 // _HOUR)
+    first = slots.min()
+    grid = np.full((slots.max() - first + 1, len(columns)), np.nan)
+    grid[slots - first] = values
+    return HourlyGrid(pd.Timestamp(first * _HOUR), columns, grid)
+
+
+def _sorted_quantile(sorted_values, counts, q):
+    """Percentyl q (interpolacja liniowa jak w np.percentile) z wartości posortowanych wzdłuż
+    ostatniej osi, z brakami (NaN) na końcu; counts - liczba wartości bez braków"""
+    position = q / 100 * np.maximum(counts - 1, 0)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    low = np.take_along_axis(sorted_values, lower[..., None], axis=-1)[..., 0]
+    high = np.take_along_axis(sorted_values, upper[..., None], axis=-1)[..., 0]
+    with np.errstate(invalid="ignore"):
+        return np.where(counts > 0, low + (high - low) * (position - lower), np.nan)
+
+
+def _daily_grid(df, cube, day_coverage):
+    """Średnie dzienne na ciągłej siatce dni (NaN dla dni z za małą liczbą godzin)"""
+    if cube is None:
+        cube = build_daily_cube(df)
+    means = cube.means(day_coverage)
+    if not len(cube.days):
+        return cube.days, cube.columns, means
+    days = pd.date_range(cube.days.min(), cube.days.max(), freq="D", name="Data")
+    grid = np.full((len(days), len(cube.columns)), np.nan)
+    grid[days.get_indexer(cube.days)] = means
+    return days, cube.columns, grid
+
+
+def calculate_running_mean(df, hours=24, min_coverage=DEFAULT_MIN_COVERAGE):
+    """
+    Oblicza średnie kroczące (domyślnie 24-godzinne) dla każdej godziny i stacji.
+
+    Args:
+        df (pd.DataFrame | HourlyMemmap | HourlyGrid): dane godzinowe PM2.5.
+        hours (int): długość okna w godzinach.
+        min_coverage (float): minimalny udział godzin z pomiarem w oknie. Domyślnie 75%.
+
+    Returns:
+        pd.DataFrame: średnie kroczące z indeksem godzin (koniec okna).
+    """
+    return to_hourly_grid(df).running_mean(hours, min_coverage)
+
+
+def calculate_running_max(df, hours=8, min_coverage=DEFAULT_MIN_COVERAGE):
+    """
+    Oblicza maksima kroczące (domyślnie z 8 godzin) dla każdej godziny i stacji.
+
+    Args:
+        df (pd.DataFrame | HourlyMemmap | HourlyGrid): dane godzinowe PM2.5.
+        hours (int): długość okna w godzinach.
+        min_coverage (float): minimalny udział godzin z pomiarem w oknie. Domyślnie 75%.
+
+    Returns:
+        pd.DataFrame: maksima kroczące z indeksem godzin (koniec okna).
+    """
+    return to_hourly_grid(df).running_max(hours, min_coverage)
+
+
+def calculate_rolling_percentile(df, q=90, days=30, min_coverage=DEFAULT_MIN_COVERAGE,
+                                 day_coverage=DEFAULT_MIN_COVERAGE, cube=None):
+    """
+    Oblicza percentyl średnich dziennych z ostatnich `days` dni dla każdego dnia i stacji.
+
+    Każde okno jest sortowane (koszt O(dni * days * log(days)) dla stacji). Okna są brane
+    blokami po PERCENTILE_BLOCK_DAYS dni, więc posortowana kopia ma naraz rozmiar
+    bloku razy długość okna, a nie całej tablicy średnich razy długość okna.
+
+    Args:
+        df (pd.DataFrame | HourlyMemmap): dane godzinowe PM2.5.
+        q (float): percentyl (0-100).
+        days (int): długość okna w dniach.
+        min_coverage (float): minimalny udział ważnych dni w oknie.
+        day_coverage (float): minimalny udział godzin z pomiarem, żeby dzień był ważny.
+        cube (DailyCube): gotowa kostka z build_daily_cube - jeśli podana, df nie jest grupowany.
+
+    Returns:
+        pd.DataFrame: percentyle z indeksem dni (ostatni dzień okna).
+    """
+    day_index, columns, means = _daily_grid(df, cube, day_coverage)
+    # dni przed początkiem danych liczą się jako braki, jak w oknach godzinowych
+    padded = np.concatenate([np.full((days - 1, len(columns)), np.nan), means])
+    views = sliding_window_view(padded, days, axis=0)
+    required = min_valid_count(min_coverage, days)
+    result = np.empty(means.shape)
+    for start in range(0, len(means), PERCENTILE_BLOCK_DAYS):
+        block = slice(start, start + PERCENTILE_BLOCK_DAYS)
+        windows = np.sort(views[block], axis=-1)
+        counts = np.count_nonzero(~np.isnan(windows), axis=-1)
+        result[block] = np.where(counts >= required, _sorted_quantile(windows, counts, q), np.nan)
+    return pd.DataFrame(result, index=day_index, columns=columns)
+
+
+def calculate_annual_percentile(df, q=90.4, min_coverage=DEFAULT_MIN_COVERAGE,
+                                day_coverage=DEFAULT_MIN_COVERAGE, cube=None):
+    """
+    Oblicza roczny percentyl średnich dziennych (domyślnie P90.4) dla każdej stacji.
+
+    Args:
+        df (pd.DataFrame | HourlyMemmap): dane godzinowe PM2.5.
+        q (float): percentyl (0-100). Domyślnie 90.4.
+        min_coverage (float): minimalny udział ważnych dni w roku (względem liczby dni w roku).
+        day_coverage (float): minimalny udział godzin z pomiarem, żeby dzień był ważny.
+        cube (DailyCube): gotowa kostka z build_daily_cube - jeśli podana, df nie jest grupowany.
+
+    Returns:
+        pd.DataFrame: percentyle z indeksem lat ("Rok").
+    """
+    day_index, columns, means = _daily_grid(df, cube, day_coverage)
+    years, starts = np.unique(day_index.year, return_index=True)
+    result = np.full((len(years), len(columns)), np.nan)
+    for i, (year, start) in enumerate(zip(years, starts)):
+        stop = starts[i + 1] if i + 1 < len(starts) else len(day_index)
+        block = np.sort(means[start:stop], axis=0).T
+        counts = np.count_nonzero(~np.isnan(block), axis=-1)
+        days_in_year = 366 if pd.Timestamp(year=year, month=1, day=1).is_leap_year else 365
+        values = _sorted_quantile(block, counts, q)
+        result[i] = np.where(counts >= min_valid_count(min_coverage, days_in_year), values, np.nan)
+    return pd.DataFrame(result, index=pd.Index(years, name="Rok"), columns=columns)
@@ -1,38 +1,122 @@
-import sys
+import argparse
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
 import load_data
 import calculations
 
+GIOS_ARCHIVE_URL = "https://powietrze.gios.gov.pl/pjp/archives/downloadFile/"
 
-def main(year):
-
-    gios_archive_url = "https://powietrze.gios.gov.pl/pjp/archives/downloadFile/"
-    gios_id = load_data.find_gios_pm25_info(year)
-
-    os.makedirs(f"results/pm25/{year}", exist_ok=True)
 
-    dfs = load_data.load_pm25_data(
-        [year],
-        gios_archive_url,
-        {year: gios_id}
-    )
+def parse_years(args):
+    """Zamienia argumenty typu "2015", "2018-2021" na listę lat"""
+    years = []
+    for arg in args:
+        if "-" in arg:
+            start, stop = arg.split("-")
+            years.extend(range(int(start), int(stop) + 1))
+        else:
+            years.append(int(arg))
+    return sorted(set(years))
 
-    metadata_df = load_data.load_metadata()
-    old_codes, cities, provinces = load_data.get_old_station_codes(metadata_df)
 
-    dfs = load_data.clean_pm25_data(dfs)
-    dfs = load_data.replace_old_codes(dfs, old_codes)
-    dfs = load_data.correct_dates(dfs)
+def process_year(year, df, registry):
+    """Kończy przetwarzanie jednego roku i zapisuje wyniki do results/pm25/<rok>/"""
+    timings = {}
 
-    df = load_data.merge_dataframes(dfs, cities, provinces)
+    start = time.perf_counter()
+    pipeline = (
+        load_data.CleaningPipeline()
+        .replace_codes(registry.old_codes)
+        .correct_dates()
+        .label(registry.cities, registry.provinces)
+    )
+    df = pipeline.run({year: df})
+    timings["merge"] = time.perf_counter() - start
 
+    start = time.perf_counter()
     month_means = calculations.calculate_station_monthly_averages(df)
     exceed = calculations.calculate_days_exceeding_limit(df)
+    timings["calculations"] = time.perf_counter() - start
 
+    start = time.perf_counter()
+    os.makedirs(f"results/pm25/{year}", exist_ok=True)
     month_means.to_csv(f"results/pm25/{year}/monthly_means.csv")
     exceed.to_csv(f"results/pm25/{year}/exceed_days.csv")
+    timings["write"] = time.perf_counter() - start
+    return timings
+
+
+def print_timings(timings, stages):
+    """Wypisuje tabelę czasów etapów (w sekundach) dla każdego roku"""
+    print("rok   " + "".join(f"{stage:>14s}" for stage in stages))
+    for year in sorted(key for key in timings if isinstance(key, int)):
+        print(f"{year:<6d}" + "".join(f"{timings[year].get(stage, 0.0):14.2f}" for stage in stages))
+    for stage in ["index", "metadata", "total"]:
+        print(f"{stage}: {timings[stage]:.2f} s")
+
+
+def main(years, offline=False, workers=4):
+    """Przetwarza podane lata: strona archiwum i metadane są pobierane raz, lata równolegle
+
+    Args:
+        years (int | list): rok albo lista lat
+        offline (bool): jeśli True, pliki są brane wyłącznie z cache
+        workers (int): liczba lat przetwarzanych naraz
+
+    Returns:
+        dict: czasy etapów w sekundach dla każdego roku oraz "index", "metadata" i "total"
+    """
+    if isinstance(years, int):
+        years = [years]
+    total_start = time.perf_counter()
+    timings = {}
+
+    start = time.perf_counter()
+    gios_ids = load_data.find_gios_pm25_ids(years, offline=offline)
+    timings["index"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    metadata_df = load_data.load_metadata(offline=offline)
+    registry = load_data.build_station_registry(metadata_df)
+    timings["metadata"] = time.perf_counter() - start
+
+    # pobieranie w wątkach i wczytywanie z czyszczeniem w procesach
+    load_timings = {}
+    dfs = load_data.load_pm25_data(
+        years,
+        GIOS_ARCHIVE_URL,
+        gios_ids,
+        offline=offline,
+        parallel=True,
+        download_workers=workers,
+        parse_workers=workers,
+        clean=True,
+        timings=load_timings,
+    )
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {year: pool.submit(process_year, year, dfs[year], registry) for year in years}
+        for year, future in futures.items():
+            timings[year] = {**load_timings[year], **future.result()}
+
+    timings["total"] = time.perf_counter() - total_start
+    return timings
 
 
 if __name__ == "__main__":
-    year = int(sys.argv[1])
-    main(year)
+    parser = argparse.ArgumentParser(description="Miesięczne średnie i dni przekroczeń PM2.5 dla podanych lat")
+    parser.add_argument("years", nargs="+", help="lata, np. 2024 albo 2015 2018 albo 2015-2024")
+    parser.add_argument("--offline", action="store_true", help="używaj wyłącznie plików z cache")
+    parser.add_argument("--workers", type=int, default=4, help="liczba lat przetwarzanych naraz")
+    args = parser.parse_args()
+
+    timings = main(parse_years(args.years), offline=args.offline, workers=args.workers)
+    print_timings(timings, ["download", "parse", "merge", "calculations", "write"])
+
+    transfer = http_client.get_client().metrics.summary()
+    print(f"pobrano: {transfer['bytes'] / 1024 ** 2:.1f} MB, {transfer['bandwidth'] / 1024 ** 2:.2f} MB/s, "
+          f"średnie opóźnienie {transfer['mean_latency'] * 1000:.0f} ms, "
+          f"ponowienia: {transfer['retries']}, wznowienia: {transfer['resumes']}")
@@ -1,3 +1,74 @@
 import sys
 import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _FakeGiosHandler(BaseHTTPRequestHandler):
+    """Prosty serwer HTTP udający serwer GIOS (pliki trzymane w server.files)"""
+
+    def do_GET(self):
+        self.server.log.append((self.path, dict(self.headers)))
+        content = self.server.files.get(self.path)
+        if content is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        # server.errors: ścieżka -> liczba kolejnych odpowiedzi 503
+        if self.server.errors.get(self.path):
+            self.server.errors[self.path] -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        etag = '"' + hashlib.md5(content).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and self.server.ranges and self.headers.get("If-Range", etag) == etag:
+            start = int(range_header.split("=")[1].split("-")[0])
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content) - start))
+        self.end_headers()
+
+        # server.drops: ścieżka -> liczba kolejnych odpowiedzi zerwanych w połowie
+        if self.server.drops.get(self.path):
+            self.server.drops[self.path] -= 1
+            self.wfile.write(content[start:start + (len(content) - start) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(content[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def gios_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeGiosHandler)
+    server.files = {}
+    server.log = []
+    server.errors = {}
+    server.drops = {}
+    server.ranges = True  # czy serwer obsługuje nagłówek Range
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
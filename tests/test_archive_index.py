@@ -0,0 +1,51 @@
+import json
+
+from archive_index import load_archive_index, parse_archive_page
+
+
+_PAGE = """<html><body>
+<a href="/pjp/archives/downloadFile/603">Wyniki pomiarów z 2018 roku</a>
+<a href="/pjp/archives/downloadFile/302">Wyniki pomiarów z 2019 roku</a>
+<a href="/pjp/archives/downloadFile/999">Wyniki pomiarów z 2019 roku (stara wersja)</a>
+<a href="/pjp/archives/downloadFile/622">Metadane - stan na 2024</a>
+<a href="/pjp/other">Wyniki pomiarów z 2020 roku</a>
+</body></html>""".encode("utf-8")
+
+
+def test_parse_archive_page():
+    index = parse_archive_page(_PAGE)
+
+    assert index.archive_ids == {2018: "603", 2019: "302"}
+    assert index.pm25_id(2019) == "302"
+    assert index.metadata_href() == "/pjp/archives/downloadFile/622"
+
+
+def test_load_archive_index_reuses_fresh_index(gios_server, tmp_path):
+    gios_server.files["/pjp/archives"] = _PAGE
+    url = gios_server.url + "/pjp/archives"
+
+    first = load_archive_index(cache_dir=tmp_path, url=url)
+    second = load_archive_index(cache_dir=tmp_path, url=url)
+
+    # drugi indeks jest wczytany z pliku, bez zapytania do serwera
+    assert len(gios_server.log) == 1
+    assert second.archive_ids == first.archive_ids
+    assert second.metadata_href() == first.metadata_href()
+
+    # po upływie ttl strona jest sprawdzana ponownie
+    load_archive_index(cache_dir=tmp_path, url=url, ttl=0)
+    assert len(gios_server.log) == 2
+
+
+def test_load_archive_index_offline_ignores_ttl(gios_server, tmp_path):
+    gios_server.files["/pjp/archives"] = _PAGE
+    url = gios_server.url + "/pjp/archives"
+    load_archive_index(cache_dir=tmp_path, url=url)
+
+    data = json.loads((tmp_path / "archive_index.json").read_text(encoding="utf-8"))
+    data["fetched_at"] = 0
+    (tmp_path / "archive_index.json").write_text(json.dumps(data), encoding="utf-8")
+
+    index = load_archive_index(cache_dir=tmp_path, url=url, offline=True, ttl=60)
+    assert index.pm25_id(2018) == "603"
+    assert len(gios_server.log) == 1
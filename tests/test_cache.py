@@ -0,0 +1,107 @@
+import pytest
+
+from cache import fetch_cached, fetch_cached_path, load_index, evict, pinned
+
+
+def test_fetch_cached_revalidates_with_etag(gios_server, tmp_path):
+    gios_server.files["/downloadFile/603"] = b"archiwum 2018"
+    url = gios_server.url + "/downloadFile/603"
+
+    first = fetch_cached(url, "archive-603", cache_dir=tmp_path)
+    second = fetch_cached(url, "archive-603", cache_dir=tmp_path)
+
+    assert first == second == b"archiwum 2018"
+    # drugie zapytanie jest warunkowe i serwer odpowiada 304
+    assert len(gios_server.log) == 2
+    assert "If-None-Match" in gios_server.log[1][1]
+
+    index = load_index(tmp_path)
+    assert index["archive-603"]["size"] == len(b"archiwum 2018")
+    assert (tmp_path / "objects" / index["archive-603"]["sha256"]).exists()
+
+
+def test_fetch_cached_downloads_changed_file(gios_server, tmp_path):
+    url = gios_server.url + "/downloadFile/603"
+    gios_server.files["/downloadFile/603"] = b"wersja 1"
+    fetch_cached(url, "archive-603", cache_dir=tmp_path)
+
+    gios_server.files["/downloadFile/603"] = b"wersja 2"
+    assert fetch_cached(url, "archive-603", cache_dir=tmp_path) == b"wersja 2"
+
+    # plik poprzedniej wersji jest usuwany razem z wpisem, który na niego wskazywał
+    gios_server.files["/downloadFile/603"] = b"wersja 3"
+    fetch_cached_path(url, "archive-603", cache_dir=tmp_path)
+    assert [path.name for path in (tmp_path / "objects").iterdir()] == [load_index(tmp_path)["archive-603"]["sha256"]]
+
+
+def test_fetch_cached_offline(gios_server, tmp_path):
+    url = gios_server.url + "/downloadFile/603"
+    gios_server.files["/downloadFile/603"] = b"archiwum"
+    fetch_cached(url, "archive-603", cache_dir=tmp_path)
+    n_requests = len(gios_server.log)
+
+    assert fetch_cached(url, "archive-603", cache_dir=tmp_path, offline=True) == b"archiwum"
+    # w trybie offline nie ma żadnego zapytania do serwera
+    assert len(gios_server.log) == n_requests
+
+    with pytest.raises(RuntimeError):
+        fetch_cached(url, "archive-999", cache_dir=tmp_path, offline=True)
+
+
+def test_evict_removes_least_recently_used(gios_server, tmp_path):
+    for gios_id in ["1", "2", "3"]:
+        gios_server.files[f"/downloadFile/{gios_id}"] = gios_id.encode() * 100
+        fetch_cached(gios_server.url + f"/downloadFile/{gios_id}", f"archive-{gios_id}", cache_dir=tmp_path)
+
+    # archiwum 1 użyte ponownie - najdawniej używane jest teraz archiwum 2
+    fetch_cached(gios_server.url + "/downloadFile/1", "archive-1", cache_dir=tmp_path, offline=True)
+
+    removed = evict(tmp_path, max_size=200)
+
+    assert removed == ["archive-2"]
+    assert set(load_index(tmp_path)) == {"archive-1", "archive-3"}
+
+
+
+def test_fetch_cached_path_streams_to_cache(gios_server, tmp_path):
+    gios_server.files["/downloadFile/603"] = b"archiwum 2018" * 1000
+    url = gios_server.url + "/downloadFile/603"
+
+    path = fetch_cached_path(url, "archive-603", cache_dir=tmp_path)
+    with open(path, "rb") as f:
+        assert f.read() == b"archiwum 2018" * 1000
+    # wpis jest wspólny z fetch_cached - drugie pobranie kończy się odpowiedzią 304
+    assert fetch_cached(url, "archive-603", cache_dir=tmp_path) == b"archiwum 2018" * 1000
+    assert "If-None-Match" in gios_server.log[1][1]
+    assert fetch_cached_path(url, "archive-603", cache_dir=tmp_path, offline=True) == path
+    assert [p.name for p in (tmp_path / "objects").iterdir()] == [load_index(tmp_path)["archive-603"]["sha256"]]
+
+
+def test_fetch_cached_path_keeps_file_larger_than_cache(gios_server, tmp_path):
+    gios_server.files["/downloadFile/1"] = b"1" * 500
+    gios_server.files["/downloadFile/2"] = b"2" * 2000
+    fetch_cached_path(gios_server.url + "/downloadFile/1", "archive-1", cache_dir=tmp_path, max_size=1000)
+
+    # archiwum większe niż cały cache - usuwane są starsze wpisy, ale nie właśnie pobrany plik
+    path = fetch_cached_path(gios_server.url + "/downloadFile/2", "archive-2", cache_dir=tmp_path, max_size=1000)
+
+    with open(path, "rb") as f:
+        assert f.read() == b"2" * 2000
+    assert set(load_index(tmp_path)) == {"archive-2"}
+
+
+def test_pinned_files_survive_eviction(gios_server, tmp_path):
+    for gios_id in ["1", "2", "3"]:
+        gios_server.files[f"/downloadFile/{gios_id}"] = gios_id.encode() * 600
+
+    # ścieżka archiwum 1 czeka na wczytanie, a inny wątek pobiera archiwum 2
+    with pinned(["archive-1", "archive-2"]):
+        path = fetch_cached_path(gios_server.url + "/downloadFile/1", "archive-1", cache_dir=tmp_path, max_size=1000)
+        fetch_cached_path(gios_server.url + "/downloadFile/2", "archive-2", cache_dir=tmp_path, max_size=1000)
+        with open(path, "rb") as f:
+            assert f.read() == b"1" * 600
+        assert set(load_index(tmp_path)) == {"archive-1", "archive-2"}
+
+    # po wyjściu z bloku limit znów obowiązuje
+    fetch_cached_path(gios_server.url + "/downloadFile/3", "archive-3", cache_dir=tmp_path, max_size=1000)
+    assert set(load_index(tmp_path)) == {"archive-3"}
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 from calculations import calculate_station_monthly_averages
@@ -182,3 +183,261 @@ def test_calculate_days_exceeding_limit_by_province():
     pd.testing.assert_frame_equal(result, expected,check_like=True)#check_like = True ignoruje kolejność
 
 
+
+
+def test_days_exceeding_by_province_sorts_groups():
+    columns = pd.MultiIndex.from_tuples(
+        [("Zachodniopomorskie", "Szczecin", "A"), ("Dolnośląskie", "Wrocław", "B"), ("Lubuskie", "Zielona Góra", "C")],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"],
+    )
+    df = pd.DataFrame([[20.0, 10.0, 30.0]], columns=columns)
+    df.insert(0, ("Data", "", ""), pd.to_datetime(["2020-01-01 10:00"]))
+
+    result = calculate_days_exceeding_limit_by_province(df, limit=15)
+
+    # kolejność grup jak w groupby po poziomie kolumn (posortowana), nie kolejność wystąpienia
+    assert list(result.columns) == ["Dolnośląskie", "Lubuskie", "Zachodniopomorskie"]
+    assert result.iloc[0].tolist() == [0, 1, 1]
+
+
+from calculations import build_daily_cube
+def test_daily_cube_matches_exceedance_functions():
+    dates = pd.to_datetime([
+        "2020-01-01 10:00", "2020-01-01 12:00",
+        "2020-01-02 10:00",
+        "2021-01-01 10:00",
+    ])
+    columns = pd.MultiIndex.from_tuples(
+        [
+            ("Mazowieckie", "Warszawa", "A"),
+            ("Mazowieckie", "Warszawa", "B"),
+            ("Małopolskie", "Kraków", "C"),
+        ],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"],
+    )
+    df = pd.DataFrame([
+        [10, 30, 16],     # dzień 1: A=20, B=20, C=16
+        [30, 10, None],
+        [12, 14, 40],     # dzień 2: A=12, B=14, C=40
+        [50, None, 5],    # 2021
+    ], index=dates, columns=columns)
+    df["Data"] = df.index
+
+    cube = build_daily_cube(df)
+
+    # jedna kostka dla różnych limitów daje te same wyniki co pełne przeliczenie
+    for limit in [10, 15, 25]:
+        pd.testing.assert_frame_equal(
+            calculate_days_exceeding_limit(df, limit=limit, cube=cube),
+            calculate_days_exceeding_limit(df, limit=limit),
+        )
+
+    by_city = cube.days_exceeding(25, level="Miejscowosc")
+    assert by_city.loc[2020, "Warszawa"] == 0
+    assert by_city.loc[2020, "Kraków"] == 1
+    assert by_city.loc[2021, "Warszawa"] == 1
+
+    only_2021 = cube.days_exceeding(15, years=[2021])
+    assert list(only_2021.index) == [2021]
+    assert only_2021.loc[2021, ("Mazowieckie", "Warszawa", "A")] == 1
+    assert only_2021.loc[2021, ("Mazowieckie", "Warszawa", "B")] == 0
+
+
+from calculations import calculate_days_exceeding_limits
+def test_calculate_days_exceeding_limits_matches_single_limits():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2020-12-01", "2021-02-01", freq="h")
+    columns = pd.MultiIndex.from_tuples(
+        [("Mazowieckie", "Warszawa", "A"), ("Mazowieckie", "Radom", "B"), ("Śląskie", "Katowice", "C")],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"],
+    )
+    values = rng.gamma(2.0, 12.0, size=(len(dates), 3))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    df = pd.DataFrame(values, index=dates, columns=columns)
+    df["Data"] = df.index
+
+    limits = [50, 15, 25, 35, 25]
+    cube = build_daily_cube(df)
+    for level in [None, "Wojewodztwo"]:
+        sweep = calculate_days_exceeding_limits(df, limits, level=level, cube=cube)
+        assert list(sweep.index.get_level_values("Limit").unique()) == [50, 15, 25, 35]
+        for limit in limits:
+            expected = cube.days_exceeding(limit, level=level)
+            pd.testing.assert_frame_equal(sweep.loc[limit], expected, check_dtype=False)
+
+
+def test_aggregations_with_min_coverage():
+    dates = pd.date_range("2020-01-01 01:00", "2020-03-01 00:00", freq="h")
+    columns = pd.MultiIndex.from_tuples(
+        [("Mazowieckie", "Warszawa", "A"), ("Mazowieckie", "Warszawa", "B")],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"],
+    )
+    values = np.full((len(dates), 2), 20.0)
+    values[:22, 1] = np.nan         # 1 stycznia: stacja B ma tylko 2 godziny
+    values[24 * 31:24 * 50, 1] = np.nan  # luty: stacja B ma 10 dni z 29
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, ("Data", "", ""), dates - pd.Timedelta(hours=1))
+
+    daily, daily_counts = calculate_daily_station_averages(df, min_coverage=0.75, return_counts=True)
+    assert daily_counts.iloc[0].tolist() == [24, 2]
+    assert daily.iloc[0, 0] == 20.0
+    assert np.isnan(daily.iloc[0, 1])
+    # bez wymagań średnia z 2 godzin jest zwykłą średnią
+    assert calculate_daily_station_averages(df).iloc[0, 1] == 20.0
+
+    monthly, monthly_counts = calculate_station_monthly_averages(df, min_coverage=0.75, return_counts=True)
+    assert monthly_counts.loc[(2020, 2)].tolist() == [24 * 29, 24 * 10]
+    assert monthly.loc[(2020, 1)].tolist() == [20.0, 20.0]
+    assert monthly.loc[(2020, 2), ("Mazowieckie", "Warszawa", "A")] == 20.0
+    assert np.isnan(monthly.loc[(2020, 2), ("Mazowieckie", "Warszawa", "B")])
+
+    exceed = calculate_days_exceeding_limit(df, limit=15, min_coverage=0.75)
+    assert exceed.loc[2020].tolist() == [60, 40]
+    assert calculate_days_exceeding_limit(df, limit=15).loc[2020].tolist() == [60, 41]
+
+
+from calculations import StationGroups, calculate_group_averages
+
+
+def test_calculate_group_averages_weighted_and_nan_aware():
+    columns = pd.MultiIndex.from_tuples(
+        [
+            ("Śląskie", "Katowice", "A"),
+            ("Mazowieckie", "Warszawa", "B"),
+            ("Mazowieckie", "Warszawa", "C"),
+            ("Mazowieckie", "Radom", "D"),
+        ],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"],
+    )
+    dates = pd.to_datetime(["2020-01-01", "2020-01-02"])
+    df = pd.DataFrame([[10.0, 20.0, 40.0, np.nan], [30.0, np.nan, 50.0, np.nan]], columns=columns)
+    df.insert(0, ("Data", "", ""), dates)
+
+    cities = calculate_group_averages(df)
+    assert list(cities.columns) == ["Katowice", "Radom", "Warszawa"]
+    assert list(cities.index) == list(dates)
+    assert cities["Warszawa"].tolist() == [30.0, 50.0]
+    assert cities["Radom"].isna().all()
+
+    provinces = calculate_group_averages(df, level="Wojewodztwo",
+                                         weights=pd.Series({"A": 1.0, "B": 3.0, "C": 1.0, "D": 1.0}))
+    assert provinces.loc[dates[0], "Mazowieckie"] == (3 * 20.0 + 40.0) / 4
+    assert provinces.loc[dates[1], "Mazowieckie"] == 50.0
+
+    # ta sama macierz wskaźników działa dla dowolnej tabeli z tymi stacjami
+    groups = StationGroups(columns)
+    expected = df.iloc[:, 1:].T.groupby(level="Miejscowosc").mean().T
+    np.testing.assert_allclose(groups.means(df.iloc[:, 1:]), expected.to_numpy())
+    np.testing.assert_array_equal(groups.indicator().sum(axis=1), np.ones(4))
+
+
+import tracemalloc
+
+import mmap_store
+
+
+def test_calculations_do_not_modify_or_copy_input(monkeypatch):
+    rng = np.random.default_rng(0)
+    n_hours, n_stations = 24 * 366 * 2, 150
+    columns = pd.MultiIndex.from_tuples(
+        [(f"Woj{i % 4}", f"Miasto{i // 3}", f"S{i}") for i in range(n_stations)],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"],
+    )
+    values = rng.random((n_hours, n_stations)) * 40
+    values[rng.random(values.shape) < 0.1] = np.nan
+
+    for dtype in [np.float32, np.float64]:
+        df = pd.DataFrame(values.astype(dtype), columns=columns)
+        df.insert(0, ("Data", "", ""), pd.date_range("2019-01-01 01:00", periods=n_hours, freq="h"))
+        original = df.copy(deep=True)
+
+        daily = calculate_daily_station_averages(df)
+        calculate_station_monthly_averages(df, min_coverage=0.75)
+        calculate_days_exceeding_limit(df)
+        calculate_days_exceeding_limit_by_province(df)
+        calculate_days_exceeding_limits(df, [15, 25])
+        calculate_group_averages(df, level="Wojewodztwo")
+        calculate_city_monthly_averages(daily)
+        pd.testing.assert_frame_equal(df, original)
+
+    # bez pełnej kopii danych: dodatkowa pamięć to jeden fragment i wyniki
+    monkeypatch.setattr(mmap_store, "MAX_CHUNK_BYTES", 2 * 1024 ** 2)
+    data_bytes = values.nbytes
+    for func, kwargs in [(calculate_days_exceeding_limit, {}),
+                         (calculate_station_monthly_averages, {}),
+                         (calculate_group_averages, {"level": "Wojewodztwo"})]:
+        tracemalloc.start()
+        func(df, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert peak < data_bytes / 2, func.__name__
+
+
+from calculations import rank_changes, rank_stations, rank_top_n
+
+
+def _exceedances():
+    columns = pd.MultiIndex.from_tuples(
+        [("Śląskie", "Katowice", "A"), ("Śląskie", "Gliwice", "B"), ("Mazowieckie", "Warszawa", "C"),
+         ("Mazowieckie", "Warszawa", "D"), ("Mazowieckie", "Radom", "E")],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"],
+    )
+    return pd.DataFrame([[30, 10, 20, 20, np.nan], [5, 40, 20, 25, 15]], index=pd.Index([2020, 2021], name="Data"),
+                        columns=columns, dtype=float)
+
+
+def test_rank_top_n():
+    df = _exceedances()
+
+    top = rank_top_n(df, n=2)
+    assert top.index.names == ["Data", "Pozycja"]
+    assert list(top.loc[2020, "Stacja"]) == ["A", "C"]  # remis C i D - pierwsza kolumna
+    assert list(top.loc[2021, "Wartosc"]) == [40, 25]
+
+    bottom = rank_top_n(df, n=10, largest=False)
+    assert list(bottom.loc[2020, "Stacja"]) == ["B", "C", "D", "A"]  # bez stacji E z brakiem
+
+    by_province = rank_top_n(df, n=1, level="Wojewodztwo")
+    assert by_province.loc[(2021, "Mazowieckie", 1), "Stacja"] == "D"
+    assert by_province.loc[(2021, "Śląskie", 1), "Stacja"] == "B"
+
+    overall = rank_top_n(df, n=3, across_years=True)
+    assert list(overall["Stacja"]) == ["B", "A", "D"]
+    assert list(overall["Data"]) == [2021, 2020, 2021]
+
+
+def test_rank_stations_and_changes():
+    df = _exceedances()
+
+    pd.testing.assert_frame_equal(rank_stations(df), df.rank(axis=1, method="min", ascending=False))
+    expected = df.T.groupby(level="Wojewodztwo").rank(method="min").T[df.columns]
+    pd.testing.assert_frame_equal(rank_stations(df, largest=False, level="Wojewodztwo"), expected)
+
+    changes = rank_changes(df, 2020, 2021)
+    assert changes.loc[("Śląskie", "Gliwice", "B"), "Zmiana"] == 3
+    assert changes.loc[("Śląskie", "Katowice", "A"), "Zmiana"] == -4
+    assert np.isnan(changes.loc[("Mazowieckie", "Radom", "E"), "Zmiana"])
+
+
+def test_parallel_aggregations_match_serial():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2019-12-01 01:00", periods=24 * 90, freq="h")
+    columns = pd.MultiIndex.from_tuples(
+        [(f"Woj{i % 3}", f"Miasto{i // 2}", f"S{i}") for i in range(11)],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"],
+    )
+    values = rng.random((len(dates), 11)) * 40
+    values[rng.random(values.shape) < 0.2] = np.nan
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, ("Data", "", ""), dates)
+    original = df.copy(deep=True)
+
+    pd.testing.assert_frame_equal(calculate_station_monthly_averages(df, min_coverage=0.75, parallel=True, workers=3),
+                                  calculate_station_monthly_averages(df, min_coverage=0.75))
+    parallel_means, parallel_counts = calculate_daily_station_averages(df, return_counts=True, parallel=True, workers=3)
+    means, counts = calculate_daily_station_averages(df, return_counts=True)
+    pd.testing.assert_frame_equal(parallel_means, means)
+    pd.testing.assert_frame_equal(parallel_counts, counts)
+    pd.testing.assert_frame_equal(calculate_days_exceeding_limit(df, cube=build_daily_cube(df, parallel=True, workers=2)),
+                                  calculate_days_exceeding_limit(df))
+    pd.testing.assert_frame_equal(df, original)
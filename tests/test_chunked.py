@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import calculations
+from chunked import ChunkedAggregator, aggregate_chunks
+from parquet_store import iter_parquet_chunks, save_to_parquet
+
+
+def _merged_frame(years=3, n_stations=5):
+    """Dane godzinowe z kilku lat w układzie z merge_dataframes (północ jako 23:59:59)"""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2019-01-01 01:00", f"{2019 + years}-01-01 00:00", freq="h")
+    dates = dates.where(dates.hour != 0, dates - pd.Timedelta(1, "s"))
+    values = rng.random((len(dates), n_stations)) * 40
+    values[rng.random(values.shape) < 0.3] = np.nan
+    # województwa na przemian - kolejność kolumn inna niż kolejność partycji magazynu
+    columns = pd.MultiIndex.from_tuples(
+        [(["Śląskie", "Mazowieckie"][i % 2], f"Miasto{i // 2}", f"S{i}") for i in range(n_stations)],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"])
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, ("Data", "", ""), dates)
+    return df
+
+
+def _assert_matches(aggregator, df, min_coverage=None):
+    pd.testing.assert_frame_equal(aggregator.monthly_means(),
+                                  calculations.calculate_station_monthly_averages(df, min_coverage=min_coverage))
+    for limit in aggregator.limits:
+        pd.testing.assert_frame_equal(aggregator.days_exceeding(limit),
+                                      calculations.calculate_days_exceeding_limit(df, limit, min_coverage=min_coverage))
+        pd.testing.assert_frame_equal(
+            aggregator.days_exceeding(limit, "Wojewodztwo"),
+            calculations.calculate_days_exceeding_limit_by_province(df, limit, min_coverage=min_coverage))
+
+
+@pytest.mark.parametrize("by_month", [False, True])
+@pytest.mark.parametrize("min_coverage", [None, 0.75])
+def test_chunks_match_in_memory_functions(by_month, min_coverage):
+    df = _merged_frame()
+    dates = df["Data"]
+    keys = [dates.dt.year, dates.dt.month] if by_month else dates.dt.year
+    chunks = [chunk for _, chunk in df.groupby(keys)]
+
+    aggregator = aggregate_chunks(chunks, limits=(15, 25), min_coverage=min_coverage)
+
+    _assert_matches(aggregator, df, min_coverage)
+    pd.testing.assert_frame_equal(aggregator.daily_means(),
+                                  calculations.calculate_daily_station_averages(df, min_coverage=min_coverage))
+
+
+@pytest.mark.parametrize("freq", ["year", "month"])
+def test_aggregate_parquet_chunks(tmp_path, freq):
+    df = _merged_frame(years=2)
+    save_to_parquet(df, tmp_path)
+
+    aggregator = aggregate_chunks(iter_parquet_chunks(tmp_path, freq=freq), keep_daily=False)
+
+    _assert_matches(aggregator, df)
+    with pytest.raises(ValueError):
+        aggregator.daily_means()
+
+
+def test_chunks_must_be_in_date_order():
+    df = _merged_frame(years=2)
+    first, second = [chunk for _, chunk in df.groupby(df["Data"].dt.year)]
+    aggregator = ChunkedAggregator()
+    aggregator.add(second)
+    with pytest.raises(ValueError):
+        aggregator.add(first)
+    with pytest.raises(ValueError):
+        aggregator.add(second.iloc[:, :-1])
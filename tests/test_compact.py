@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from calculations import calculate_station_monthly_averages
+from compact import to_compact
+
+
+def _merged_df(n_hours=24 * 60):
+    dates = pd.date_range("2018-01-01 01:00", periods=n_hours, freq="h")
+    # korekta północy jak w correct_dates
+    dates = dates.where(dates.hour != 0, dates - pd.Timedelta(seconds=1))
+    columns = pd.MultiIndex.from_tuples([
+        ("Mazowieckie", "Warszawa", "W1"),
+        ("Mazowieckie", "Warszawa", "W2"),
+        ("Śląskie", "Katowice", "K1"),
+    ], names=["Wojewodztwo", "Miejscowosc", "Stacja"])
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(np.round(rng.random((n_hours, 3)) * 100, 1), columns=columns)
+    df.insert(0, ("Data", "", ""), dates)
+    return df
+
+
+def test_compact_roundtrip():
+    df = _merged_df()
+    compact = to_compact(df)
+
+    assert compact.values.dtype == np.float32
+    assert compact.offsets.dtype == np.int32
+    assert list(compact.station_ids(Miejscowosc="Warszawa")) == [0, 1]
+    assert compact.memory_usage() < df.memory_usage(deep=True).sum() / 2 + 2048
+
+    restored = compact.to_frame()
+    assert list(restored.columns) == list(df.columns)
+    pd.testing.assert_series_equal(restored[("Data", "", "")], df[("Data", "", "")], check_dtype=False)
+    np.testing.assert_allclose(restored.iloc[:, 1:].to_numpy(), df.iloc[:, 1:].to_numpy(), rtol=1e-6)
+
+    # obliczenia działają na odtworzonym DataFrame
+    pd.testing.assert_frame_equal(calculate_station_monthly_averages(restored),
+                                  calculate_station_monthly_averages(df), check_dtype=False, rtol=1e-5)
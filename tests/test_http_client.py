@@ -0,0 +1,66 @@
+import io
+
+import pytest
+import requests
+
+from http_client import HttpClient
+
+
+def _client():
+    return HttpClient(backoff=0, retries=3)
+
+
+def test_download_resumes_dropped_connection(gios_server):
+    content = bytes(range(256)) * 4000
+    gios_server.files["/downloadFile/603"] = content
+    gios_server.drops["/downloadFile/603"] = 2
+    client = _client()
+
+    buffer = io.BytesIO()
+    client.download(gios_server.url + "/downloadFile/603", buffer)
+
+    assert buffer.getvalue() == content
+    # kolejne zapytania proszą tylko o brakującą część pliku
+    assert "Range" not in gios_server.log[0][1]
+    first_range = int(gios_server.log[1][1]["Range"][len("bytes="):-1])
+    assert 0 < first_range <= len(content) // 2
+    assert client.metrics.summary()["resumes"] == 2
+    assert client.metrics.summary()["bytes"] == len(content)
+
+
+def test_download_restarts_without_range_support(gios_server):
+    content = b"archiwum 2018" * 1000
+    gios_server.files["/downloadFile/603"] = content
+    gios_server.drops["/downloadFile/603"] = 1
+    gios_server.ranges = False
+    client = _client()
+
+    buffer = io.BytesIO()
+    client.download(gios_server.url + "/downloadFile/603", buffer)
+
+    assert buffer.getvalue() == content
+    assert client.metrics.summary()["resumes"] == 0
+
+
+def test_get_content_retries_server_errors(gios_server):
+    gios_server.files["/downloadFile/603"] = b"archiwum 2018"
+    gios_server.errors["/downloadFile/603"] = 2
+    client = _client()
+
+    response, content = client.get_content(gios_server.url + "/downloadFile/603")
+
+    assert content == b"archiwum 2018"
+    summary = client.metrics.summary()
+    assert summary["requests"] == 3
+    assert summary["retries"] == 2
+    assert summary["bandwidth"] > 0
+    assert summary["mean_latency"] > 0
+
+
+def test_get_content_gives_up_after_retries(gios_server):
+    gios_server.files["/downloadFile/603"] = b"archiwum 2018"
+    gios_server.errors["/downloadFile/603"] = 10
+
+    with pytest.raises(requests.HTTPError):
+        _client().get_content(gios_server.url + "/downloadFile/603")
+    assert len(gios_server.log) == 4
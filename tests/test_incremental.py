@@ -0,0 +1,60 @@
+import io
+import zipfile
+
+import pandas as pd
+
+import calculations
+import parquet_store
+from incremental import update_pm25_store, load_aggregates
+
+
+def _make_zip(year, rows):
+    """Tworzy archiwum ZIP z plikiem xlsx GIOS; rows to lista (data, wartość X10, wartość X11)"""
+    sheet = pd.DataFrame([["Kod stacji", "X10", "X11"]] + [list(row) for row in rows])
+    xlsx = io.BytesIO()
+    sheet.to_excel(xlsx, header=False, index=False)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr(f"{year}_PM25_1g.xlsx", xlsx.getvalue())
+    return archive.getvalue()
+
+
+def _update(gios_server, tmp_path, years):
+    return update_pm25_store(
+        years, gios_server.url + "/downloadFile/", {2018: "603", 2019: "1222"},
+        old_codes={}, cities={"X10": "Warszawa"}, provinces={"X10": "Mazowieckie"},
+        store_dir=tmp_path / "store", cache_dir=tmp_path / "cache",
+    )
+
+
+def test_update_pm25_store_only_changed_months(gios_server, tmp_path):
+    gios_server.files["/downloadFile/603"] = _make_zip(2018, [
+        ("2018-01-01 01:00:00", 10.0, 20.0),
+        ("2018-02-01 01:00:00", 30.0, 40.0),
+    ])
+    gios_server.files["/downloadFile/1222"] = _make_zip(2019, [
+        ("2019-01-01 01:00:00", 5.0, 6.0),
+    ])
+
+    first = _update(gios_server, tmp_path, [2018, 2019])
+    assert first == {"years": [2018, 2019], "months": [(2018, 1), (2018, 2), (2019, 1)]}
+
+    # ten sam plik - nic do zrobienia
+    assert _update(gios_server, tmp_path, [2018, 2019]) == {"years": [], "months": []}
+
+    # poprawiony rok 2019 z nowym miesiącem
+    gios_server.files["/downloadFile/1222"] = _make_zip(2019, [
+        ("2019-01-01 01:00:00", 5.0, 6.0),
+        ("2019-02-01 01:00:00", 50.0, 60.0),
+    ])
+    second = _update(gios_server, tmp_path, [2018, 2019])
+    assert second == {"years": [2019], "months": [(2019, 2)]}
+
+    # wynik taki sam jak przy przeliczeniu wszystkiego od nowa
+    merged = parquet_store.load_from_parquet(tmp_path / "store")
+    month_means, exceed = load_aggregates(tmp_path / "store")
+    pd.testing.assert_frame_equal(month_means, calculations.calculate_station_monthly_averages(merged),
+                                  check_index_type=False)
+    pd.testing.assert_frame_equal(exceed, calculations.calculate_days_exceeding_limit(merged),
+                                  check_index_type=False)
+    assert month_means.loc[(2019, 2), ("Mazowieckie", "Warszawa", "X10")] == 50.0
@@ -2,7 +2,7 @@ import pandas as pd
 from load_data import load_pm25_data
 
 def test_load_pm25_data(monkeypatch):
-    def fake_download(year, url, gios_id, filename):
+    def fake_download(year, url, gios_id, **kwargs):
         return pd.DataFrame({"A": [1, 2, 3]})
 
     # Podmieniamy w module load_data
@@ -11,9 +11,8 @@ def test_load_pm25_data(monkeypatch):
     years = [2015, 2018]
     gios_archive_url = "http://example.com/"
     gios_ids = {2015: "ID2015", 2018: "ID2018"}
-    filenames = {2015: "file2015.xlsx", 2018: "file2018.xlsx"}
 
-    result = load_pm25_data(years, gios_archive_url, gios_ids, filenames)
+    result = load_pm25_data(years, gios_archive_url, gios_ids, cache_dir=None)
 
     #Klucze to lata
     assert list(result.keys()) == [2015, 2018]
@@ -44,6 +43,21 @@ def test_get_old_station_codes():
     assert provinces == {"A":"Województwo1","B":"Województwo2","C":"Województwo3"}
 
 
+def test_get_old_station_codes_without_old_codes():
+    # kolumna z samymi brakami ma typ float64
+    df = pd.DataFrame({
+        "Kod stacji": ["A", "B"],
+        "Stary Kod stacji": [np.nan, np.nan],
+        "Miejscowość": ["Miasto1", "Miasto2"],
+        "Województwo": ["Województwo1", "Województwo2"],
+    })
+
+    old_codes, cities, _ = get_old_station_codes(df)
+
+    assert old_codes == {}
+    assert cities == {"A": "Miasto1", "B": "Miasto2"}
+
+
 from load_data import clean_pm25_data
 
 def test_clean_pm25_data_basic():
@@ -213,3 +227,278 @@ def test_get_cities_years():
     #Sprawdzanie kolumn
     assert list(result.columns) == ["index", "Miasto1", "Miasto3"]
 
+
+
+import io
+import zipfile
+
+import pytest
+
+from load_data import read_gios_archive
+
+
+def _make_gios_zip(year, values):
+    """Tworzy archiwum ZIP z plikiem xlsx w układzie plików GIOS"""
+    sheet = pd.DataFrame([
+        ["Nr", 1, 2],
+        ["Kod stacji", "X10", "X11"],
+        ["Wskaźnik", "PM2.5", "PM2.5"],
+    ] + [[f"{year}-01-01 {hour:02d}:00:00", value, value + 1] for hour, value in enumerate(values, start=1)])
+    xlsx = io.BytesIO()
+    sheet.to_excel(xlsx, header=False, index=False)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr(f"{year}_PM25_1g.xlsx", xlsx.getvalue())
+        z.writestr(f"{year}_NO2_1g.xlsx", b"")
+    return archive.getvalue()
+
+
+def test_load_pm25_data_parallel(gios_server, tmp_path):
+    gios_server.files["/downloadFile/236"] = _make_gios_zip(2015, [10.0, 20.0])
+    gios_server.files["/downloadFile/603"] = _make_gios_zip(2018, [30.0, 40.0, 50.0])
+    gios_ids = {2015: "236", 2018: "603"}
+    url = gios_server.url + "/downloadFile/"
+
+    serial = load_pm25_data([2015, 2018], url, gios_ids, cache_dir=None)
+    timings = {}
+    parallel = load_pm25_data([2015, 2018], url, gios_ids, cache_dir=None,
+                              parallel=True, download_workers=2, parse_workers=2, timings=timings)
+
+    assert list(parallel.keys()) == [2015, 2018]
+    for year in [2015, 2018]:
+        pd.testing.assert_frame_equal(parallel[year], serial[year])
+        assert set(timings[year]) == {"download", "parse"}
+    assert timings["total"] > 0
+
+
+def test_load_pm25_data_parallel_clean(gios_server, tmp_path):
+    gios_server.files["/downloadFile/603"] = _make_gios_zip(2018, [30.0, 40.0])
+
+    result = load_pm25_data([2018], gios_server.url + "/downloadFile/", {2018: "603"},
+                            cache_dir=tmp_path, parallel=True, clean=True)
+
+    assert list(result[2018].columns) == ["Data", "X10", "X11"]
+    assert result[2018]["X10"].tolist() == [30.0, 40.0]
+
+
+def test_read_gios_archive_streaming():
+    content = _make_gios_zip(2018, [30.0, 40.0])
+    # plik 2018 z przecinkiem dziesiętnym
+    sheet = pd.DataFrame([
+        ["Kod stacji", "X10", "X11"],
+        ["2018-01-01 01:00:00", "2,5", ""],
+        ["2018-01-01 02:00:00", "4,0", "3,7"],
+    ])
+    xlsx = io.BytesIO()
+    sheet.to_excel(xlsx, header=False, index=False)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("2018_PM25_1g.xlsx", xlsx.getvalue())
+
+    streamed = read_gios_archive(2018, content, streaming=True)
+    expected = clean_pm25_data({2018: read_gios_archive(2018, content)})[2018]
+    pd.testing.assert_frame_equal(streamed, expected, check_dtype=False)
+    assert streamed["X10"].dtype == "float32"
+
+    comma = read_gios_archive(2018, archive.getvalue(), streaming=True)
+    assert comma["X10"].tolist() == [2.5, 4.0]
+    assert pd.isna(comma["X11"].iloc[0])
+    assert comma["X11"].iloc[1] == pytest.approx(3.7)
+
+
+import numpy as np
+from load_data import parse_numeric_block
+
+def test_parse_numeric_block():
+    numbers = np.array([[1.5, np.nan], [2, 3.25]], dtype=object)
+    np.testing.assert_array_equal(parse_numeric_block(numbers), [[1.5, np.nan], [2.0, 3.25]])
+
+    # przecinek dziesiętny, puste komórki, spacje i komórki liczbowe w jednym bloku
+    mixed = np.array([["2,5", ""], [" 4,0 ", 7.0]], dtype=object)
+    result = parse_numeric_block(mixed)
+    assert result.dtype == np.float64
+    np.testing.assert_array_equal(result, [[2.5, np.nan], [4.0, 7.0]])
+
+
+from load_data import CleaningPipeline
+
+def test_cleaning_pipeline_matches_functions():
+    raw = {
+        2018: pd.DataFrame([
+            ["Nr", 1, 2, 3],
+            ["Kod stacji", "OLD1", "X11", "X12"],
+            ["2018-01-01 01:00:00", "2,5", "3,7", "1,0"],
+            ["2019-01-01 00:00:00", "4,0", "", "2,0"],
+        ]),
+        2019: pd.DataFrame([
+            ["Kod stacji", "X11", "NEW1"],
+            ["2019-01-01 01:00:00", 5.0, 6.0],
+        ]),
+    }
+    old_codes = {"OLD1": "NEW1"}
+    cities = {"NEW1": "Warszawa"}
+    provinces = {"NEW1": "Mazowieckie"}
+
+    dfs = clean_pm25_data(raw)
+    dfs = replace_old_codes(dfs, old_codes)
+    dfs = correct_dates(dfs)
+    expected = merge_dataframes(dfs, cities, provinces)
+
+    pipeline = CleaningPipeline().clean().replace_codes(old_codes).correct_dates()
+    # kroki są wykonywane dopiero w run(), dane wejściowe nie są zmieniane
+    per_year = pipeline.run(raw)
+    merged = pipeline.label(cities, provinces).run(raw)
+
+    pd.testing.assert_frame_equal(per_year[2018], dfs[2018])
+    pd.testing.assert_frame_equal(merged, expected)
+    assert list(merged.columns) == [("Data", "", ""), ("Mazowieckie", "Warszawa", "NEW1"), ("Nieznane", "Nieznana", "X11")]
+    assert merged[("Data", "", "")].iloc[1] == pd.Timestamp("2018-12-31 23:59:59")
+
+
+def test_cleaning_pipeline_duplicate_station_codes():
+    # dwa stare kody mapowane na ten sam nowy kod - kolumny stacji się powtarzają
+    dfs = {2019: pd.DataFrame({"Data": pd.to_datetime(["2019-01-01 01:00"]), "A": [10.0], "B": [20.0], "C": [1.0]})}
+    dfs = replace_old_codes(dfs, {"A": "N", "B": "N"})
+    assert list(dfs[2019].columns) == ["Data", "N", "N", "C"]
+
+    per_year = CleaningPipeline().correct_dates().run(dfs)
+    pd.testing.assert_frame_equal(per_year[2019], correct_dates(dfs)[2019])
+
+    merged = CleaningPipeline().correct_dates().label({}, {}).run(dfs)
+    pd.testing.assert_frame_equal(merged, merge_dataframes(correct_dates(dfs), {}, {}))
+    assert merged[("Nieznane", "Nieznana", "C")].tolist() == [1.0]
+    assert merged[("Nieznane", "Nieznana", "N")].tolist() == [15.0]
+
+
+from load_data import build_station_registry
+
+def test_station_registry():
+    metadata = pd.DataFrame({
+        "Kod stacji": ["C", "B", "D", "E"],
+        "Stary Kod stacji": ["B", "A, X", "X", 5],
+        "Miejscowość": ["Miasto1", "Miasto2", "Miasto3", "Miasto4"],
+        "Województwo": ["Woj1", "Woj2", "Woj3", "Woj4"],
+    })
+
+    registry = build_station_registry(metadata)
+
+    # łańcuch A -> B -> C
+    assert registry.old_codes == {"B": "C", "A": "C", "X": "D"}
+    assert registry.conflicts == {"X": ["B", "D"]}
+    assert registry.unmapped(["A", "E", "Q"]) == ["Q"]
+
+    dfs = {2018: pd.DataFrame({"Data": ["t1"], "A": [1.0], "Z": [2.0]})}
+    assert list(registry.apply(dfs)[2018].columns) == ["Data", "C", "Z"]
+    assert list(replace_old_codes(dfs, registry.old_codes)[2018].columns) == ["Data", "C", "Z"]
+
+
+def test_merge_dataframes_outer_with_duplicates():
+    nan = float("nan")
+    dfs = {
+        2019: pd.DataFrame([[pd.Timestamp("2019-01-01 01:00"), 10.0, 20.0, nan],
+                            [pd.Timestamp("2019-01-01 02:00"), nan, 22.0, 5.0]],
+                           columns=["Data", "X1", "X1", "X3"]),
+        2020: pd.DataFrame({"Data": pd.to_datetime(["2020-01-01 01:00"]), "X1": [12.0], "X2": [30.0]}),
+    }
+    cities = {"X1": "Warszawa"}
+    provinces = {"X1": "Mazowieckie"}
+
+    merged = merge_dataframes(dfs, cities, provinces, join="outer")
+
+    assert list(merged.columns.get_level_values("Stacja")) == ["", "X1", "X3", "X2"]
+    # duplikaty X1 uśrednione z dostępnych wartości
+    assert merged[("Mazowieckie", "Warszawa", "X1")].tolist() == [15.0, 22.0, 12.0]
+    # stacje brakujące w danym roku zostają, z NaN
+    assert merged[("Nieznane", "Nieznana", "X3")].isna().tolist() == [True, False, True]
+    assert merged[("Nieznane", "Nieznana", "X2")].tolist()[2] == 30.0
+
+    first = merge_dataframes(dfs, cities, provinces, join="outer", duplicates="first")
+    assert first[("Mazowieckie", "Warszawa", "X1")].tolist() == [10.0, 22.0, 12.0]
+
+    inner = merge_dataframes(dfs, cities, provinces)
+    assert list(inner.columns.get_level_values("Stacja")) == ["", "X1"]
+
+    # to samo w CleaningPipeline - kolumny z powtórzonym kodem trafiają do label bez przesunięć
+    corrected = correct_dates(dfs)
+    for join, duplicates in [("outer", "mean"), ("outer", "first"), ("inner", "mean")]:
+        piped = CleaningPipeline().correct_dates().label(cities, provinces, join=join, duplicates=duplicates).run(dfs)
+        expected = merge_dataframes(corrected, cities, provinces, join=join, duplicates=duplicates)
+        pd.testing.assert_frame_equal(piped, expected)
+
+
+from load_data import correct_timestamps
+
+def test_correct_timestamps_modes():
+    dates = pd.Series(pd.to_datetime(["2019-01-01 00:00:00", "2019-01-01 00:00:59", "2019-01-01 00:01:00",
+                                      "2019-01-01 01:00:00", None]))
+
+    midnight = correct_timestamps(dates)
+    assert list(midnight[:4]) == [pd.Timestamp("2018-12-31 23:59:59"), pd.Timestamp("2018-12-31 23:59:59"),
+                                  pd.Timestamp("2019-01-01 00:01:00"), pd.Timestamp("2019-01-01 01:00:00")]
+    assert pd.isna(midnight[4])
+
+    # GIOS: godzina oznaczona końcem -> oznaczenie początkiem
+    hour_start = correct_timestamps(dates, mode="hour_start")
+    assert hour_start[0] == pd.Timestamp("2018-12-31 23:00:00")
+    assert hour_start[3] == pd.Timestamp("2019-01-01 00:00:00")
+    assert pd.isna(hour_start[4])
+
+
+from load_data import download_gios_archive
+
+
+def test_download_gios_archive_on_disk(gios_server, tmp_path, monkeypatch):
+    gios_server.files["/downloadFile/603"] = _make_gios_zip(2018, [30.0, 40.0])
+    url = gios_server.url + "/downloadFile/"
+
+    in_memory = download_gios_archive(2018, url, "603", cache_dir=tmp_path / "cache", in_memory=True)
+    on_disk = download_gios_archive(2018, url, "603", cache_dir=tmp_path / "cache")
+    pd.testing.assert_frame_equal(on_disk, in_memory)
+
+    # bez cache archiwum trafia do pliku tymczasowego, który jest potem usuwany
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path / "tmp"))
+    (tmp_path / "tmp").mkdir()
+    no_cache = download_gios_archive(2018, url, "603", cache_dir=None)
+    pd.testing.assert_frame_equal(no_cache, in_memory)
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+import http_client
+from load_data import find_gios_pm25_info
+
+
+def test_fetches_survive_flaky_server(gios_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(http_client, "_client", http_client.HttpClient(backoff=0))
+    content = _make_gios_zip(2018, [30.0, 40.0])
+    gios_server.files["/downloadFile/603"] = content
+    gios_server.drops["/downloadFile/603"] = 1
+    gios_server.files["/pjp/archives"] = '<a href="/pjp/archives/downloadFile/603">Wyniki pomiarów z 2018 roku</a>'.encode()
+    gios_server.errors["/pjp/archives"] = 1
+    monkeypatch.setattr("archive_index.ARCHIVE_URL", gios_server.url + "/pjp/archives")
+
+    assert find_gios_pm25_info(2018, cache_dir=tmp_path) == "603"
+    df = download_gios_archive(2018, gios_server.url + "/downloadFile/", "603", cache_dir=tmp_path)
+
+    assert df.equals(read_gios_archive(2018, content))
+    assert http_client.get_client().metrics.summary()["retries"] == 2
+
+
+from load_data import find_gios_pm25_ids
+
+def test_find_gios_pm25_ids_refreshes_index_for_new_year(gios_server, tmp_path, monkeypatch):
+    page = '<a href="/pjp/archives/downloadFile/603">Wyniki pomiarów z 2018 roku</a>'
+    gios_server.files["/pjp/archives"] = page.encode()
+    monkeypatch.setattr("archive_index.ARCHIVE_URL", gios_server.url + "/pjp/archives")
+    assert find_gios_pm25_ids([2018], cache_dir=tmp_path) == {2018: "603"}
+
+    # nowy rok opublikowany, zanim zapisany indeks stracił ważność
+    page += '<a href="/pjp/archives/downloadFile/302">Wyniki pomiarów z 2019 roku</a>'
+    gios_server.files["/pjp/archives"] = page.encode()
+    assert find_gios_pm25_ids([2018, 2019], cache_dir=tmp_path) == {2018: "603", 2019: "302"}
+    assert len(gios_server.log) == 2
+
+    # w trybie offline brakujący rok nie jest szukany na serwerze
+    with pytest.raises(RuntimeError):
+        find_gios_pm25_ids([2020], cache_dir=tmp_path, offline=True)
+    assert len(gios_server.log) == 2
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from calculations import (calculate_station_monthly_averages, calculate_daily_station_averages,
+                          calculate_days_exceeding_limit, calculate_days_exceeding_limit_by_province)
+from mmap_store import save_hourly_memmap, open_hourly_memmap
+
+
+def _merged_df():
+    dates = pd.date_range("2018-12-20 01:00", "2019-02-10 00:00", freq="h")
+    columns = pd.MultiIndex.from_tuples([
+        ("Mazowieckie", "Warszawa", "W1"),
+        ("Mazowieckie", "Radom", "R1"),
+        ("Śląskie", "Katowice", "K1"),
+    ], names=["Wojewodztwo", "Miejscowosc", "Stacja"])
+    rng = np.random.default_rng(0)
+    values = np.round(rng.gamma(2.0, 10.0, size=(len(dates), 3)), 1).astype(np.float32)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    df = pd.DataFrame(values.astype(np.float64), columns=columns)
+    df.insert(0, ("Data", "", ""), dates)
+    return df
+
+
+def test_calculations_on_memmap(tmp_path):
+    df = _merged_df()
+    save_hourly_memmap(df, tmp_path, chunk_size=2)
+    hourly = open_hourly_memmap(tmp_path)
+
+    assert isinstance(hourly.values, np.memmap)
+    assert hourly.values.shape == (3, len(df))
+    pd.testing.assert_frame_equal(hourly.to_frame(), df, check_dtype=False)
+
+    pd.testing.assert_frame_equal(calculate_station_monthly_averages(hourly),
+                                  calculate_station_monthly_averages(df), check_index_type=False)
+    pd.testing.assert_frame_equal(calculate_daily_station_averages(hourly),
+                                  calculate_daily_station_averages(df), check_freq=False, check_index_type=False)
+    pd.testing.assert_frame_equal(calculate_days_exceeding_limit(hourly),
+                                  calculate_days_exceeding_limit(df))
+    pd.testing.assert_frame_equal(calculate_days_exceeding_limit_by_province(hourly, limit=25),
+                                  calculate_days_exceeding_limit_by_province(df, limit=25))
+
+
+def test_parallel_aggregations_on_memmap(tmp_path):
+    df = _merged_df()
+    save_hourly_memmap(df, tmp_path)
+    hourly = open_hourly_memmap(tmp_path)
+
+    # procesy mapują plik values.npy same - bez kopiowania danych
+    pd.testing.assert_frame_equal(calculate_daily_station_averages(hourly, parallel=True, workers=2),
+                                  calculate_daily_station_averages(hourly))
+    pd.testing.assert_frame_equal(calculate_station_monthly_averages(hourly, parallel=True, workers=2),
+                                  calculate_station_monthly_averages(hourly))
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from parquet_store import save_to_parquet, load_from_parquet, load_stations
+
+
+def _merged_df():
+    dates = pd.to_datetime(["2018-01-01 01:00", "2018-02-01 01:00", "2021-01-01 01:00", "2021-03-01 01:00"])
+    columns = pd.MultiIndex.from_tuples([
+        ("Data", "", ""),
+        ("Mazowieckie", "Warszawa", "W1"),
+        ("Mazowieckie", "Radom", "R1"),
+        ("Śląskie", "Katowice", "K1"),
+    ], names=["Wojewodztwo", "Miejscowosc", "Stacja"])
+    return pd.DataFrame({
+        columns[0]: dates,
+        columns[1]: [10.0, 11.0, 12.0, 13.0],
+        columns[2]: [20.0, None, 22.0, 23.0],
+        columns[3]: [30.0, 31.0, 32.0, 33.0],
+    }, columns=columns)
+
+
+def test_parquet_roundtrip(tmp_path):
+    df = _merged_df()
+    save_to_parquet(df, tmp_path)
+
+    result = load_from_parquet(tmp_path)
+
+    pd.testing.assert_frame_equal(result, df, check_dtype=False)
+    assert (tmp_path / "Rok=2018" / "Wojewodztwo=Śląskie" / "data.parquet").exists()
+    assert len(load_stations(tmp_path)) == 3
+
+
+def test_load_from_parquet_pruning(tmp_path):
+    save_to_parquet(_merged_df(), tmp_path, row_group_size=1)
+
+    result = load_from_parquet(tmp_path, years=[2021], cities=["Katowice", "Radom"], end="2021-02-01")
+
+    assert list(result.columns) == [("Data", "", ""), ("Mazowieckie", "Radom", "R1"), ("Śląskie", "Katowice", "K1")]
+    assert result[("Data", "", "")].tolist() == [pd.Timestamp("2021-01-01 01:00")]
+    assert result[("Śląskie", "Katowice", "K1")].tolist() == [32.0]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from load_data import correct_dates
+from rolling import (calculate_annual_percentile, calculate_rolling_percentile, calculate_running_max,
+                     calculate_running_mean, to_hourly_grid)
+
+
+def _merged_frame(values, start="2019-01-01 01:00"):
+    """Tworzy DataFrame w układzie z merge_dataframes (po correct_dates)"""
+    dates = pd.date_range(start, periods=len(values), freq="h")
+    df = pd.DataFrame(values, columns=[f"S{i}" for i in range(values.shape[1])])
+    df.insert(0, "Data", dates)
+    df = correct_dates({2019: df})[2019]
+    df.columns = pd.MultiIndex.from_tuples(
+        [("Data", "", "")] + [("Mazowieckie", "Warszawa", f"S{i}") for i in range(values.shape[1])],
+        names=["Wojewodztwo", "Miejscowosc", "Stacja"])
+    return df
+
+
+def _random_values(n_hours, n_stations, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.random((n_hours, n_stations)) * 50
+    values[rng.random(values.shape) < 0.2] = np.nan
+    return values
+
+
+def test_to_hourly_grid_places_midnight_after_previous_hours():
+    df = _merged_frame(np.arange(48, dtype=float).reshape(-1, 1))
+    df = df.drop(index=[5, 6])
+
+    grid = to_hourly_grid(df)
+
+    # 23:59:59 trafia na 00:00 następnego dnia, a usunięte godziny są brakami
+    assert grid.start == pd.Timestamp("2019-01-01 01:00")
+    assert len(grid.values) == 48
+    assert grid.values[23, 0] == 23
+    assert np.isnan(grid.values[5:7, 0]).all()
+
+
+def test_running_statistics_match_pandas_rolling():
+    values = _random_values(24 * 20, 3)
+    df = _merged_frame(values)
+    hourly = pd.DataFrame(to_hourly_grid(df).values)
+
+    mean = calculate_running_mean(df, hours=24)
+    maximum = calculate_running_max(df, hours=8)
+
+    expected_mean = hourly.rolling(24, min_periods=18).mean().to_numpy()
+    expected_max = hourly.rolling(8, min_periods=6).max().to_numpy()
+    np.testing.assert_allclose(mean.to_numpy(), expected_mean)
+    np.testing.assert_allclose(maximum.to_numpy(), expected_max)
+    assert mean.index[0] == pd.Timestamp("2019-01-01 01:00")
+
+
+def test_rolling_percentile_uses_valid_days():
+    values = np.full((24 * 10, 1), 10.0)
+    values[24 * 3:24 * 3 + 12] = np.nan  # dzień z połową godzin - nieważny
+    values[24 * 5:24 * 7] = 40.0
+    df = _merged_frame(values)
+
+    result = calculate_rolling_percentile(df, q=50, days=4, min_coverage=0.75)
+
+    assert result.index.name == "Data"
+    assert result.index[0] == pd.Timestamp("2019-01-01")
+    assert np.isnan(result.iloc[:2, 0]).all()  # za mało ważnych dni na początku
+    assert result.iloc[2, 0] == 10.0
+    assert result.iloc[6, 0] == 40.0  # dni 3-6: brak, 10, 40, 40
+    assert result.iloc[7, 0] == 25.0  # dni 4-7: 10, 40, 40, 10
+
+
+def test_annual_percentile_requires_coverage():
+    values = _random_values(24 * 365, 2, seed=1)
+    values[:24 * 200, 1] = np.nan
+    df = _merged_frame(values)
+
+    result = calculate_annual_percentile(df)
+
+    daily = df.iloc[:, 1:].groupby(df["Data"].dt.floor("D").to_numpy()).mean()
+    valid = df.iloc[:, 1:].groupby(df["Data"].dt.floor("D").to_numpy()).count() >= 18
+    expected = daily[valid].loc["2019"].quantile(0.904)
+    assert result.index.name == "Rok"
+    assert result.loc[2019].iloc[0] == pytest.approx(expected.iloc[0])
+    assert np.isnan(result.loc[2019].iloc[1])
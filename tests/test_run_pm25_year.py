@@ -0,0 +1,38 @@
+import pandas as pd
+
+import run_pm25_year
+from test_load_data import _make_gios_zip
+
+
+def test_parse_years():
+    assert run_pm25_year.parse_years(["2024", "2015-2017", "2016"]) == [2015, 2016, 2017, 2024]
+
+
+def test_main_batch(gios_server, tmp_path, monkeypatch):
+    gios_server.files["/downloadFile/236"] = _make_gios_zip(2015, [10.0, 20.0])
+    gios_server.files["/downloadFile/603"] = _make_gios_zip(2018, [30.0, 40.0])
+    calls = []
+
+    def fake_find_ids(years, offline=False):
+        calls.append(("index", list(years)))
+        return {2015: "236", 2018: "603"}
+
+    def fake_metadata(offline=False):
+        calls.append(("metadata",))
+        return pd.DataFrame({"Kod stacji": ["X10"], "Stary Kod stacji": [None],
+                             "Miejscowość": ["Warszawa"], "Województwo": ["Mazowieckie"]})
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("load_data.find_gios_pm25_ids", fake_find_ids)
+    monkeypatch.setattr("load_data.load_metadata", fake_metadata)
+    monkeypatch.setattr("run_pm25_year.GIOS_ARCHIVE_URL", gios_server.url + "/downloadFile/")
+
+    timings = run_pm25_year.main([2015, 2018], workers=2)
+
+    # strona archiwum i metadane pobrane raz dla wszystkich lat
+    assert calls == [("index", [2015, 2018]), ("metadata",)]
+    for year in [2015, 2018]:
+        assert (tmp_path / f"results/pm25/{year}/monthly_means.csv").exists()
+        assert (tmp_path / f"results/pm25/{year}/exceed_days.csv").exists()
+        assert set(timings[year]) == {"download", "parse", "merge", "calculations", "write"}
+    assert timings["total"] > 0